@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import os
+import json
+import pathlib
+import hashlib
+
+CACHE_DIRECTORY = pathlib.Path.home() / '.sapRefresh'  # used when "path-cache_directory" is not in the global configs
+
+
+def get_cache_directory(config):
+    """local directory where the application keeps its persistent caches"""
+    directory = config.get_path('path-cache_directory', CACHE_DIRECTORY)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def load_json(path, default=None):
+    """load a json file, returning the default when it doesn't exist or is corrupted"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    """write a json file atomically, so an interrupted run never leaves a half written file"""
+    path = pathlib.Path(path)
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=1, sort_keys=True, default=str)
+    os.replace(temporary, path)
+
+
+def fingerprint(*values):
+    """stable hash of any json serializable values"""
+    payload = json.dumps(values, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class TechnicalNameCache:
+    """
+    Technical names of the variables of BW queries, persisted in a json file and keyed by (System, Query, variable).
+    Each query keeps the fingerprint of its metadata (variables and dimensions). When the metadata of the
+    query changes, the fingerprint doesn't match anymore and every name cached for that query is discarded
+    """
+    FILENAME = 'technical_names.json'
+
+    def __init__(self, directory):
+        self.path = pathlib.Path(directory) / self.FILENAME
+        self.queries = load_json(self.path, dict())
+        self.hits = 0
+        self.misses = 0
+        self._changed = False
+
+    @staticmethod
+    def _key(system, query):
+        return f'{system}|{query}'
+
+    def validate(self, system, query, metadata_fingerprint):
+        """discard the names of the query when its metadata changed since they were cached"""
+        key = self._key(system, query)
+        entry = self.queries.get(key)
+        if entry is None or entry.get('fingerprint') != metadata_fingerprint:
+            self.queries[key] = {'fingerprint': metadata_fingerprint, 'names': dict()}
+            self._changed = self._changed or entry is not None
+
+    def get(self, system, query, variable_name):
+        """technical name of a variable, or None when it is not cached"""
+        entry = self.queries.get(self._key(system, query), dict())
+        technical_name = entry.get('names', dict()).get(variable_name)
+        if technical_name is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return technical_name
+
+    def set(self, system, query, variable_name, technical_name):
+        """store the technical name of a variable"""
+        entry = self.queries.setdefault(self._key(system, query), {'fingerprint': None, 'names': dict()})
+        entry['names'][variable_name] = technical_name
+        self._changed = True
+
+    def save(self):
+        """persist the cache when it changed"""
+        if self._changed:
+            save_json(self.path, self.queries)
+            self._changed = False
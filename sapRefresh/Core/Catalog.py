@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import json
+import pathlib
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from sapRefresh.Core.Cache import fingerprint
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS data_sources (
+    filename TEXT,
+    data_source TEXT,
+    data_source_name TEXT,
+    query TEXT,
+    system TEXT,
+    sheet TEXT,
+    crosstab TEXT,
+    collected_at TEXT,
+    information TEXT,
+    PRIMARY KEY (filename, data_source, crosstab)
+);
+CREATE TABLE IF NOT EXISTS variables (
+    filename TEXT,
+    data_source TEXT,
+    technical_name TEXT,
+    description TEXT,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS filters (
+    filename TEXT,
+    data_source TEXT,
+    technical_name TEXT,
+    description TEXT,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS data_sources_query ON data_sources (query);
+CREATE INDEX IF NOT EXISTS data_sources_system ON data_sources (system);
+CREATE INDEX IF NOT EXISTS variables_filename ON variables (filename);
+CREATE INDEX IF NOT EXISTS variables_technical_name ON variables (technical_name);
+CREATE INDEX IF NOT EXISTS filters_filename ON filters (filename);
+CREATE INDEX IF NOT EXISTS filters_technical_name ON filters (technical_name);
+"""
+# table of each command of the variables_filters dataframe
+TABLES = {'SAPSetVariable': 'variables', 'SAPSetFilter': 'filters'}
+
+
+def _text(value):
+    """value of a cell as text (None for the empty cells)"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+class MetadataCatalog:
+    """
+    Catalog (sqlite) of the data sources, variables and filters collected from the SAP AfO reports.
+    It replaces the <name>__information.xlsx files: every report is upserted by collect_information, and the
+    reports can be searched by query, system or technical name of a variable/filter without opening any workbook.
+    The catalog can also be exported to a single xlsx file for the business users
+    """
+    FILENAME = 'metadata_catalog.sqlite'
+
+    def __init__(self, directory):
+        self.path = pathlib.Path(directory) / self.FILENAME
+        self.connection = sqlite3.connect(str(self.path), timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """close the database"""
+        self.connection.close()
+
+    def upsert_report(self, filename, data_sources, variables_filters):
+        """
+        replace everything registered for a report by its data sources (list of the dictionaries of
+        SapRefresh.data_source) and its variables and filters (dataframe of SapRefresh.variables_filters_list)
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            for table in ('data_sources', 'variables', 'filters'):
+                self.connection.execute(f'DELETE FROM {table} WHERE filename = ?', (filename,))
+            self.connection.executemany(
+                'INSERT INTO data_sources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(filename, _text(ds.get('DS')), _text(ds.get('DataSourceName')), _text(ds.get('Query')),
+                  _text(ds.get('System')), _text(ds.get('Sheet')), _text(ds.get('Crosstab')), now,
+                  json.dumps(ds, sort_keys=True, default=str)) for ds in data_sources]
+            )
+            for command, table in TABLES.items():
+                if 'command' not in variables_filters.columns:  # the data sources have no variables or filters
+                    break
+                rows = variables_filters[variables_filters['command'] == command]
+                self.connection.executemany(
+                    f'INSERT INTO {table} VALUES (?, ?, ?, ?, ?)',
+                    [(filename, _text(row.get('data_source')), _text(row.get('field')), _text(row.get('field_name')),
+                      _text(row.get('value'))) for row in rows.to_dict('records')]
+                )
+
+    def remove_report(self, filename):
+        """remove a report from the catalog (e.g. the workbook was deleted)"""
+        with self.connection:
+            for table in ('data_sources', 'variables', 'filters'):
+                self.connection.execute(f'DELETE FROM {table} WHERE filename = ?', (filename,))
+
+    def report_hash(self, filename):
+        """hash of everything registered for a report, or None when the report is not in the catalog"""
+        rows = []
+        for table in ('data_sources', 'variables', 'filters'):
+            columns = '*' if table != 'data_sources' else 'filename, data_source, crosstab, information'
+            rows.append(sorted([list(row) for row in self.connection.execute(
+                f'SELECT {columns} FROM {table} WHERE filename = ?', (filename,))], key=str))
+        if not rows[0]:
+            return None
+        return fingerprint(rows)
+
+    def filenames(self):
+        """reports in the catalog"""
+        return [row['filename'] for row in
+                self.connection.execute('SELECT DISTINCT filename FROM data_sources ORDER BY filename')]
+
+    def systems(self):
+        """SAP system of each data source of the reports ({(filename, data_source): system}), as collected"""
+        return {(row['filename'], row['data_source']): row['system'] for row in self.connection.execute(
+            'SELECT DISTINCT filename, data_source, system FROM data_sources WHERE system IS NOT NULL')}
+
+    def data_sources(self, filename=None, query=None, system=None):
+        """dataframe of the data sources, optionally only of a report, a query and/or a system"""
+        conditions = {'filename': filename, 'query': query, 'system': system}
+        return self._select('data_sources', conditions, 'filename, data_source, crosstab')
+
+    def restrictions(self, filename=None, technical_name=None):
+        """dataframe of the variables and filters (column command), optionally only of a report and/or a field"""
+        conditions = {'filename': filename, 'technical_name': technical_name}
+        frames = []
+        for command, table in TABLES.items():
+            df = self._select(table, conditions, 'filename, data_source, rowid')
+            df.insert(0, 'command', command)
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True)
+
+    def reports_using(self, technical_name):
+        """reports that have a variable or a filter with the technical name"""
+        return sorted(set(self.restrictions(technical_name=technical_name)['filename']))
+
+    def _select(self, table, conditions, order):
+        conditions = {column: value for column, value in conditions.items() if value is not None}
+        where = ' AND '.join(f'{column} = ?' for column in conditions) or '1 = 1'
+        return pd.read_sql_query(f'SELECT * FROM {table} WHERE {where} ORDER BY {order}', self.connection,
+                                 params=list(conditions.values()))
+
+    def export_xlsx(self, path):
+        """write the catalog to a xlsx file (sheets data_sources and variables_filters) and return its path"""
+        data_sources = self.data_sources().drop(columns='information')
+        restrictions = self.restrictions()
+        with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+            data_sources.to_excel(writer, sheet_name='data_sources', index=False)
+            restrictions.to_excel(writer, sheet_name='variables_filters', index=False)
+        return path
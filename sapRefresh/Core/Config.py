@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+The config workbook is read in a single pass (every sheet at once) and its sheets are validated. A binary snapshot
+of the sheets is kept in the local cache directory, keyed by the path, size and mtime of the workbook, so the next
+runs don't parse the xlsx (usually on a network share) while it doesn't change.
+"""
+import os
+import pickle
+import pathlib
+
+from sapRefresh.Core.Cache import CACHE_DIRECTORY, fingerprint
+
+_MISSING = object()  # sentinel to differentiate "no default" from a default equal to None
+
+# columns each sheet of the config workbook must have
+SCHEMAS = {
+    'global_configs': ('description', 'value'),
+    'data_sources': ('filename', 'data_source', 'refresh'),
+    'variables_filters': ('filename', 'command', 'data_source', 'field', 'value'),
+}
+SNAPSHOT_DIRECTORY = CACHE_DIRECTORY / 'config_snapshots'
+SNAPSHOT_VERSION = 1  # change it when the content of the snapshots changes
+
+
+class ConfigKeyError(KeyError):
+    """A mandatory key is absent (or empty) in the global_configs sheet"""
+    def __str__(self):
+        return self.args[0]
+
+
+class ConfigSchemaError(ValueError):
+    """The config workbook lacks a sheet or a column"""
+
+
+def _is_empty(value):
+    """empty cells of the config workbook are loaded by pandas as NaN"""
+    return value is None or (isinstance(value, float) and value != value) or str(value).strip() == ''
+
+
+class GlobalConfig:
+    """
+    Indexed access to the global_configs sheet. The dataframe is converted once into a dictionary
+    {description: value}, so every read is a O(1) lookup with type coercion.
+    """
+    def __init__(self, df_global_configs):
+        self.df = df_global_configs
+        self._values = dict()
+        for description, value in zip(df_global_configs['description'], df_global_configs['value']):
+            if not _is_empty(description) and not _is_empty(value):
+                self._values[str(description).strip()] = value
+
+    @classmethod
+    def coerce(cls, config):
+        """accept either a GlobalConfig or the raw global_configs dataframe"""
+        if isinstance(config, cls) or hasattr(config, 'get_path'):
+            return config
+        return cls(config)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def keys(self):
+        """all the descriptions available in the sheet"""
+        return self._values.keys()
+
+    def get(self, key, default=_MISSING):
+        """get the raw value of a key. Without a default a missing key raises ConfigKeyError"""
+        try:
+            return self._values[key]
+        except KeyError:
+            if default is not _MISSING:
+                return default
+            raise ConfigKeyError(f'The key "{key}" is missing in the global_configs sheet of the config file') from None
+
+    def get_str(self, key, default=_MISSING):
+        """get a value as a string"""
+        value = self.get(key, default)
+        return value if value is None else str(value).strip()
+
+    def get_int(self, key, default=_MISSING):
+        """get a value as an integer (e.g. ports and limits)"""
+        value = self.get(key, default)
+        try:
+            return value if value is None else int(float(value))
+        except (TypeError, ValueError):
+            raise ValueError(f'The key "{key}" of the global_configs sheet must be an integer (got {value!r})') from None
+
+    def get_float(self, key, default=_MISSING):
+        """get a value as a float (e.g. wait times)"""
+        value = self.get(key, default)
+        try:
+            return value if value is None else float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'The key "{key}" of the global_configs sheet must be a number (got {value!r})') from None
+
+    def get_bool(self, key, default=_MISSING):
+        """get a value as a boolean. Accepts yes/no, true/false, y/n and 1/0"""
+        value = self.get(key, default)
+        if isinstance(value, bool) or value is None:
+            return value
+        return str(value).strip().lower() in ('yes', 'y', 'true', '1', 'on')
+
+    def get_path(self, key, default=_MISSING):
+        """get a value as a pathlib.Path"""
+        value = self.get(key, default)
+        return value if value is None else pathlib.Path(str(value).strip())
+
+    def get_list(self, key, default=_MISSING, sep=','):
+        """get a comma separated value as a list of strings"""
+        value = self.get(key, default)
+        if value is None or isinstance(value, (list, tuple)):
+            return value
+        return [item.strip() for item in str(value).split(sep) if item.strip()]
+
+    def with_prefix(self, prefix):
+        """dictionary {suffix: value} of all keys that start with the prefix"""
+        return {key[len(prefix):]: value for key, value in self._values.items() if key.startswith(prefix)}
+
+
+def validate_sheets(sheets, schemas=None):
+    """raise ConfigSchemaError with every sheet or column missing in the sheets ({name: dataframe})"""
+    problems = []
+    for name, columns in (schemas or SCHEMAS).items():
+        if name not in sheets:
+            problems.append(f'the sheet "{name}" is missing')
+            continue
+        missing = [column for column in columns if column not in sheets[name].columns]
+        if missing:
+            problems.append(f'the sheet "{name}" has no column {", ".join(missing)}')
+    if problems:
+        raise ConfigSchemaError(f'Invalid config workbook: {"; ".join(problems)}')
+
+
+def snapshot_filepath(config_path, directory=None):
+    """path of the snapshot of a config workbook"""
+    directory = pathlib.Path(directory) if directory is not None else SNAPSHOT_DIRECTORY
+    return directory / (fingerprint(str(config_path))[:16] + '.pickle')
+
+
+def _snapshot_key(config_path, stat):
+    return {'version': SNAPSHOT_VERSION, 'path': str(config_path), 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+
+def _read_snapshot(path, key):
+    """sheets of the snapshot, or None when it doesn't exist, is corrupted or is of another version of the file"""
+    try:
+        with open(path, 'rb') as file:
+            payload = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get('key') != key:
+        return None
+    return payload['sheets']
+
+
+def _write_snapshot(path, key, sheets):
+    """write the snapshot atomically. The cache is an optimization: a failure only costs the next parse"""
+    temporary = path.with_name(path.name + '.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(temporary, 'wb') as file:
+            pickle.dump({'key': key, 'sheets': sheets}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except OSError:
+        pass
+
+
+def load_config_workbook(config_path, snapshot_directory=None):
+    """
+    every sheet of the config workbook ({name: dataframe}), validated. The sheets come from the local snapshot
+    when the workbook has the same size and mtime as when the snapshot was written
+    """
+    stat = os.stat(config_path)
+    key = _snapshot_key(config_path, stat)
+    path = snapshot_filepath(config_path, snapshot_directory)
+    sheets = _read_snapshot(path, key)
+    if sheets is None:
+        import pandas as pd  # imported here so that importing the package stays fast
+        sheets = pd.read_excel(config_path, sheet_name=None)
+        validate_sheets(sheets)
+        _write_snapshot(path, key, sheets)
+    return sheets
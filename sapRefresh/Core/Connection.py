@@ -14,13 +14,12 @@ import ssl
 from email.mime.text import MIMEText
 from datetime import datetime
 
-from tenacity import retry, wait_fixed, before_sleep_log, stop_after_attempt
 
-import logging
-from Core.Cripto import secret_decode
-from sapRefresh.Core.base_logger import get_logger
-from sapRefresh import LOG_PATH, global_configs_df
-logger, LOG_FILEPATH = get_logger(__name__, LOG_PATH)
+from sapRefresh.Core.Cripto import secret_decode
+from sapRefresh.Core.base_logger import get_logger, get_log_filepath
+from sapRefresh import get_global_configs
+from sapRefresh.Core.Retry import adaptive_retry
+logger = get_logger(__name__)
 
 
 def get_config_values(config_file='app_config.ini'):
@@ -46,16 +45,15 @@ def _get_wb_path(filename):
     return workbook_filepath
 
 
-@retry(reraise=True, wait=wait_fixed(10), before_sleep=before_sleep_log(logger, logging.DEBUG),
-       stop=stop_after_attempt(3))
+@adaptive_retry
 def check_connection(host, port, timeout=3):
-    """Check if a server is alive or not"""
+    """Check if a server is alive or not (see Core.Probe to check several servers with a cache)"""
     try:
-        socket.setdefaulttimeout(timeout)
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, int(port)))
-        print(f"The server {host}:{port} is reachable")
+        # the timeout is set only in this socket, which is closed at once
+        with socket.create_connection((host, int(port)), timeout=timeout):
+            print(f"The server {host}:{port} is reachable")
     except socket.error as ex:
-        raise RuntimeError(f"Error! Couldn't connect to {host}:{port}. Exception:", ex)
+        raise ConnectionError(f"Error! Couldn't connect to {host}:{port}. Exception:", ex)
 
 
 def search_directory(data_directory):
@@ -68,18 +66,13 @@ def search_directory(data_directory):
     return list_files
 
 
-def send_email(message_string, status_string, process_string):  #filepath_string, log_path_string, status_string, process_string):
-    """Function to send communications via email"""
+def build_email(message_string, status_string, process_string, global_configs=None):
+    """Elaborate the email message of a process status"""
     # calculated fields
-    log_path_string = str(LOG_FILEPATH)
+    log_path_string = str(get_log_filepath())
+    global_configs = global_configs or get_global_configs()
     datetime_string = datetime.now().strftime("%d/%m/%Y, %H:%M:%S")
     subject_string = f'PYTHON AUTOMATE ({status_string}) - [{process_string}] - {datetime_string}'
-    # email configurations
-    smtp_server = global_configs_df.query('description=="mail-server"')['value'].values[0]
-    port = global_configs_df.query('description=="mail-port"')['value'].values[0]
-    sender_email = global_configs_df.query('description=="mail-user_name"')['value'].values[0]
-    password = secret_decode(global_configs_df.query('description=="mail-password"')['value'].values[0])
-    receiver_email = (global_configs_df.query('description=="mail-to"')['value'].values[0]).split(',')
     # elaborate the email message
     msg_email = f"""\
     Ola,
@@ -96,18 +89,38 @@ def send_email(message_string, status_string, process_string):  #filepath_string
     # construct email message
     message = MIMEText(msg_email)
     message['subject'] = subject_string
-    message['from'] = sender_email
-    message['to'] = global_configs_df.query('description=="mail-to"')['value'].values[0]
-    # Create a secure SSL context
-    context = ssl.create_default_context()
-    # log in to server and send email
-    server = smtplib.SMTP(smtp_server, port)
-    server.ehlo()  # Can be omitted
-    server.starttls(context=context)  # Secure the connection
+    message['from'] = global_configs.get_str('mail-user_name')
+    message['to'] = ','.join(global_configs.get_list('mail-to'))
+    return message
+
+
+def smtp_login(global_configs=None, timeout=60):
+    """
+    Open an authenticated session in the SMTP server. "mail-starttls" = no disables the STARTTLS
+    (e.g. local relay) and the login is skipped when there is no "mail-password"
+    """
+    global_configs = global_configs or get_global_configs()
+    server = smtplib.SMTP(global_configs.get_str('mail-server'), global_configs.get_int('mail-port'), timeout=timeout)
     server.ehlo()  # Can be omitted
-    server.login(sender_email, password)
+    if global_configs.get_bool('mail-starttls', True):
+        # Create a secure SSL context
+        context = ssl.create_default_context()
+        server.starttls(context=context)  # Secure the connection
+        server.ehlo()  # Can be omitted
+    if 'mail-password' in global_configs:
+        password = secret_decode(global_configs.get_str('mail-password'))
+        server.login(global_configs.get_str('mail-user_name'), password)
+    return server
+
+
+def send_email(message_string, status_string, process_string):  #filepath_string, log_path_string, status_string, process_string):
+    """Function to send communications via email (a new SMTP session per email, see Core.Notifier for a batch)"""
+    global_configs = get_global_configs()
+    message = build_email(message_string, status_string, process_string, global_configs)
+    # log in to server and send email
+    server = smtp_login(global_configs)
     # Statement to send email
-    server.sendmail(sender_email, receiver_email, message.as_string())
+    server.sendmail(message['from'], global_configs.get_list('mail-to'), message.as_string())
     server.quit()
 
 
@@ -3,26 +3,116 @@
 Created on 3/8/2021
 Author: Arnold Souza
 Email: arnoldporto@gmail.com
+
+The secrets of the config workbook (logon-user, logon-password, mail-password) are Fernet tokens.
+The key is in the environment variable SAP_KEY. To rotate the key, put the new key first and keep the old ones
+after it (SAP_KEY=new_key,old_key), re-encrypt the workbook (script_rotate_secrets.py) and then remove the old key.
 """
 import os
+import threading
+
+from cryptography.fernet import Fernet, MultiFernet
+
+KEY_ENV = 'SAP_KEY'
+SECRET_KEYS = ('logon-user', 'logon-password', 'mail-password')  # rows of global_configs that hold tokens
+
+
+class MissingKeyError(ValueError):
+    """The SAP_KEY environment variable is missing or invalid"""
+
+
+class CredentialProvider:
+    """
+    Decrypt the secrets with the keys of SAP_KEY (comma separated, the first one encrypts).
+    The keys are validated once and every secret is decrypted once per process
+    """
+    def __init__(self, keys=None):
+        if keys is None:
+            keys = os.environ.get(KEY_ENV)
+        if not keys or not str(keys).strip():
+            raise MissingKeyError(f'The environment variable {KEY_ENV} is not set. It must contain the key used to '
+                                  f'encrypt the secrets of the config workbook')
+        fernets = []
+        for position, key in enumerate(str(keys).split(','), start=1):
+            try:
+                fernets.append(Fernet(key.strip().encode('utf-8')))
+            except ValueError:
+                raise MissingKeyError(f'The key #{position} of {KEY_ENV} is not a valid Fernet key '
+                                      f'(32 url-safe base64-encoded bytes)') from None
+        self.fernet = MultiFernet(fernets)
+        self._secrets = dict()  # token -> decrypted value
+        self._lock = threading.Lock()
+
+    def decode(self, token):
+        """decrypted value of a token (cached)"""
+        with self._lock:
+            if token not in self._secrets:
+                self._secrets[token] = self.fernet.decrypt(token.encode('utf-8')).decode('utf-8')
+            return self._secrets[token]
+
+    def encode(self, string):
+        """token of a string, encrypted with the first key"""
+        return self.fernet.encrypt(string.encode('utf-8'))
 
-from cryptography.fernet import Fernet
+    def rotate(self, token):
+        """token re-encrypted with the first key"""
+        return self.fernet.rotate(token.encode('utf-8')).decode('utf-8')
+
+    def clear(self):
+        """forget the decrypted secrets"""
+        with self._lock:
+            self._secrets = dict()
+
+
+# provider of the current process
+_state = {'provider': None}
+_state_lock = threading.Lock()
+
+
+def get_provider():
+    """credential provider of the process. Raise MissingKeyError when SAP_KEY is missing or invalid"""
+    with _state_lock:
+        if _state['provider'] is None:
+            _state['provider'] = CredentialProvider()
+        return _state['provider']
+
+
+def reset_provider():
+    """read SAP_KEY again at the next use (e.g. after a key rotation)"""
+    with _state_lock:
+        _state['provider'] = None
 
 
 def secret_encode(string):
     """Encrypt the secret string"""
-    key = os.environ.get('SAP_KEY').encode('utf-8')
-    f = Fernet(key)
-    token = f.encrypt(string.encode('utf-8'))
-    return token
+    return get_provider().encode(string)
 
 
 def secret_decode(token):
     """Decrypt the secret string"""
-    key = os.environ.get('SAP_KEY').encode('utf-8')
-    f = Fernet(key)
-    value = f.decrypt(token.encode('utf-8')).decode('utf-8')
-    return value
+    return get_provider().decode(token)
+
+
+def reencrypt_workbook(config_path, output_path=None, secret_keys=SECRET_KEYS):
+    """
+    Re-encrypt the secrets of the global_configs sheet with the first key of SAP_KEY. The other sheets and the
+    formatting are kept. Returns the list of rows re-encrypted
+    """
+    import openpyxl  # only needed by this tool
+    provider = get_provider()
+    workbook = openpyxl.load_workbook(config_path)
+    sheet = workbook['global_configs']
+    header = [cell.value for cell in sheet[1]]
+    description, value = header.index('description') + 1, header.index('value') + 1
+    rotated = []
+    for row in range(2, sheet.max_row + 1):
+        key = sheet.cell(row, description).value
+        token = sheet.cell(row, value).value
+        if key in secret_keys and token:
+            sheet.cell(row, value).value = provider.rotate(str(token).strip())
+            rotated.append(key)
+    workbook.save(output_path or config_path)
+    return rotated
 
 
 if __name__ == '__main__':
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import pathlib
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refreshes (
+    filename TEXT PRIMARY KEY,
+    parameters_hash TEXT,
+    last_success TEXT,
+    last_attempt TEXT,
+    last_status TEXT,
+    last_error TEXT,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS timings (
+    filename TEXT,
+    recorded_at TEXT,
+    phase TEXT,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS timings_filename ON timings (filename, recorded_at);
+"""
+TOTAL_PHASE = 'total'  # phase name of the full duration of a report in the timings table
+HISTORY_SIZE = 5  # number of past refreshes used to predict the duration of a report
+
+
+class RefreshLedger:
+    """
+    Durable register (sqlite) of the refresh of each report: the last successful refresh and the hash of the
+    effective variables and filters used in it. A report is current when it was successfully refreshed today
+    with the same effective parameters, so a rerun of the batch can skip it.
+    The file can be opened by several worker processes at the same time
+    """
+    FILENAME = 'refresh_ledger.sqlite'
+
+    def __init__(self, directory):
+        self.path = pathlib.Path(directory) / self.FILENAME
+        self.connection = sqlite3.connect(str(self.path), timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """close the database"""
+        self.connection.close()
+
+    def get(self, filename):
+        """the row of a report (sqlite3.Row) or None when it was never refreshed"""
+        return self.connection.execute('SELECT * FROM refreshes WHERE filename = ?', (filename,)).fetchone()
+
+    def is_current(self, filename, parameters_hash, day=None):
+        """check if the report was already refreshed in the day with the same effective parameters"""
+        day = day or datetime.now().date()
+        row = self.get(filename)
+        if row is None or row['last_success'] is None or row['parameters_hash'] != parameters_hash:
+            return False
+        return datetime.fromisoformat(row['last_success']).date() == day
+
+    def record_success(self, filename, parameters_hash, duration=None):
+        """register a successful refresh"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO refreshes (filename, parameters_hash, last_success, last_attempt, last_status, '
+                'last_error, duration) VALUES (?, ?, ?, ?, ?, NULL, ?) '
+                'ON CONFLICT(filename) DO UPDATE SET parameters_hash = excluded.parameters_hash, '
+                'last_success = excluded.last_success, last_attempt = excluded.last_attempt, '
+                'last_status = excluded.last_status, last_error = NULL, duration = excluded.duration',
+                (filename, parameters_hash, now, now, 'SUCCESS', duration)
+            )
+
+    def record_timings(self, filename, timings, total=None):
+        """register the duration of each phase ({phase: seconds}) of a refresh and its total duration"""
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [(filename, now, phase, duration) for phase, duration in timings.items()]
+        if total is not None:
+            rows.append((filename, now, TOTAL_PHASE, total))
+        with self.connection:
+            self.connection.executemany('INSERT INTO timings VALUES (?, ?, ?, ?)', rows)
+
+    def expected_durations(self, filenames, history=HISTORY_SIZE):
+        """average total duration of the last refreshes of each report ({filename: seconds}, only known reports)"""
+        expected = dict()
+        for filename in filenames:
+            rows = self.connection.execute(
+                'SELECT duration FROM timings WHERE filename = ? AND phase = ? ORDER BY recorded_at DESC LIMIT ?',
+                (filename, TOTAL_PHASE, history)
+            ).fetchall()
+            if rows:
+                expected[filename] = sum(row['duration'] for row in rows) / len(rows)
+        return expected
+
+    def phase_durations(self, filename, history=HISTORY_SIZE):
+        """average duration of each phase in the last refreshes of a report ({phase: seconds})"""
+        rows = self.connection.execute(
+            'SELECT phase, AVG(duration) AS duration FROM (SELECT phase, duration, ROW_NUMBER() OVER '
+            '(PARTITION BY phase ORDER BY recorded_at DESC) AS position FROM timings WHERE filename = ?) '
+            'WHERE position <= ? GROUP BY phase',
+            (filename, history)
+        ).fetchall()
+        return {row['phase']: row['duration'] for row in rows}
+
+    def record_failure(self, filename, error):
+        """register a failed refresh. The last success is kept"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO refreshes (filename, last_attempt, last_status, last_error) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(filename) DO UPDATE SET last_attempt = excluded.last_attempt, '
+                'last_status = excluded.last_status, last_error = excluded.last_error',
+                (filename, now, 'ERROR', str(error))
+            )
+
+    def status(self, expected, day=None):
+        """
+        Situation of each report given the dictionary {filename: effective parameters hash}.
+        Returns a list of dictionaries with the state current, stale (parameters changed or old refresh),
+        failed (last attempt failed) or never (never refreshed)
+        """
+        day = day or datetime.now().date()
+        report = []
+        for filename, parameters_hash in expected.items():
+            row = self.get(filename)
+            if row is None or row['last_success'] is None:
+                state = 'failed' if row is not None else 'never'
+            elif self.is_current(filename, parameters_hash, day):
+                state = 'current'
+            elif row['last_status'] == 'ERROR':
+                state = 'failed'
+            else:
+                state = 'stale'
+            report.append({
+                'filename': filename,
+                'state': state,
+                'last_success': row['last_success'] if row is not None else None,
+                'last_status': row['last_status'] if row is not None else None,
+                'last_error': row['last_error'] if row is not None else None,
+            })
+        return report
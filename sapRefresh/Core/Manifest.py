@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import pathlib
+import hashlib
+
+from sapRefresh.Core.Cache import load_json, save_json
+
+CHUNK_SIZE = 1024 * 1024  # bytes read at a time to hash the files
+
+
+def file_hash(path):
+    """sha256 of the content of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class WorkbookManifest:
+    """
+    Register of the workbooks already processed by collect_information. For each workbook it keeps
+    the size, mtime and content hash, plus the location and hash of the export it produced (the entry of the
+    report in the metadata catalog, see Core.Catalog).
+    A workbook is unchanged when its export is still untouched and either its size and mtime are the same
+    or, when they differ, its content hash is the same
+    """
+    FILENAME = 'collect_manifest.json'
+
+    def __init__(self, directory):
+        self.path = pathlib.Path(directory) / self.FILENAME
+        self.entries = load_json(self.path, dict())
+
+    def is_unchanged(self, workbook_path, export, export_hash):
+        """
+        check if the workbook and its export are still the same as in the last collection.
+        export_hash is the current hash of the export (None when it doesn't exist anymore)
+        """
+        entry = self.entries.get(str(workbook_path))
+        if entry is None or entry.get('export') != str(export):
+            return False
+        if export_hash is None or export_hash != entry.get('export_sha256'):
+            return False
+        stat = pathlib.Path(workbook_path).stat()
+        if stat.st_size == entry.get('size') and stat.st_mtime == entry.get('mtime'):
+            return True
+        if file_hash(workbook_path) != entry.get('sha256'):
+            return False
+        # same content with a new mtime (e.g. copied file). Keep the new stat to use the fast path next time
+        entry.update(size=stat.st_size, mtime=stat.st_mtime)
+        self.save()
+        return True
+
+    def record(self, workbook_path, export, export_hash):
+        """register the workbook and the export produced from it (location and hash)"""
+        stat = pathlib.Path(workbook_path).stat()
+        self.entries[str(workbook_path)] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': file_hash(workbook_path),
+            'export': str(export),
+            'export_sha256': export_hash,
+        }
+        self.save()
+
+    def save(self):
+        """persist the manifest"""
+        save_json(self.path, self.entries)
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import json
+import pathlib
+from datetime import datetime
+
+from sapRefresh.Core.Cache import save_json
+
+LABELS = ('report', 'data_source', 'system')  # context labels attached to every metric
+BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)  # upper bounds (seconds) of the duration histogram
+PERCENTILES = (50, 90, 99)
+HISTORY_FILENAME = 'metrics_history.jsonl'
+HISTORY_RUNS = 30  # number of previous runs used to compute the percentiles
+PREFIX = 'sap_refresh'
+
+
+def percentile(values, percent):
+    """percentile with linear interpolation of a list of numbers"""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _format_labels(labels):
+    """labels in the prometheus text format: {key="value",...}"""
+    if not labels:
+        return ''
+    escaped = ('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' '))
+               for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+class MetricsRegistry:
+    """
+    Collect the metrics of a run: durations of each phase (timeit), counters of reports by status,
+    retries (tenacity) and COM calls (Application.Run). Every metric is labelled with the context
+    (report, data_source, system) active when it was recorded
+    """
+    def __init__(self):
+        self.context = dict()
+        self.durations = []  # list of [phase, labels, seconds]
+        self.counters = dict()  # (name, labels) -> value
+        self.started_at = datetime.now()
+
+    def set_context(self, **labels):
+        """define the labels of the next metrics. None removes a label"""
+        for key, value in labels.items():
+            if value is None:
+                self.context.pop(key, None)
+            else:
+                self.context[key] = str(value)
+
+    def clear_context(self):
+        """remove every context label"""
+        self.context = dict()
+
+    def _labels(self, **extra):
+        labels = {key: self.context[key] for key in LABELS if key in self.context}
+        labels.update({key: str(value) for key, value in extra.items()})
+        return tuple(sorted(labels.items()))
+
+    def observe(self, phase, seconds):
+        """register the duration of a phase"""
+        self.durations.append([phase, self._labels(), seconds])
+
+    def increment(self, name, amount=1, **labels):
+        """increment a counter"""
+        key = (name, self._labels(**labels))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    # listeners ---------------------------------------------------------------------------------------------------
+    def on_timing(self, name, seconds):
+        """listener of Core.Time.timeit"""
+        self.observe(name, seconds)
+
+    def on_run(self, macro, args, result, seconds, error):
+        """listener of the Application.Run calls (Refresh.Proxy)"""
+        self.increment('com_calls_total', macro=macro)
+        self.increment('com_call_seconds_total', seconds, macro=macro)
+        if error is not None:
+            self.increment('com_errors_total', macro=macro)
+
+    def on_retry(self, retry_state):
+        """before_sleep callback of tenacity"""
+        self.increment('retries_total', function=getattr(retry_state.fn, '__name__', 'unknown'))
+
+    # exchange between processes ----------------------------------------------------------------------------------
+    def snapshot(self):
+        """picklable copy of the metrics (used by the worker processes to send their metrics to the scheduler)"""
+        return {'durations': [list(item) for item in self.durations],
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()]}
+
+    def drain(self):
+        """return the snapshot and reset the metrics"""
+        snapshot = self.snapshot()
+        self.durations, self.counters = [], dict()
+        return snapshot
+
+    def merge(self, snapshot):
+        """add the metrics of a snapshot"""
+        if not snapshot:
+            return
+        for phase, labels, seconds in snapshot['durations']:
+            self.durations.append([phase, tuple(tuple(label) for label in labels), seconds])
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    # outputs -----------------------------------------------------------------------------------------------------
+    def phase_samples(self):
+        """{phase: [seconds, ...]} of the run, without labels"""
+        samples = dict()
+        for phase, _, seconds in self.durations:
+            samples.setdefault(phase, []).append(seconds)
+        return samples
+
+    def summary(self, history=None):
+        """dictionary with the totals of the run and the percentiles across the previous runs"""
+        history = history or []
+        summary = {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'phases': dict(),
+            'counters': dict(),
+        }
+        historical = dict()
+        for run in history:
+            for phase, values in run.get('phases', dict()).items():
+                historical.setdefault(phase, []).extend(values)
+        for phase, values in self.phase_samples().items():
+            summary['phases'][phase] = {
+                'count': len(values),
+                'sum': sum(values),
+                'run': {f'p{p}': percentile(values, p) for p in PERCENTILES},
+                'history': {f'p{p}': percentile(historical.get(phase, []), p) for p in PERCENTILES},
+            }
+        for (name, labels), value in self.counters.items():
+            key = name + _format_labels(labels)
+            summary['counters'][key] = value
+        return summary
+
+    def regressions(self, history, percent=90):
+        """phases whose median in this run is above the historical percentile (default p90)"""
+        historical = dict()
+        for run in history:
+            for phase, values in run.get('phases', dict()).items():
+                historical.setdefault(phase, []).extend(values)
+        slower = dict()
+        for phase, values in self.phase_samples().items():
+            limit = percentile(historical.get(phase, []), percent)
+            median = percentile(values, 50)
+            if limit is not None and median > limit:
+                slower[phase] = (median, limit)
+        return slower
+
+    def prometheus(self, history=None):
+        """metrics of the run in the prometheus textfile format"""
+        lines = []
+        # histogram of the durations, labelled by phase and context
+        name = f'{PREFIX}_phase_duration_seconds'
+        lines.append(f'# HELP {name} Duration of each phase of the refresh.')
+        lines.append(f'# TYPE {name} histogram')
+        series = dict()
+        for phase, labels, seconds in self.durations:
+            series.setdefault(tuple(sorted(labels + (('phase', phase),))), []).append(seconds)
+        for labels, values in sorted(series.items()):
+            for bucket in BUCKETS:
+                count = sum(1 for value in values if value <= bucket)
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bucket)),))} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {len(values)}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {sum(values):.6f}')
+            lines.append(f'{name}_count{_format_labels(labels)} {len(values)}')
+        # counters
+        names = sorted({counter for counter, _ in self.counters})
+        for counter in names:
+            metric = f'{PREFIX}_{counter}'
+            lines.append(f'# TYPE {metric} counter')
+            for (key, labels), value in sorted(self.counters.items()):
+                if key == counter:
+                    lines.append(f'{metric}{_format_labels(labels)} {value}')
+        # percentiles of each phase across the previous runs and this one
+        runs = list(history or []) + [{'phases': self.phase_samples()}]
+        samples = dict()
+        for run in runs:
+            for phase, values in run.get('phases', dict()).items():
+                samples.setdefault(phase, []).extend(values)
+        metric = f'{PREFIX}_phase_duration_history_seconds'
+        lines.append(f'# HELP {metric} Percentiles of the phase durations across the last runs.')
+        lines.append(f'# TYPE {metric} gauge')
+        for phase, values in sorted(samples.items()):
+            for p in PERCENTILES:
+                labels = (('phase', phase), ('quantile', str(p / 100)))
+                lines.append(f'{metric}{_format_labels(labels)} {percentile(values, p):.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, directory, name='sap_refresh'):
+        """
+        write <name>.prom (prometheus textfile) and <name>.json (summary) and append the run to the history.
+        Returns the paths of the files
+        """
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        history = load_history(directory)
+        prom_path = directory / f'{name}.prom'
+        temporary = prom_path.with_name(prom_path.name + '.tmp')  # textfile collectors must never read half files
+        temporary.write_text(self.prometheus(history), encoding='utf-8')
+        temporary.replace(prom_path)
+        json_path = directory / f'{name}.json'
+        save_json(json_path, self.summary(history))
+        with open(directory / HISTORY_FILENAME, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'started_at': self.started_at.isoformat(timespec='seconds'),
+                                   'phases': self.phase_samples()}) + '\n')
+        return prom_path, json_path
+
+
+def load_history(directory, runs=HISTORY_RUNS):
+    """last runs saved in the metrics history (list of dictionaries)"""
+    path = pathlib.Path(directory) / HISTORY_FILENAME
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as file:
+        lines = file.readlines()[-runs:]
+    history = []
+    for line in lines:
+        try:
+            history.append(json.loads(line))
+        except ValueError:
+            continue
+    return history
+
+
+# metrics of the current process
+registry = MetricsRegistry()
+
+
+def count_retries(callback):
+    """tenacity before_sleep that counts the retry in the registry before calling the original callback"""
+    def before_sleep(retry_state):
+        registry.on_retry(retry_state)
+        callback(retry_state)
+    return before_sleep
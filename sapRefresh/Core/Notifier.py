@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Email notifications of a batch. The emails are sent by a background thread that keeps one authenticated SMTP
+session for the whole run, so the refresh never waits for the mail server. The "mail-mode" of the global configs
+selects what is sent:
+    each   - one email per refreshed report (default)
+    digest - one summary email per batch with every report, its status and its duration
+    off    - no email
+The pending emails are flushed when the notifier is closed and when the process exits.
+"""
+import queue
+import atexit
+import smtplib
+import threading
+
+from sapRefresh.Core import Connection as Conn
+
+from sapRefresh.Core.base_logger import get_logger
+logger = get_logger(__name__)
+
+MODES = ('each', 'digest', 'off')
+PROCESS = 'SAP Refresh - Refresh Reports'
+FLUSH_TIMEOUT = 120  # max seconds waiting for the pending emails when the notifier is closed
+_STOP = object()  # sentinel that stops the sender thread
+
+
+class Notifier:
+    """Send the emails of a run from a background thread, using a single SMTP session"""
+    def __init__(self, config=None, mode='each', process=PROCESS, flush_timeout=FLUSH_TIMEOUT):
+        if mode not in MODES:
+            raise ValueError(f'Unknown mail-mode: {mode} (use one of {", ".join(MODES)})')
+        self.config = config
+        self.mode = mode
+        self.process = process
+        self.flush_timeout = flush_timeout
+        self.reports = []  # (filename, status, duration, message) of the digest
+        self.queue = queue.Queue()
+        self.thread = None
+        self.server = None
+        self.sent = 0
+        self.failed = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config=None, process=PROCESS):
+        if config is None:
+            from sapRefresh import get_global_configs
+            config = get_global_configs()
+        return cls(config, config.get_str('mail-mode', 'each').lower(), process,
+                   config.get_float('mail-flush_timeout', FLUSH_TIMEOUT))
+
+    # public interface --------------------------------------------------------------------------------------------
+    def report(self, filename, status, duration=None, message=None):
+        """notify the result of a report. In "each" mode only the refreshed reports are emailed, as before"""
+        if self.mode == 'digest':
+            with self._lock:
+                self.reports.append((filename, status, duration, message))
+        elif self.mode == 'each' and status == 'SUCCESS':
+            self.send(message or f'Relatorio atualizado -> {filename}', status)
+
+    def send(self, message_string, status_string, process_string=None):
+        """put an email in the queue of the sender thread"""
+        if self.mode == 'off':
+            return
+        if self.closed:
+            raise RuntimeError('The notifier is already closed')
+        message = Conn.build_email(message_string, status_string, process_string or self.process, self.config)
+        self._start()
+        self.queue.put(message)
+
+    def flush(self):
+        """send the digest and wait until every queued email is sent"""
+        if self.mode == 'digest':
+            with self._lock:
+                reports, self.reports = self.reports, []
+            if reports:
+                failures = sum(1 for _, status, _, _ in reports if status != 'SUCCESS')
+                self.send(self.digest(reports), 'ERROR' if failures else 'SUCCESS')
+        if self.thread is not None:
+            self.queue.put(_STOP)
+            self.thread.join(self.flush_timeout)
+            if self.thread.is_alive():
+                logger.error(f"The emails were not sent in {self.flush_timeout}s. {self.queue.qsize()} emails lost")
+            self.thread = None
+
+    def close(self):
+        """flush the pending emails and close the SMTP session"""
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    @staticmethod
+    def digest(reports):
+        """text of the summary of the batch"""
+        failures = sum(1 for _, status, _, _ in reports if status != 'SUCCESS')
+        lines = [f'{len(reports)} relatorios, {len(reports) - failures} atualizados, {failures} com erro', '']
+        width = max(len(str(filename)) for filename, _, _, _ in reports)
+        for filename, status, duration, message in reports:
+            duration = '' if duration is None else f'{duration:8.1f}s'
+            line = f'        {str(filename):<{width}}  {status:<8}{duration}'
+            if status != 'SUCCESS' and message:
+                line += f'  {message}'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    # sender thread -----------------------------------------------------------------------------------------------
+    def _start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='sap-notifier', daemon=True)
+            self.thread.start()
+            atexit.register(self.close)  # the thread is a daemon: never exit with emails in the queue
+
+    def _run(self):
+        try:
+            while True:
+                message = self.queue.get()
+                if message is _STOP:
+                    break
+                self._deliver(message)
+        finally:
+            self._disconnect()
+
+    def _deliver(self, message):
+        """send one email. The session is opened at the 1st email and reopened once if the server dropped it"""
+        recipients = [address.strip() for address in message['to'].split(',')]
+        for attempt in (1, 2):
+            try:
+                if self.server is None:
+                    self.server = Conn.smtp_login(self.config)
+                self.server.sendmail(message['from'], recipients, message.as_string())
+                self.sent += 1
+                return
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                self._disconnect()
+                if attempt == 2:
+                    error = e
+            except Exception as e:  # the refresh must never fail because of an email
+                self._disconnect()
+                error = e
+                break
+        self.failed += 1
+        logger.error(f"Couldn't send the email [{message['subject']}] ({error!r})")
+
+    def _disconnect(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+
+# notifier of the current process (used when refresh_report is called without a notifier)
+_state = {'notifier': None}
+
+
+def get_notifier():
+    """notifier of the process, created from the global configs at the first use"""
+    if _state['notifier'] is None or _state['notifier'].closed:
+        _state['notifier'] = Notifier.from_config()
+    return _state['notifier']
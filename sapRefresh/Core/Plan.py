@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Compile the data_sources and variables_filters sheets into one immutable plan per report. The sheets are grouped
+by filename once and the time intelligence values are replaced once per run, so the refresh of a report doesn't
+filter the dataframes again. Every plan is validated before any workbook is opened.
+A report can have several data sources (one row per crosstab in the data_sources sheet): the first one is the main
+data source of the report (its system limits the parallel refresh) and every restriction must belong to one of them.
+The SAP system of a data source is the one collected in the metadata catalog (SapGetSourceInfo System, see
+Core.Catalog.systems); the optional system column of the data_sources sheet overrides it.
+"""
+from collections import namedtuple
+
+from sapRefresh.Core.Cache import fingerprint
+
+COMMANDS = ('SAPSetFilter', 'SAPSetVariable')
+
+Restriction = namedtuple('Restriction', ['command', 'data_source', 'field', 'field_name', 'value'])
+PlanSource = namedtuple('PlanSource', ['data_source', 'system', 'query'])
+ReportPlan = namedtuple('ReportPlan', ['filename', 'data_source', 'system', 'sources', 'crosstabs', 'filters',
+                                       'variables', 'parameters_hash'])
+
+
+def _is_empty(value):
+    """empty cells of the config workbook are loaded by pandas as NaN"""
+    return value is None or (isinstance(value, float) and value != value) or str(value).strip() == ''
+
+
+def _resolve(value, dict_time_values):
+    """value of a restriction with the time intelligence reference (e.g. key_date) replaced"""
+    if isinstance(value, str) and value in dict_time_values:
+        return dict_time_values[value]
+    return value
+
+
+def parameters_hash(data_sources, restrictions):
+    """hash of the effective parameters of a report, used by the ledger to know if a refresh is still current"""
+    rows = [[str(value) for value in (item.command, item.data_source, item.field, item.value)] for item in restrictions]
+    # a report with a single data source keeps the hash of the previous versions
+    return fingerprint(', '.join(str(data_source) for data_source in data_sources), sorted(rows))
+
+
+def _sources(rows, systems):
+    """
+    data sources of the rows of a report in the data_sources sheet (the order of the sheet, without repetition).
+    systems is the dictionary {data_source: system} collected for the report
+    """
+    sources = dict()
+    for record in rows.to_dict('records'):
+        data_source = record.get('data_source')
+        if _is_empty(data_source) or data_source in sources:
+            continue
+        system, query = record.get('system'), record.get('query')
+        if _is_empty(system):
+            system = systems.get(data_source)
+        sources[data_source] = PlanSource(data_source, None if _is_empty(system) else system,
+                                          None if _is_empty(query) else query)
+    return tuple(sources.values())
+
+
+def compile_plans(data_sources, variables_filters, dict_time_values, filenames=None, systems=None):
+    """
+    plans of the reports (all the reports of data_sources when filenames is None). systems is the dictionary
+    {(filename, data_source): system} of the metadata catalog.
+    Returns ({filename: ReportPlan}, {filename: [problems]}): the reports with problems have no plan
+    """
+    if filenames is None:
+        filenames = list(data_sources['filename'].drop_duplicates())
+    report_systems = dict()
+    for (filename, data_source), system in (systems or dict()).items():
+        report_systems.setdefault(filename, dict())[data_source] = system
+    sources = {filename: rows for filename, rows in data_sources.groupby('filename', sort=False)}
+    restrictions = {filename: rows for filename, rows in variables_filters.groupby('filename', sort=False)}
+    plans, errors = dict(), dict()
+    for filename in filenames:
+        problems = []
+        rows = sources.get(filename)
+        if rows is None:
+            errors[filename] = ['the report is not in the data_sources sheet']
+            continue
+        report_sources = _sources(rows, report_systems.get(filename, dict()))
+        if not report_sources:
+            problems.append('the data source is empty')
+        aliases = {source.data_source for source in report_sources}
+        crosstabs = tuple(rows['crosstab'].dropna().unique()) if 'crosstab' in rows.columns else ()
+        items = []
+        report_restrictions = restrictions.get(filename)
+        records = report_restrictions.to_dict('records') if report_restrictions is not None else []
+        for position, record in enumerate(records, start=1):
+            item = Restriction(record.get('command'), record.get('data_source'), record.get('field'),
+                               record.get('field_name', record.get('field')),
+                               _resolve(record.get('value'), dict_time_values))
+            if item.command not in COMMANDS:
+                problems.append(f'restriction #{position} has an unknown command ({item.command})')
+            for column in ('data_source', 'field', 'value'):
+                if _is_empty(getattr(item, column)):
+                    problems.append(f'restriction #{position} ({item.command} {item.field_name}) has no {column}')
+            if not _is_empty(item.data_source) and item.data_source not in aliases:
+                problems.append(f'restriction #{position} ({item.command} {item.field_name}) refers to the data '
+                                f'source {item.data_source}, which is not a data source of the report')
+            items.append(item)
+        if problems:
+            errors[filename] = problems
+            continue
+        plans[filename] = ReportPlan(
+            filename=filename,
+            data_source=report_sources[0].data_source,
+            system=next((source.system for source in report_sources if source.system), None),
+            sources=report_sources,
+            crosstabs=crosstabs,
+            filters=tuple(item for item in items if item.command == 'SAPSetFilter'),
+            variables=tuple(item for item in items if item.command == 'SAPSetVariable'),
+            parameters_hash=parameters_hash([source.data_source for source in report_sources], items),
+        )
+    return plans, errors
+
+
+def format_plan(plan):
+    """text of a plan, printed by the dry run"""
+    sources = ', '.join(f'{source.data_source} ({source.system or "-"})' for source in plan.sources)
+    lines = [f'[{plan.filename}] data sources {sources}'
+             + (f', export {", ".join(plan.crosstabs)}' if plan.crosstabs else '')]
+    for item in plan.filters + plan.variables:
+        lines.append(f'\t{item.command:<15}{str(item.data_source):<10}{str(item.field_name):<30}{str(item.field):<30}'
+                     f'{item.value}')
+    return '\n'.join(lines)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Reachability probe of the servers used by the application (SAP BW application servers, SMTP server and the host
+of the config share). The endpoints are checked concurrently with asyncio and the results are cached for
+"ping-ttl" seconds, so a batch of reports pays the probe once. The sockets are always closed and the global
+socket defaults are never changed.
+"""
+import time
+import asyncio
+from collections import namedtuple
+from pathlib import PureWindowsPath
+
+from sapRefresh.Core.Retry import adaptive_retry
+
+from sapRefresh.Core.base_logger import get_logger
+logger = get_logger(__name__)
+
+DEFAULT_TTL = 300  # seconds the result of a probe stays valid
+DEFAULT_TIMEOUT = 3  # seconds to open the connection
+SMB_PORT = 445  # port of the windows file shares (host of the config workbook)
+
+# required endpoints must be reachable to refresh a report, the others only produce a warning
+Endpoint = namedtuple('Endpoint', ['name', 'host', 'port', 'required'])
+ProbeResult = namedtuple('ProbeResult', ['endpoint', 'reachable', 'latency', 'error', 'checked_at', 'cached'])
+
+
+def parse_endpoints(text, name='sap', required=True):
+    """endpoints of a comma separated list of host:port"""
+    endpoints = []
+    for item in str(text).split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(':')
+        if not host or not port.isdigit():
+            raise ValueError(f'The endpoint "{item}" must be in the format host:port')
+        endpoints.append(Endpoint(name, host, int(port), required))
+    return endpoints
+
+
+def endpoints_from_config(config):
+    """
+    endpoints of the global configs:
+        - ping-host / ping-port and the optional ping-endpoints (host:port,...): SAP servers, required
+        - mail-server / mail-port: SMTP server, optional
+        - host of path-config_directory when it is a network share (\\\\host\\share): optional
+    """
+    endpoints = []
+    if 'ping-host' in config:
+        endpoints.append(Endpoint('sap', config.get_str('ping-host'), config.get_int('ping-port'), True))
+    if 'ping-endpoints' in config:
+        endpoints += parse_endpoints(config.get_str('ping-endpoints'))
+    if 'mail-server' in config and 'mail-port' in config:
+        endpoints.append(Endpoint('smtp', config.get_str('mail-server'), config.get_int('mail-port'), False))
+    if 'path-config_directory' in config:
+        share = PureWindowsPath(config.get_str('path-config_directory')).drive
+        if share.startswith('\\\\'):
+            endpoints.append(Endpoint('config share', share.lstrip('\\').split('\\')[0], SMB_PORT, False))
+    return endpoints
+
+
+async def _probe(endpoint, timeout):
+    """open and close a TCP connection to the endpoint"""
+    start_time = time.perf_counter()
+    writer = None
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(endpoint.host, endpoint.port), timeout)
+        return ProbeResult(endpoint, True, time.perf_counter() - start_time, None, None, False)
+    except (OSError, asyncio.TimeoutError) as e:
+        return ProbeResult(endpoint, False, None, repr(e), None, False)
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+async def _probe_all(endpoints, timeout):
+    return await asyncio.gather(*(_probe(endpoint, timeout) for endpoint in endpoints))
+
+
+class ProbeService:
+    """Concurrent probe of endpoints with a cache of the results"""
+    def __init__(self, ttl=DEFAULT_TTL, timeout=DEFAULT_TIMEOUT, clock=time.monotonic):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.clock = clock
+        self.cache = dict()  # (host, port) -> ProbeResult
+        self.hits = 0
+        self.probes = 0
+
+    def _cached(self, endpoint):
+        result = self.cache.get((endpoint.host, endpoint.port))
+        if result is not None and self.clock() - result.checked_at < self.ttl:
+            return result._replace(endpoint=endpoint, cached=True)
+        return None
+
+    def probe(self, endpoints):
+        """list of ProbeResult in the order of the endpoints. Only the endpoints without a valid cache are probed"""
+        results = {endpoint: self._cached(endpoint) for endpoint in endpoints}
+        pending = list({(endpoint.host, endpoint.port): endpoint
+                        for endpoint, result in results.items() if result is None}.values())
+        self.hits += len(endpoints) - len(pending)
+        if pending:
+            self.probes += len(pending)
+            for result in asyncio.run(_probe_all(pending, self.timeout)):
+                result = result._replace(checked_at=self.clock())
+                self.cache[(result.endpoint.host, result.endpoint.port)] = result
+                for endpoint in endpoints:
+                    if (endpoint.host, endpoint.port) == (result.endpoint.host, result.endpoint.port):
+                        results[endpoint] = result._replace(endpoint=endpoint)
+        return [results[endpoint] for endpoint in endpoints]
+
+    def forget(self, endpoint):
+        """remove the result of an endpoint from the cache, so the next probe checks it again"""
+        self.cache.pop((endpoint.host, endpoint.port), None)
+
+    def clear(self):
+        self.cache = dict()
+
+
+# probe service of the current process
+_state = {'service': None}
+
+
+def get_service(config=None):
+    """probe service of the process, configured with "ping-ttl" and "ping-timeout" of the global configs"""
+    if _state['service'] is None:
+        if config is None:
+            from sapRefresh import get_global_configs
+            config = get_global_configs()
+        _state['service'] = ProbeService(config.get_float('ping-ttl', DEFAULT_TTL),
+                                         config.get_float('ping-timeout', DEFAULT_TIMEOUT))
+    return _state['service']
+
+
+@adaptive_retry
+def ensure_reachable(config):
+    """
+    Probe the endpoints of the global configs. Raise ConnectionError when a required endpoint is unreachable
+    and log a warning for the optional ones (once per probe, not for the cached results)
+    """
+    service = get_service(config)
+    results = service.probe(endpoints_from_config(config))
+    unreachable = []
+    for result in results:
+        endpoint = result.endpoint
+        if result.reachable:
+            continue
+        if endpoint.required:
+            service.forget(endpoint)  # the retry must probe the server again
+            unreachable.append(f'{endpoint.host}:{endpoint.port}')
+        elif not result.cached:
+            logger.warning(f"The {endpoint.name} server {endpoint.host}:{endpoint.port} is unreachable ({result.error})")
+    if unreachable:
+        raise ConnectionError(f"Error! Couldn't connect to {', '.join(unreachable)}", results)
+    return results
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Retry policy of the calls to Excel, SAP AfO and the network. The errors are classified as transient
+(the call can succeed if repeated: timeouts, busy Excel, server unavailable), permanent (missing file,
+bad key, rejected logon, command rejected by SAP AfO, workbook that doesn't match its plan) or unknown. Transient
+and unknown errors are retried with exponential backoff and jitter, permanent errors are raised at once. A circuit breaker by SAP
+system stops a batch from hammering a system that is down; only the transient errors count as the system down.
+
+Optional rows of the global_configs sheet (defaults in RetryPolicy):
+    retry-attempts, retry-wait_initial, retry-wait_max, retry-jitter, circuit-failures, circuit-reset_timeout
+"""
+import time
+import socket
+import functools
+
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential, wait_random, before_sleep_log
+
+from sapRefresh.Core import Metrics
+
+import logging
+from sapRefresh.Core.base_logger import get_logger
+logger = get_logger(__name__)
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+UNKNOWN = 'unknown'
+
+# HRESULTs of pywintypes.com_error (signed 32 bits, as in e.args[0])
+DISP_E_EXCEPTION = -2147352567  # the error of the automation server is in excepinfo
+TRANSIENT_HRESULTS = {
+    -2147418111,  # RPC_E_CALL_REJECTED: Excel is busy
+    -2147417846,  # RPC_E_SERVERCALL_RETRYLATER
+    -2147417848,  # RPC_E_DISCONNECTED: the Excel process died
+    -2147023174,  # RPC_S_SERVER_UNAVAILABLE
+    -2147023170,  # RPC_S_CALL_FAILED
+    -2146959355,  # CO_E_SERVER_EXEC_FAILURE: Excel couldn't start
+    -2147467259,  # E_FAIL
+}
+PERMANENT_HRESULTS = {
+    -2147352573,  # DISP_E_MEMBERNOTFOUND
+    -2147352570,  # DISP_E_UNKNOWNNAME: macro or method that doesn't exist
+    -2147352571,  # DISP_E_TYPEMISMATCH
+    -2147352562,  # DISP_E_BADPARAMCOUNT
+    -2147024809,  # E_INVALIDARG
+    -2147024891,  # E_ACCESSDENIED
+    -2147287038,  # STG_E_FILENOTFOUND
+    -2146827284,  # Excel error raised by Workbooks.Open when the file can't be found or opened
+}
+# python exceptions that never succeed when repeated. PermissionError is not here: the config workbook
+# is locked while someone has it open in Excel
+PERMANENT_ERRORS = (FileNotFoundError, IsADirectoryError, NotADirectoryError, TypeError, ValueError, KeyError,
+                    AttributeError, NotImplementedError)
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, socket.timeout, socket.gaierror)
+
+
+class PermanentError(Exception):
+    """Base of the errors that must never be retried"""
+
+
+class CircuitOpenError(PermanentError):
+    """The circuit breaker of the SAP system is open: the call was not attempted"""
+
+
+class LogonRejectedError(PermanentError):
+    """SAP AfO rejected the logon (e.g. wrong client, user or password)"""
+
+
+class WorkbookError(PermanentError):
+    """The workbook can't be refreshed as configured (no SAP AfO crosstab, data source out of the workbook...)"""
+
+
+class SapCommandError(PermanentError):
+    """SAP AfO answered a command (Refresh, RefreshData, SetRefreshBehaviour...) with a failure result"""
+
+
+def _com_hresults(error):
+    """HRESULT of a pywintypes.com_error and, for DISP_E_EXCEPTION, the scode of the automation server"""
+    args = getattr(error, 'args', ())
+    hresult = args[0] if args and isinstance(args[0], int) else None
+    scode = None
+    if hresult == DISP_E_EXCEPTION and len(args) > 2 and isinstance(args[2], tuple) and len(args[2]) > 5:
+        scode = args[2][5]
+    return hresult, scode
+
+
+def classify(error):
+    """TRANSIENT, PERMANENT or UNKNOWN (the errors of no known class, still retried as before)"""
+    if isinstance(error, PermanentError):
+        return PERMANENT
+    if type(error).__name__ == 'com_error':  # pywintypes is only available on Windows
+        hresult, scode = _com_hresults(error)
+        for code in (scode, hresult):
+            if code in PERMANENT_HRESULTS:
+                return PERMANENT
+            if code in TRANSIENT_HRESULTS:
+                return TRANSIENT
+        return UNKNOWN  # e.g. a VBA error of a broken workbook: retried, but not a sign that the system is down
+    if type(error).__name__ == 'InvalidToken':  # cryptography: the SAP_KEY can't decrypt the secrets
+        return PERMANENT
+    if isinstance(error, TRANSIENT_ERRORS):
+        return TRANSIENT
+    if isinstance(error, PERMANENT_ERRORS):
+        return PERMANENT
+    return UNKNOWN
+
+
+def is_transient(error):
+    """whether the error is worth a retry: the transient and the unknown errors"""
+    return classify(error) != PERMANENT
+
+
+class RetryPolicy:
+    """parameters of the retries and of the circuit breakers"""
+    def __init__(self, attempts=4, wait_initial=2.0, wait_max=60.0, jitter=2.0, circuit_failures=3,
+                 circuit_reset_timeout=600.0):
+        self.attempts = attempts  # total of attempts, the first one included
+        self.wait_initial = wait_initial  # seconds before the 1st retry, doubled at each retry
+        self.wait_max = wait_max
+        self.jitter = jitter  # random seconds added to each wait, so the workers don't retry together
+        self.circuit_failures = circuit_failures  # consecutive transient failures that open the circuit
+        self.circuit_reset_timeout = circuit_reset_timeout  # seconds before a system is tried again
+
+    @classmethod
+    def from_config(cls, config):
+        default = cls()
+        return cls(
+            attempts=config.get_int('retry-attempts', default.attempts),
+            wait_initial=config.get_float('retry-wait_initial', default.wait_initial),
+            wait_max=config.get_float('retry-wait_max', default.wait_max),
+            jitter=config.get_float('retry-jitter', default.jitter),
+            circuit_failures=config.get_int('circuit-failures', default.circuit_failures),
+            circuit_reset_timeout=config.get_float('circuit-reset_timeout', default.circuit_reset_timeout),
+        )
+
+    def retrying(self, before_sleep=None):
+        """tenacity Retrying object of the policy"""
+        return Retrying(
+            reraise=True,
+            retry=retry_if_exception(is_transient),
+            stop=stop_after_attempt(max(1, self.attempts)),
+            wait=wait_exponential(multiplier=self.wait_initial, max=self.wait_max) + wait_random(0, self.jitter),
+            before_sleep=before_sleep,
+        )
+
+
+def get_policy():
+    """policy of the global configs. The defaults are used while the config workbook can't be read"""
+    try:
+        from sapRefresh import get_global_configs
+        return RetryPolicy.from_config(get_global_configs())
+    except Exception as e:
+        logger.debug(f'Using the default retry policy ({e!r})')
+        return RetryPolicy()
+
+
+def adaptive_retry(func):
+    """retry the decorated function when it raises a transient error, following the policy of the global configs"""
+    before_sleep = Metrics.count_retries(before_sleep_log(logger, logging.DEBUG))
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retrying = get_policy().retrying(before_sleep)
+        return retrying(func, *args, **kwargs)
+    return wrapper
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a SAP system. After circuit_failures consecutive transient failures (network and COM errors,
+    not the unknown ones, which can come from the workbook or the config) the circuit opens and
+    every call fails at once (CircuitOpenError). After reset_timeout seconds one trial call is let through
+    (half open): a success closes the circuit, a failure opens it again
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, system, failures=3, reset_timeout=600.0, clock=time.monotonic):
+        self.system = system
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def check(self):
+        """raise CircuitOpenError when the system must not be called"""
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f'The SAP system {self.system} is unavailable (circuit open after '
+                                       f'{self.consecutive_failures} consecutive failures)')
+            self.state = self.HALF_OPEN
+            logger.info(f'Trying the SAP system {self.system} again (circuit half open)')
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f'The SAP system {self.system} is available again (circuit closed)')
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self, error):
+        """
+        register the failure of a call. Only the transient errors indicate that the system is down. The breaker
+        of the unknown system (None) never opens: it would stop the reports of every system
+        """
+        if self.system is None or classify(error) != TRANSIENT:
+            return
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failures:
+            if self.state != self.OPEN:
+                logger.warning(f'The SAP system {self.system} failed {self.consecutive_failures} times in a row. '
+                               f'Its reports are skipped for {self.reset_timeout:.0f} seconds')
+                Metrics.registry.increment('circuit_opened_total', system=self.system)
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+
+# circuit breakers of the current process by SAP system
+_breakers = dict()
+
+
+def get_breaker(system, policy=None):
+    """circuit breaker of a SAP system (None for the reports whose system is unknown, which is never opened)"""
+    if system not in _breakers:
+        policy = policy or get_policy()
+        _breakers[system] = CircuitBreaker(system, policy.circuit_failures, policy.circuit_reset_timeout)
+    return _breakers[system]
+
+
+def reset_breakers():
+    """forget the state of every circuit breaker"""
+    _breakers.clear()
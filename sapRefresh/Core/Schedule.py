@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import re
+import heapq
+from datetime import datetime, timedelta, time
+
+from sapRefresh.Core.base_logger import get_logger
+logger = get_logger(__name__)
+
+DEADLINE_PATTERN = re.compile(r'^(\d{1,2})\s*(?:[:hH]\s*(\d{2})?)?(?::\d{2})?$')  # 8, 8h, 8h30, 08:30, 08:30:00
+DEFAULT_DURATION = 300  # seconds assumed for a report without history (when no report has history)
+ORDERS = ('config', 'longest', 'deadline')
+
+
+def fill_durations(filenames, expected):
+    """
+    expected duration of every report. Reports without history take the median of the known ones,
+    so they are neither pushed to the end nor to the beginning of the queue
+    """
+    known = sorted(expected.values())
+    default = known[len(known) // 2] if known else DEFAULT_DURATION
+    return {filename: expected.get(filename, default) for filename in filenames}
+
+
+def parse_deadline(value, day=None):
+    """
+    convert a deadline cell to a datetime of the day: HH:MM text (also 8, 8h or 8h30), datetime.time, datetime,
+    a number of hours or the fraction of the day of an Excel time cell (0.5 = 12:00).
+    None if empty or invalid: a bad cell is logged and the report is scheduled without deadline
+    """
+    day = day or datetime.now().date()
+    if value is None or (isinstance(value, float) and value != value) or str(value).strip() == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, time):
+        return datetime.combine(day, value)
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Excel stores the times as fractions of the day. A whole number is an hour (a cell typed as 8)
+            seconds = round(value * 86400) if 0 <= value < 1 else round(value * 3600)
+            return datetime.combine(day, time(*divmod(seconds // 60, 60)))
+        match = DEADLINE_PATTERN.match(str(value).strip())
+        if match is None:
+            return parse_deadline(float(str(value).strip()), day)
+        return datetime.combine(day, time(int(match.group(1)), int(match.group(2) or 0)))
+    except (TypeError, ValueError):
+        logger.warning(f'The deadline {value!r} is not a time (HH:MM). The report has no deadline')
+        return None
+
+
+def order_reports(filenames, durations, order='config', deadlines=None, priorities=None):
+    """
+    Sort the reports of the batch:
+        - config: the order of the data_sources sheet
+        - longest: longest job first, which reduces the makespan when the reports run in parallel
+        - deadline: earliest deadline first, then lowest priority number, then longest job first.
+                    Reports without deadline go after the ones with a deadline
+    """
+    if order not in ORDERS:
+        raise ValueError(f'The schedule order must be one of {ORDERS} (got {order!r})')
+    filenames = list(filenames)
+    if order == 'config':
+        return filenames
+    if order == 'longest':
+        return sorted(filenames, key=lambda filename: -durations[filename])
+    deadlines = deadlines or dict()
+    priorities = priorities or dict()
+
+    def deadline_key(filename):
+        deadline = deadlines.get(filename)
+        priority = priorities.get(filename)
+        return (
+            deadline is None,
+            deadline or datetime.max,
+            priority if priority is not None else float('inf'),
+            -durations[filename],
+        )
+    return sorted(filenames, key=deadline_key)
+
+
+def predict_completion(filenames, durations, workers=1, start=None):
+    """
+    Simulate the batch: each report, in order, goes to the first worker that becomes free.
+    Returns the predicted end of the batch and the predicted end of each report ({filename: datetime})
+    """
+    start = start or datetime.now()
+    free_at = [(0.0, worker) for worker in range(max(1, workers))]  # heap of (seconds until free, worker)
+    heapq.heapify(free_at)
+    finishes = dict()
+    for filename in filenames:
+        available, worker = heapq.heappop(free_at)
+        end = available + durations[filename]
+        finishes[filename] = start + timedelta(seconds=end)
+        heapq.heappush(free_at, (end, worker))
+    makespan = max((seconds for seconds, _ in free_at), default=0.0)
+    return start + timedelta(seconds=makespan), finishes
@@ -5,6 +5,7 @@ Author: Arnold Souza
 Email: arnoldporto@gmail.com
 """
 import functools
+import threading
 from datetime import datetime
 import time
 
@@ -13,6 +14,46 @@ from dateutil.relativedelta import relativedelta
 
 from halo import Halo  # spinners for long running methods in terminal
 
+# callables(name, seconds) notified of every duration measured by timeit
+_timing_listeners = []
+# stack of the functions decorated by timeit running in each thread (phase of the logs)
+_phases = threading.local()
+
+
+def current_phase():
+    """name of the innermost function decorated by timeit running in the current thread (None outside them)"""
+    stack = getattr(_phases, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def add_timing_listener(listener):
+    """register a callable(name, seconds) that receives every duration measured by timeit"""
+    if listener not in _timing_listeners:
+        _timing_listeners.append(listener)
+
+
+def remove_timing_listener(listener):
+    """stop notifying a listener registered with add_timing_listener"""
+    if listener in _timing_listeners:
+        _timing_listeners.remove(listener)
+
+
+class TimingRecorder:
+    """Context manager that accumulates the durations measured by timeit (in seconds) by function name"""
+    def __init__(self):
+        self.timings = dict()
+
+    def __call__(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def __enter__(self):
+        add_timing_listener(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        remove_timing_listener(self)
+        return False
+
 
 def timeit(func):
     """Print the runtime of the decorated function"""
@@ -26,13 +67,20 @@ def timeit(func):
         spinner = Halo(text='Loading', spinner='dots')
         spinner.start()
 
-        value = func(*args, **kwargs)
+        stack = _phases.__dict__.setdefault('stack', [])
+        stack.append(func.__name__)
+        try:
+            value = func(*args, **kwargs)
+        finally:
+            stack.pop()
 
         # stop waiting spinner
         spinner.stop()
 
         end_time = time.perf_counter()  # 2
         run_time = end_time - start_time  # 3
+        for listener in list(_timing_listeners):
+            listener(func.__name__, run_time)
         if run_time < 60:
             print(f"Finished {func.__name__!r} in {run_time:.2f} seconds\n")
         if 60 <= run_time < 3600:
@@ -5,35 +5,173 @@ Author: Arnold Souza
 Email: arnoldporto@gmail.com
 """
 import sys
+import json
+import queue
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
+import threading
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime
 
+# string formatter
+FORMAT_STRING = '%(asctime)s | %(name)s | %(module)s | %(funcName)s | [%(levelname)s] | %(message)s'
+CONTEXT_FIELDS = ('report', 'data_source', 'system', 'phase')  # context attached to every record
 
-def get_logger(logger_name, log_path):
-    # string formatter
-    format_string = '%(asctime)s | %(name)s | %(module)s | %(funcName)s | [%(levelname)s] | %(message)s'
-    logFormatter = logging.Formatter(format_string, datefmt='%Y%m%d %H:%M')
 
-    # initiate root logger
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
+def _default_log_path():
+    """directory of the logs defined in the global configs (only resolved when the first record is written)"""
+    from sapRefresh import get_log_path
+    return get_log_path()
 
-    # set up console logger
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.DEBUG)
-    console_handler.setFormatter(logFormatter)
-    logger.addHandler(console_handler)
 
-    # set up file logger
+def get_log_filepath(log_path=None, suffix='.log'):
+    """path of the log file of the day"""
+    if log_path is None:
+        log_path = _default_log_path()
     log_filename = datetime.now().strftime("%Y%m%d")
-    location = log_path / f'{log_filename}.log'  # create a path do the log
-    logfile_handler = TimedRotatingFileHandler(location, when='D', interval=1, backupCount=30)
+    return log_path / f'{log_filename}{suffix}'  # create a path do the log
+
+
+class JsonFormatter(logging.Formatter):
+    """one json object per record, with the report and phase context"""
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='seconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ContextFilter(logging.Filter):
+    """add the context of the run (report, data source, system and timeit phase) to the records"""
+    def filter(self, record):
+        from sapRefresh.Core import Metrics  # imported here: Metrics uses the logger too
+        from sapRefresh.Core.Time import current_phase
+        context = Metrics.registry.context
+        for field in ('report', 'data_source', 'system'):
+            setattr(record, field, context.get(field))
+        record.phase = current_phase()
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler shared by all the loggers. The listener of the pipeline is started by the first record"""
+    def emit(self, record):
+        if not _pipeline['started']:
+            start_logging()
+        super().emit(record)
+
+
+def _json_enabled():
+    """whether "log-json" is yes (no when the global configs can't be read)"""
+    try:
+        from sapRefresh import get_global_configs
+        return get_global_configs().get_bool('log-json', False)
+    except Exception:
+        return False
+
+
+def _file_handlers(log_path, formatter):
+    """daily log file and, with "log-json" = yes, the daily json lines file"""
+    if log_path is None:
+        log_path = _default_log_path()
+    logfile_handler = TimedRotatingFileHandler(get_log_filepath(log_path), when='D', interval=1, backupCount=30)
     logfile_handler.setLevel(logging.INFO)  # do not print DEBUG messages to file
-    logfile_handler.setFormatter(logFormatter)
-    logger.addHandler(logfile_handler)
+    logfile_handler.setFormatter(formatter)
+    handlers = [logfile_handler]
+    if _json_enabled():
+        json_handler = TimedRotatingFileHandler(get_log_filepath(log_path, '.jsonl'), when='D', interval=1,
+                                                backupCount=30)
+        json_handler.setLevel(logging.INFO)
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+    return handlers
+
+
+# logging pipeline of the process: every logger puts its records in a queue and a single listener thread writes
+# them to the console and to the log files, so the refresh never waits for the network share.
+# Getting a logger only creates the queue: the listener thread is started by the first record
+_pipeline = {'queue_handler': None, 'listener': None, 'log_path': None, 'started': False}
+_pipeline_lock = threading.RLock()
+
+
+def configure_logging(log_path=None):
+    """
+    Create the QueueHandler shared by all the loggers of the process (only once). Nothing is started and
+    nothing is read: see start_logging. When log_path is None the directory of the global configs is used
+    """
+    with _pipeline_lock:
+        if _pipeline['queue_handler'] is None:
+            queue_handler = LazyQueueHandler(queue.Queue(-1))
+            queue_handler.addFilter(ContextFilter())
+            _pipeline.update(queue_handler=queue_handler, log_path=log_path)
+        return _pipeline['queue_handler']
+
+
+def start_logging():
+    """
+    Start the listener of the pipeline with the console, the daily log file and the optional json lines file.
+    The log directory is resolved here, on the thread of the first record, and only once: when it can't be
+    resolved (e.g. the config workbook is unreachable) the records only go to the console
+    """
+    with _pipeline_lock:
+        if _pipeline['started']:
+            return
+        queue_handler = configure_logging()
+        # set first: the records emitted while the log directory is resolved are only queued
+        _pipeline['started'] = True
+        logFormatter = logging.Formatter(FORMAT_STRING, datefmt='%Y%m%d %H:%M')
+        # set up console logger
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.DEBUG)
+        console_handler.setFormatter(logFormatter)
+        handlers = [console_handler]
+        # set up file loggers
+        try:
+            handlers += _file_handlers(_pipeline['log_path'], logFormatter)
+        except Exception as e:
+            sys.stderr.write(f"Couldn't open the log files ({e!r}). The logs are only written to the console\n")
+        listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(shutdown_logging)  # write the pending records before the process ends
+        _pipeline['listener'] = listener
+
+
+def shutdown_logging():
+    """write the pending records and close the log files"""
+    with _pipeline_lock:
+        listener = _pipeline['listener']
+        if listener is not None:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        for logger in logging.Logger.manager.loggerDict.values():
+            if isinstance(logger, logging.Logger) and _pipeline['queue_handler'] in logger.handlers:
+                logger.removeHandler(_pipeline['queue_handler'])
+        _pipeline.update(queue_handler=None, listener=None, log_path=None, started=False)
+
+
+def get_logger(logger_name, log_path=None):
+    """
+    get a logger with console and file output. All the loggers share the same pipeline (see configure_logging),
+    so getting a logger again never adds handlers. The pipeline is only started when the first record is written
+    """
+    queue_handler = configure_logging(log_path)
+
+    # initiate root logger
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(logging.DEBUG)
+    if queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
 
-    return logger, location
+    return logger
 
 # Log some messages
 # logger.debug("Debug message")
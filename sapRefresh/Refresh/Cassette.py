@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Record the SAP AfO calls (Application.Run) of a production run into a cassette file (json lines) and replay them
+later without Excel or SAP. Each line of the cassette has the macro, its arguments (secrets redacted),
+the return value, the latency and the error (if any). A replayed error is a permanent error (see Core.Retry):
+the replay never waits for the backoff of the retries.
+"""
+import json
+import time
+import pathlib
+import contextlib
+from collections import deque, defaultdict
+
+from sapRefresh.Core.Metrics import percentile
+from sapRefresh.Core.Retry import PermanentError
+from sapRefresh.Refresh import Proxy
+from sapRefresh.Refresh.FakeExcel import FakeApplication
+
+REDACTED = '***'
+# positions of the arguments that must never be written to a cassette
+SECRET_ARGUMENTS = {
+    'SAPLogon': (2, 3),  # source, client, user, password
+}
+
+
+def redact(macro, args):
+    """copy of the arguments with the secrets replaced"""
+    args = list(args)
+    for position in SECRET_ARGUMENTS.get(macro, ()):
+        if position < len(args):
+            args[position] = REDACTED
+    return args
+
+
+def _to_json(value):
+    """convert the values returned by COM (tuples, pywintypes.datetime, ...) to json types"""
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _from_json(value):
+    """AfO returns tuples, never lists"""
+    if isinstance(value, list):
+        return tuple(_from_json(item) for item in value)
+    return value
+
+
+def _key(macro, args):
+    return macro + '|' + json.dumps(_to_json(list(args)), sort_keys=True)
+
+
+class CassetteRecorder:
+    """Listener of the Application.Run calls that appends each call to the cassette file"""
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.calls = 0
+
+    def __call__(self, macro, args, result, seconds, error):
+        entry = {
+            'macro': macro,
+            'args': _to_json(redact(macro, args)),
+            'result': _to_json(result),
+            'seconds': round(seconds, 6),
+            'error': None if error is None else repr(error),
+        }
+        self.file.write(json.dumps(entry) + '\n')
+        self.calls += 1
+
+    def close(self):
+        self.file.close()
+
+
+@contextlib.contextmanager
+def recording(path):
+    """record all the Application.Run calls done inside the block. Does nothing when path is None"""
+    if path is None:
+        yield None
+        return
+    recorder = CassetteRecorder(path)
+    Proxy.add_run_listener(recorder)
+    try:
+        yield recorder
+    finally:
+        Proxy.remove_run_listener(recorder)
+        recorder.close()
+
+
+def load(path):
+    """entries of a cassette"""
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def profile(entries):
+    """latency profile of each macro: {macro: {'calls', 'total', 'mean', 'p50', 'p90', 'max'}}"""
+    latencies = defaultdict(list)
+    for entry in entries:
+        latencies[entry['macro']].append(entry['seconds'])
+    return {
+        macro: {
+            'calls': len(values),
+            'total': sum(values),
+            'mean': sum(values) / len(values),
+            'p50': percentile(values, 50),
+            'p90': percentile(values, 90),
+            'max': max(values),
+        } for macro, values in latencies.items()
+    }
+
+
+class CassetteMissError(PermanentError, LookupError):
+    """The replay received a call that is not in the cassette"""
+
+
+class ReplayedError(PermanentError):
+    """Error recorded in the cassette, raised again by the replay"""
+
+
+class CassettePlayer:
+    """
+    Answer the Application.Run calls with the recorded results. A call is matched by macro and arguments
+    (in the order they were recorded). When the arguments differ (e.g. a new date in a variable) the next
+    recorded result of the same macro is used. speed multiplies the recorded latency (0 = no waiting)
+    """
+    def __init__(self, entries, speed=0.0):
+        self.speed = speed
+        self.by_call = defaultdict(deque)
+        self.by_macro = defaultdict(deque)
+        for entry in entries:
+            self.by_call[_key(entry['macro'], entry['args'])].append(entry)
+            self.by_macro[entry['macro']].append(entry)
+        self.replayed = 0
+        self.waited = 0.0
+
+    def _take(self, macro, args):
+        calls = self.by_call.get(_key(macro, redact(macro, args)))
+        if calls:
+            entry = calls.popleft()
+            self.by_macro[macro].remove(entry)
+            return entry
+        if self.by_macro.get(macro):
+            entry = self.by_macro[macro].popleft()
+            self.by_call[_key(entry['macro'], entry['args'])].remove(entry)
+            return entry
+        raise CassetteMissError(f'The call {macro}{tuple(redact(macro, args))} is not in the cassette')
+
+    def __call__(self, application, macro, args):
+        entry = self._take(macro, args)
+        self.replayed += 1
+        if self.speed:
+            time.sleep(entry['seconds'] * self.speed)
+            self.waited += entry['seconds'] * self.speed
+        if entry['error'] is not None:
+            raise ReplayedError(f'Replayed error of {macro}: {entry["error"]}')
+        return _from_json(entry['result'])
+
+
+class ReplayDriver:
+    """Driver (see Refresh.Driver) that opens fake Excel instances answering from a cassette"""
+    requires_network = False
+
+    def __init__(self, entries, speed=0.0):
+        self.player = CassettePlayer(entries, speed)
+
+    @classmethod
+    def from_file(cls, path, speed=0.0):
+        return cls(load(path), speed)
+
+    def open_excel(self, new_instance=False):
+        return FakeApplication(self.player)
+
+    def kill_instances(self):
+        pass
+
+    def kill_instance(self, xl_Instance):
+        pass
+
+    def dismiss_popup(self):
+        pass
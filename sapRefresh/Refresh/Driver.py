@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Backends used by Refresh.Engine to start and control Excel. The default one (ComDriver) talks to the real
+Excel + SAP AfO through win32com. Other drivers (e.g. Refresh.Cassette.ReplayDriver) implement the same methods
+so the whole flow can run without Excel or SAP:
+    open_excel(new_instance) -> object with the Excel Application interface
+    kill_instances()          -> terminate the Excel processes of the machine
+    kill_instance(instance)   -> terminate the process of one Excel instance (when it doesn't quit)
+    dismiss_popup()           -> close the popup that sometimes blocks Excel at startup
+    requires_network          -> False when the backend doesn't talk to the SAP servers
+"""
+import psutil as psutil
+
+
+class ComDriver:
+    """Real Excel application through win32com"""
+    requires_network = True
+
+    def open_excel(self, new_instance=False):
+        """
+        Start a instance of Excel application.
+        With new_instance=True a dedicated Excel process is always created (DispatchEx) instead of
+        attaching to a running one, so parallel workers don't share the same instance
+        """
+        import win32com.client as win32  # only available on Windows
+        if new_instance:
+            return win32.gencache.EnsureDispatch(win32.DispatchEx('Excel.Application'))
+        return win32.gencache.EnsureDispatch('Excel.Application')
+
+    def kill_instances(self):
+        """kill every Excel process of the machine"""
+        for proc in psutil.process_iter():
+            if proc.name().lower() == "excel.exe":
+                print("A running Excel instance was found. The script is going to kill it as a sanity check procedure.")
+                proc.kill()
+
+    def kill_instance(self, xl_Instance):
+        """kill the Excel process of an instance, found by the handle of its main window"""
+        import win32process  # only available on Windows
+        _, pid = win32process.GetWindowThreadProcessId(xl_Instance.Hwnd)
+        psutil.Process(pid).kill()
+
+    def dismiss_popup(self):
+        """In order to kill Excel popup we can hit enter"""
+        import win32com.client as win32  # only available on Windows
+        shell = win32.Dispatch("WScript.Shell")
+        shell.SendKeys("{ENTER}")
+
+
+# driver of the current process
+_state = {'driver': None}
+
+
+def get_driver():
+    """driver in use by the process (ComDriver by default)"""
+    if _state['driver'] is None:
+        _state['driver'] = ComDriver()
+    return _state['driver']
+
+
+def set_driver(driver):
+    """replace the driver of the process. None restores the default ComDriver"""
+    _state['driver'] = driver
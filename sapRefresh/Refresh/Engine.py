@@ -4,18 +4,19 @@ Created on 3/8/2021
 Author: Arnold Souza
 Email: arnoldporto@gmail.com
 """
-import win32com.client as win32
-from win32com.client import constants as cst
-
-from tenacity import retry, wait_fixed, before_sleep_log, stop_after_attempt
-import psutil as psutil
 
 from sapRefresh.Core.Time import timeit
+from sapRefresh.Core.Retry import adaptive_retry, WorkbookError
+from sapRefresh.Refresh import Sap
+from sapRefresh.Refresh.Proxy import ExcelProxy
+from sapRefresh.Refresh.Driver import get_driver
 
-import logging
 from sapRefresh.Core.base_logger import get_logger
-from sapRefresh import LOG_PATH
-logger, LOG_FILEPATH = get_logger(__name__, LOG_PATH)
+logger = get_logger(__name__)
+
+# Excel constants (same values of win32com.client.constants, which only exist after the gencache is built)
+xlCalculationManual = -4135
+xlDefault = -4143
 
 
 def kill_excel_instances():
@@ -26,19 +27,44 @@ def kill_excel_instances():
     when the excel task is ended everything comes back to normal
     so this step kills every Excel process in order to save the script
     """
-    for proc in psutil.process_iter():
-        if proc.name().lower() == "excel.exe":
-            print("A running Excel instance was found. The script is going to kill it as a sanity check procedure.")
-            proc.kill()
+    get_driver().kill_instances()
+
+
+def kill_excel_instance(xl_Instance):
+    """terminate the process of an Excel instance that couldn't be quit"""
+    get_driver().kill_instance(xl_Instance)
 
 
-def open_excel():
-    """Start a instance of Excel application"""
-    xl_Instance = win32.gencache.EnsureDispatch('Excel.Application')
-    return xl_Instance
+def open_excel(new_instance=False):
+    """
+    Start a instance of Excel application.
+    With new_instance=True a dedicated Excel process is always created (DispatchEx) instead of
+    attaching to a running one, so parallel workers don't share the same instance
+    """
+    xl_Instance = get_driver().open_excel(new_instance)
+    return ExcelProxy(xl_Instance)  # instrument the Application.Run calls (SAP AfO API)
 
 
-@retry(reraise=True, wait=wait_fixed(10), before_sleep=before_sleep_log(logger, logging.DEBUG), stop=stop_after_attempt(3))
+def is_instance_healthy(xl_Instance):
+    """
+    check if a running Excel instance can still be used to open the next report.
+    The instance must answer to COM calls, be ready to receive input and keep the SAP AfO add-in connected
+    """
+    try:
+        if not xl_Instance.Application.Ready:
+            return False
+        return bool(xl_Instance.Application.COMAddIns['SapExcelAddIn'].Connect)
+    except BaseException:  # to catch pywintypes.error when the instance is dead or hung
+        return False
+
+
+def close_open_workbooks(xl_Instance):
+    """discard every workbook left open in the instance so that the next report starts from a clean state"""
+    while xl_Instance.Workbooks.Count > 0:
+        xl_Instance.Workbooks(1).Close(False)
+
+
+@adaptive_retry
 @timeit
 def open_workbook(xl_Instance, path):
     """
@@ -53,8 +79,7 @@ def open_workbook(xl_Instance, path):
 @timeit
 def ensure_addin(xl_Instance):
     """In order to kill Excel popup we can hit enter"""
-    shell = win32.client.Dispatch("WScript.Shell")
-    shell.SendKeys("{ENTER}")
+    get_driver().dismiss_popup()
     """Force the plugin to be enabled in the instance of Excel"""
     for addin in xl_Instance.Application.COMAddIns:
         if addin.progID == 'SapExcelAddIn':
@@ -88,7 +113,7 @@ def optimize_instance(xl_Instance, action):
         xl_Instance.DisplayAlerts = True
         xl_Instance.ScreenUpdating = True
         # xl_Instance.EnableEvents = True
-        xl_Instance.Application.Cursor = cst.xlDefault
+        xl_Instance.Application.Cursor = xlDefault
         xl_Instance.Application.StatusBar = ''  # equivalent to vbNullString
 
 
@@ -96,32 +121,37 @@ def calculation_state(xl_Instance, action, state=None):
     """set the Calculation State to Manual in Excel"""
     if action == 'start':
         state = xl_Instance.Application.Calculation
-        xl_Instance.Application.Calculation = cst.xlCalculationManual
+        xl_Instance.Application.Calculation = xlCalculationManual
     elif action == 'stop' and state is not None:
         xl_Instance.Application.Calculation = state
     return state
 
 
-def get_data_source(xl_Instance):
-    """get data information about SAP AfO objects"""
-    values = dict()
+def get_data_sources(xl_Instance):
+    """
+    get data information about SAP AfO objects: one dictionary per crosstab of the workbook, with its data source.
+    A data source can feed more than one crosstab
+    """
     try:
-        (
-            values['CrossTabSource'],
-            values['CrossTabName'],
-            values['DS']
-        ) = xl_Instance.Application.Run("SAPListOf", "CROSSTABS")
+        crosstabs = Sap.as_rows(xl_Instance.Application.Run("SAPListOf", "CROSSTABS"))
     except BaseException as e:  # to catch pywintypes.error
-        if e.args[0] == -2147352567:
-            RuntimeError("The script couldn't access SAP AfO VBA functions. This usually is related to Excel instances running uncontrolled in the OS.")
-        else:
-            raise e
-    values['Sheet'] = xl_Instance.ActiveWorkbook.Names("SAP" + values['CrossTabSource']).RefersToRange.Parent.Name
-    values['Crosstab'] = "SAP" + values['CrossTabSource']
-    return values
-
-
-def close_workbook(wb_Instance):
-    """Save the file and close it"""
-    wb_Instance.Save()
+        if e.args and e.args[0] == -2147352567:
+            raise RuntimeError("The script couldn't access SAP AfO VBA functions. This usually is related to Excel "
+                               "instances running uncontrolled in the OS.") from e
+        raise e
+    data_sources = []
+    for crosstab_source, crosstab_name, source in (row[:3] for row in crosstabs):
+        values = {'CrossTabSource': crosstab_source, 'CrossTabName': crosstab_name, 'DS': source}
+        values['Sheet'] = xl_Instance.ActiveWorkbook.Names("SAP" + crosstab_source).RefersToRange.Parent.Name
+        values['Crosstab'] = "SAP" + crosstab_source
+        data_sources.append(values)
+    if not data_sources:
+        raise WorkbookError(f"The workbook {xl_Instance.ActiveWorkbook.Name} has no SAP AfO crosstab")
+    return data_sources
+
+
+def close_workbook(wb_Instance, save=True):
+    """Save the file (unless save is False, e.g. it was already saved) and close it"""
+    if save:
+        wb_Instance.Save()
     wb_Instance.Close()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Export the data of the crosstabs of a refreshed workbook to columnar files (Parquet or CSV), so downstream jobs
+don't need to open the xlsx. The crosstab (defined name "SAP" + CrossTabSource) is read in blocks of rows with a
+single Range.Value2 call per block and each block is appended to the file, so big crosstabs never sit twice in memory.
+The types of the columns are inferred from the first block (numbers, booleans or text). CSV files get a
+<name>.schema.json with the types, since the format has none. A number or boolean column that gets other values in a
+later block is widened to text in a CSV file; a Parquet file has its schema fixed at the first block, so those values
+become null (with a warning).
+Parquet needs the optional package pyarrow.
+"""
+import json
+import pathlib
+
+import pandas as pd
+
+from sapRefresh.Core.base_logger import get_logger
+logger = get_logger(__name__)
+
+FORMATS = ('csv', 'parquet')
+CHUNK_ROWS = 5000  # rows read from Excel in each Range.Value2 call
+EMPTY_VALUES = ('', '#', 'Not assigned')  # texts AfO draws in the cells without value
+
+NUMBER, BOOLEAN, TEXT = 'float64', 'boolean', 'string'
+KIND_NAMES = {NUMBER: 'numbers', BOOLEAN: 'booleans', TEXT: 'texts'}  # used in the warnings
+
+
+def as_table(values):
+    """Range.Value2 returns the value itself for a single cell and a tuple of rows otherwise"""
+    if isinstance(values, tuple):
+        return [list(row) for row in values]
+    return [[values]]
+
+
+def read_chunks(crosstab_range, chunk_rows=CHUNK_ROWS):
+    """generator of blocks of rows (lists) of a range, with one Range.Value2 call per block"""
+    sheet = crosstab_range.Worksheet
+    first_row, first_column = crosstab_range.Row, crosstab_range.Column
+    rows, columns = crosstab_range.Rows.Count, crosstab_range.Columns.Count
+    last_column = first_column + columns - 1
+    for start in range(0, rows, chunk_rows):
+        top = first_row + start
+        bottom = min(top + chunk_rows, first_row + rows) - 1
+        block = sheet.Range(sheet.Cells(top, first_column), sheet.Cells(bottom, last_column))
+        yield as_table(block.Value2)
+
+
+def column_names(header_rows):
+    """names of the columns from the header rows of the crosstab (multi-line headers are joined, names unique)"""
+    names, used = [], dict()
+    for position, values in enumerate(zip(*header_rows), start=1):
+        parts = [str(value).strip() for value in values if value not in (None, '')]
+        name = ' | '.join(dict.fromkeys(parts)) or f'column_{position}'
+        used[name] = used.get(name, 0) + 1
+        names.append(name if used[name] == 1 else f'{name}_{used[name]}')
+    return names
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and value.strip() in EMPTY_VALUES)
+
+
+def infer_types(names, rows):
+    """type of each column: booleans, numbers or text (Value2 returns dates as numbers)"""
+    types = dict()
+    for position, name in enumerate(names):
+        values = [row[position] for row in rows if not _is_empty(row[position])]
+        if values and all(isinstance(value, bool) for value in values):
+            types[name] = BOOLEAN
+        elif values and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+            types[name] = NUMBER
+        else:
+            types[name] = TEXT
+    return types
+
+
+def to_frame(names, types, rows, widen=False):
+    """
+    dataframe of a block with the types of the columns. Values that don't fit the type become null, unless widen is
+    set: then a number or boolean column with other values is converted to text and its type is changed in types
+    """
+    df = pd.DataFrame(rows, columns=names, dtype=object)
+    for name, kind in list(types.items()):
+        column = df[name].where(~df[name].map(_is_empty), None)
+        if kind == NUMBER:
+            misfits = pd.to_numeric(column, errors='coerce').isna() & column.notna()
+        elif kind == BOOLEAN:
+            misfits = column.map(lambda value: value is not None and not isinstance(value, bool))
+        else:
+            misfits = None
+        others = 0 if misfits is None else int(misfits.sum())
+        if others and widen:
+            logger.warning(f'The column [{name}] has {others} values that are not {KIND_NAMES[kind]} '
+                           f'and was widened to text')
+            types[name] = kind = TEXT
+        elif others:
+            logger.warning(f'{others} values of the column [{name}] are not {KIND_NAMES[kind]} '
+                           f'and were exported as null')
+            column = column.where(~misfits, None)
+        if kind == NUMBER:
+            df[name] = pd.to_numeric(column, errors='coerce').astype('float64')
+        elif kind == BOOLEAN:
+            df[name] = column.astype('boolean')
+        else:
+            df[name] = column.map(lambda value: value if value is None else str(value)).astype('string')
+    return df
+
+
+def write_schema(path, types):
+    """write the types of the columns of a csv file in <name>.schema.json"""
+    schema_path = path.with_name(path.stem + '.schema.json')
+    schema_path.write_text(json.dumps({'columns': types}, indent=2), encoding='utf-8')
+    return schema_path
+
+
+class CsvWriter:
+    """append blocks to a csv file. The types can be widened by the later blocks (see to_frame)"""
+    widen = True
+
+    def __init__(self, path, types):
+        self.path = pathlib.Path(path)
+        self.types = types
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False, encoding='utf-8')
+        self.header = False
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    """append blocks to a parquet file (one row group per block). The schema is fixed by the types of the 1st block"""
+    widen = False
+
+    def __init__(self, path, types):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('The parquet export requires the package pyarrow (pip install pyarrow). '
+                              'Use "export-format" = csv otherwise') from None
+        self.pyarrow = pyarrow
+        arrow_types = {NUMBER: pyarrow.float64(), BOOLEAN: pyarrow.bool_(), TEXT: pyarrow.string()}
+        self.schema = pyarrow.schema([(name, arrow_types[kind]) for name, kind in types.items()])
+        self.types = types
+        self.writer = pyarrow.parquet.ParquetWriter(str(path), self.schema)
+
+    def write(self, df):
+        self.writer.write_table(self.pyarrow.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'csv': CsvWriter, 'parquet': ParquetWriter}
+
+
+def export_range(crosstab_range, path, fmt='csv', chunk_rows=CHUNK_ROWS, header_rows=1):
+    """
+    Export a range (header rows + data) to a parquet or csv file. The file is written in a temporary path and
+    renamed at the end, so the consumers never read half files. Returns the statistics of the export
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f'Unknown export format: {fmt} (use one of {", ".join(FORMATS)})')
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + '.tmp')
+    stats = {'path': path, 'rows': 0, 'columns': 0, 'chunks': 0}
+    writer, names, types, header = None, None, None, []
+    try:
+        for block in read_chunks(crosstab_range, chunk_rows):
+            stats['chunks'] += 1
+            if names is None:
+                missing = header_rows - len(header)
+                header += block[:missing]
+                block = block[missing:]
+                if len(header) < header_rows:
+                    continue
+                names = column_names(header)
+                types = infer_types(names, block)
+                writer = WRITERS[fmt](temporary, types)
+                stats['columns'] = len(names)
+            if block:
+                writer.write(to_frame(names, writer.types, block, writer.widen))
+                stats['rows'] += len(block)
+        if writer is None:  # the crosstab is smaller than the header
+            names = column_names(header) if header else []
+            types = {name: TEXT for name in names}
+            writer = WRITERS[fmt](temporary, types)
+            stats['columns'] = len(names)
+        if not stats['rows']:  # the crosstab has no data: write a file with the columns only
+            writer.write(to_frame(names, writer.types, []))
+    finally:
+        if writer is not None:
+            writer.close()
+    temporary.replace(path)
+    if fmt == 'csv':
+        write_schema(path, writer.types)
+    return stats
+
+
+def export_crosstab(wb_Instance, crosstab, path, fmt='csv', chunk_rows=CHUNK_ROWS, header_rows=1):
+    """export the crosstab (defined name, e.g. SAPCrosstab1) of a workbook"""
+    crosstab_range = wb_Instance.Names(crosstab).RefersToRange
+    return export_range(crosstab_range, path, fmt, chunk_rows, header_rows)
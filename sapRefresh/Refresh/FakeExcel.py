@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Pure python imitation of the small part of the Excel object model used by Refresh.Engine and SapRefresh.
+The SAP AfO API (Application.Run) is delegated to a handler, so the same objects serve the cassette replay
+and the simulated AfO backend.
+"""
+import pathlib
+
+
+class FakeAddIn:
+    """COM add-in of Excel"""
+    def __init__(self, progID, connect=True):
+        self.progID = progID
+        self.Connect = connect
+
+
+class FakeAddIns:
+    """collection Application.COMAddIns"""
+    def __init__(self, addins):
+        self._addins = list(addins)
+
+    def __iter__(self):
+        return iter(self._addins)
+
+    def __getitem__(self, progID):
+        for addin in self._addins:
+            if addin.progID == progID:
+                return addin
+        raise KeyError(progID)
+
+
+class FakeSheet:
+    """worksheet. cells is a dictionary {(row, column): value} of the filled cells"""
+    def __init__(self, name, cells=None):
+        self.Name = name
+        self.cells = cells if cells is not None else dict()
+
+    def write(self, row, column, rows):
+        """fill the cells from a list of rows starting at (row, column)"""
+        for i, values in enumerate(rows):
+            for j, value in enumerate(values):
+                self.cells[(row + i, column + j)] = value
+
+    def Cells(self, row, column):
+        return FakeRange(self, row, column)
+
+    def Range(self, cell1, cell2=None):
+        cell2 = cell2 or cell1
+        return FakeRange(self, cell1.Row, cell1.Column, cell2.Row - cell1.Row + 1, cell2.Column - cell1.Column + 1)
+
+
+class FakeCount:
+    """collections Range.Rows and Range.Columns (only Count is used)"""
+    def __init__(self, count):
+        self.Count = count
+
+
+class FakeRange:
+    """range of cells (e.g. referenced by a defined name)"""
+    def __init__(self, sheet, row=1, column=1, rows=1, columns=1):
+        self.Parent = sheet
+        self.Worksheet = sheet
+        self.Row = row
+        self.Column = column
+        self.Rows = FakeCount(rows)
+        self.Columns = FakeCount(columns)
+
+    @property
+    def Value2(self):
+        """values of the range as Excel returns them: a tuple of rows, or the value itself for a single cell"""
+        values = tuple(tuple(self.Parent.cells.get((row, column))
+                             for column in range(self.Column, self.Column + self.Columns.Count))
+                       for row in range(self.Row, self.Row + self.Rows.Count))
+        if self.Rows.Count == 1 and self.Columns.Count == 1:
+            return values[0][0]
+        return values
+
+
+class FakeName:
+    """defined name of a workbook"""
+    def __init__(self, refers_to_range):
+        self.RefersToRange = refers_to_range
+
+
+class FakeWorkbook:
+    """workbook. names is a dictionary {defined name: FakeName}"""
+    def __init__(self, path, names=None):
+        self.path = pathlib.PurePath(str(path))
+        self.Name = self.path.name
+        self.FullName = str(path)
+        self.names = names if names is not None else dict()
+        self.saved = 0
+        self.closed = False
+        self.application = None
+
+    def Names(self, name):
+        if name not in self.names:  # AfO crosstabs are always in a sheet, use a default one
+            self.names[name] = FakeName(FakeRange(FakeSheet('Sheet1')))
+        return self.names[name]
+
+    def Save(self):
+        self.saved += 1
+
+    def Close(self, save_changes=None):
+        if save_changes:
+            self.Save()
+        self.closed = True
+        if self.application is not None:
+            self.application.Workbooks.remove(self)
+
+
+class FakeWindow:
+    """window of a workbook"""
+    def __init__(self, application, workbook):
+        self.application = application
+        self.workbook = workbook
+
+    def Activate(self):
+        self.application.ActiveWorkbook = self.workbook
+
+
+class FakeWorkbooks:
+    """collection Application.Workbooks. workbook_factory(path) creates the workbook that is opened"""
+    def __init__(self, application, workbook_factory=None):
+        self.application = application
+        self.workbook_factory = workbook_factory or FakeWorkbook
+        self._workbooks = []
+
+    @property
+    def Count(self):
+        return len(self._workbooks)
+
+    def __call__(self, index):
+        if isinstance(index, int):
+            return self._workbooks[index - 1]  # Excel collections are 1-based
+        for workbook in self._workbooks:
+            if workbook.Name == index:
+                return workbook
+        raise KeyError(index)
+
+    def __iter__(self):
+        return iter(list(self._workbooks))
+
+    def Open(self, path, update_links=False, read_only=False):
+        workbook = self.workbook_factory(path)
+        workbook.application = self.application
+        self._workbooks.append(workbook)
+        self.application.ActiveWorkbook = workbook
+        return workbook
+
+    def remove(self, workbook):
+        if workbook in self._workbooks:
+            self._workbooks.remove(workbook)
+        if self.application.ActiveWorkbook is workbook:
+            self.application.ActiveWorkbook = self._workbooks[-1] if self._workbooks else None
+
+
+class FakeApplication:
+    """
+    Excel Application. run_handler(application, macro, args) answers the Application.Run calls
+    """
+    def __init__(self, run_handler, workbook_factory=None):
+        self.run_handler = run_handler
+        self.Workbooks = FakeWorkbooks(self, workbook_factory)
+        self.ActiveWorkbook = None
+        self.COMAddIns = FakeAddIns([FakeAddIn('SapExcelAddIn')])
+        self.Visible = False
+        self.DisplayAlerts = True
+        self.ScreenUpdating = True
+        self.Cursor = None
+        self.StatusBar = ''
+        self.Calculation = -4105  # xlCalculationAutomatic
+        self.Ready = True
+        self.quit = False
+
+    @property
+    def Application(self):
+        return self
+
+    def Windows(self, name):
+        return FakeWindow(self, self.Workbooks(name))
+
+    def Calculate(self):
+        pass
+
+    def Run(self, macro, *args):
+        return self.run_handler(self, macro, args)
+
+    def Quit(self):
+        self.quit = True
+        self.Ready = False
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import time
+import queue
+import multiprocessing
+from collections import deque, defaultdict
+
+from sapRefresh.Core.base_logger import get_logger
+logger = get_logger(__name__)
+
+DEFAULT_SYSTEM = 'default'  # system key used when the report doesn't inform its SAP system
+POLL_INTERVAL = 5  # seconds between the checks of the workers' health while waiting for results
+
+# messages exchanged between the workers and the scheduler
+MSG_STARTED = 'started'
+MSG_FINISHED = 'finished'
+
+
+def make_job(filename, system=None):
+    """create the dictionary that describes one report to be refreshed by the pool"""
+    return {'filename': filename, 'system': system or DEFAULT_SYSTEM}
+
+
+def _worker_loop(worker_id, driver_factory, task_queue, result_queue):
+    """
+    Main function of each worker process. The driver is created once, so the worker keeps
+    its own Excel instance warm while it consumes the jobs of the queue. A None job stops the worker.
+    """
+    driver = driver_factory()
+    try:
+        while True:
+            job = task_queue.get()
+            if job is None:
+                break
+            result_queue.put((MSG_STARTED, worker_id, job))
+            start_time = time.perf_counter()
+            try:
+                driver.refresh(job)
+                status, error = 'SUCCESS', None
+            except Exception as e:
+                status, error = 'ERROR', repr(e)
+            result = dict(job)
+            result.update(worker=worker_id, status=status, error=error, duration=time.perf_counter() - start_time)
+            result['metrics'] = driver.metrics() if hasattr(driver, 'metrics') else None
+            result_queue.put((MSG_FINISHED, worker_id, result))
+    finally:
+        driver.close()
+
+
+class WorkerPool:
+    """
+    Refresh reports in parallel using N worker processes, each one with its own driver (Excel/AfO instance).
+    The scheduler only hands a job to an idle worker when the SAP system of the job is below its concurrency limit.
+
+    driver_factory: picklable callable with no arguments that returns an object with the methods
+        refresh(job) and close(), and optionally metrics() whose return is sent with the result of each job.
+        It is called inside each worker process
+    system_limits: dictionary {system: max concurrent jobs}. Systems not listed use default_limit
+    """
+    def __init__(self, driver_factory, workers=2, system_limits=None, default_limit=None, context=None):
+        if workers < 1:
+            raise ValueError(f'The number of workers must be at least 1 (got {workers})')
+        self.driver_factory = driver_factory
+        self.workers = workers
+        self.system_limits = system_limits or dict()
+        self.default_limit = default_limit or workers
+        self.context = context or multiprocessing.get_context('spawn')  # COM requires fresh processes
+        # runtime state
+        self.results = []
+        self._running = defaultdict(int)  # number of jobs in flight per system
+        self._in_flight = dict()  # worker_id -> job being executed
+        self._dispatched = []  # jobs put in the task queue that have no result yet
+
+    def _limit(self, system):
+        """concurrency limit of a SAP system"""
+        return int(self.system_limits.get(system, self.default_limit))
+
+    def _next_job(self, pending):
+        """pop the first pending job whose SAP system still has capacity"""
+        for job in pending:
+            if self._running[job['system']] < self._limit(job['system']):
+                pending.remove(job)
+                return job
+        return None
+
+    def _finish(self, result):
+        """register the result of a job and release the capacity of its system"""
+        self._running[result['system']] -= 1
+        for position, job in enumerate(self._dispatched):
+            if (job['filename'], job['system']) == (result['filename'], result['system']):
+                del self._dispatched[position]
+                break
+        self.results.append(result)
+        print(f"[worker {result['worker']}] {result['status']} {result['filename']} "
+              f"in {result['duration']:.2f} seconds")
+        if result['error'] is not None:
+            logger.error(f"[worker {result['worker']}] Couldn't refresh {result['filename']}: {result['error']}")
+
+    def run(self, jobs):
+        """execute all the jobs and return the list of results (one dictionary per job)"""
+        pending = deque(jobs)
+        self.results = []
+        self._dispatched = []
+        task_queue = self.context.Queue()
+        result_queue = self.context.Queue()
+        processes = dict()
+        for worker_id in range(1, min(self.workers, len(pending)) + 1):
+            process = self.context.Process(target=_worker_loop, name=f'sapRefresh-worker-{worker_id}',
+                                           args=(worker_id, self.driver_factory, task_queue, result_queue))
+            process.start()
+            processes[worker_id] = process
+        idle = len(processes)
+        dispatched = 0
+        try:
+            while pending or dispatched:
+                # hand jobs to the idle workers respecting the limit of each system
+                while idle > 0:
+                    job = self._next_job(pending)
+                    if job is None:
+                        break
+                    task_queue.put(job)
+                    self._dispatched.append(job)
+                    self._running[job['system']] += 1
+                    idle -= 1
+                    dispatched += 1
+                if not dispatched:
+                    break  # nothing in flight and nothing can be dispatched
+                try:
+                    message, worker_id, payload = result_queue.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    idle -= self._reap_dead_workers(processes)
+                    dispatched = sum(self._running.values())
+                    if not processes:
+                        break
+                    continue
+                if message == MSG_STARTED:
+                    self._in_flight[worker_id] = payload
+                elif message == MSG_FINISHED:
+                    self._in_flight.pop(worker_id, None)
+                    self._finish(payload)
+                    idle += 1
+                    dispatched -= 1
+        finally:
+            for _ in processes:
+                task_queue.put(None)
+            for process in processes.values():
+                process.join()
+        # jobs handed to the queue that no worker executed (e.g. every worker died at startup)
+        for job in list(self._dispatched):
+            self._finish(dict(job, worker=None, status='ERROR', duration=0.0,
+                              error='The job was dispatched but no worker executed it'))
+        # jobs that could not be executed because every worker died
+        for job in pending:
+            self.results.append(dict(job, worker=None, status='ERROR', error='No worker available', duration=0.0))
+        return self.results
+
+    def _reap_dead_workers(self, processes):
+        """
+        remove the workers that died (e.g. Excel crashed the process) and fail the job they were running.
+        Returns the number of idle slots that were lost.
+        """
+        lost_idle = 0
+        for worker_id, process in list(processes.items()):
+            if process.is_alive():
+                continue
+            del processes[worker_id]
+            job = self._in_flight.pop(worker_id, None)
+            if job is None:
+                lost_idle += 1
+                continue
+            self._finish(dict(job, worker=worker_id, status='ERROR', duration=0.0,
+                              error=f'The worker process died with exit code {process.exitcode}'))
+        return lost_idle
+
+    @staticmethod
+    def summary(results):
+        """print the results grouped by worker and return the number of failed jobs"""
+        by_worker = defaultdict(list)
+        for result in results:
+            by_worker[result['worker']].append(result)
+        for worker_id, worker_results in sorted(by_worker.items(), key=lambda item: str(item[0])):
+            ok = sum(1 for result in worker_results if result['status'] == 'SUCCESS')
+            busy = sum(result['duration'] for result in worker_results)
+            print(f'Worker {worker_id}: {ok}/{len(worker_results)} reports refreshed in {busy:.1f} seconds')
+        return sum(1 for result in results if result['status'] != 'SUCCESS')
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import time
+
+# callables(macro, args, result, seconds, error) notified of every Application.Run call
+_run_listeners = []
+
+
+def add_run_listener(listener):
+    """register a callable(macro, args, result, seconds, error) notified after every Application.Run call"""
+    if listener not in _run_listeners:
+        _run_listeners.append(listener)
+
+
+def remove_run_listener(listener):
+    """stop notifying a listener registered with add_run_listener"""
+    if listener in _run_listeners:
+        _run_listeners.remove(listener)
+
+
+class _Delegate:
+    """Forward the reads and writes of attributes to the wrapped COM object"""
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+class ApplicationProxy(_Delegate):
+    """Excel Application whose Run calls (the SAP AfO API) are measured and notified to the listeners"""
+    def Run(self, macro, *args):
+        start_time = time.perf_counter()
+        result, error = None, None
+        try:
+            result = self._target.Run(macro, *args)
+            return result
+        except BaseException as e:  # to catch pywintypes.error
+            error = e
+            raise
+        finally:
+            seconds = time.perf_counter() - start_time
+            for listener in list(_run_listeners):
+                listener(macro, args, result, seconds, error)
+
+
+class ExcelProxy(_Delegate):
+    """Transparent wrapper of the Excel instance. Everything is delegated, except Application which is instrumented"""
+    @property
+    def Application(self):
+        return ApplicationProxy(self._target.Application)
+
+    @property
+    def target(self):
+        """the wrapped COM object"""
+        return self._target
@@ -4,18 +4,18 @@ Created on 3/8/2021
 Author: Arnold Souza
 Email: arnoldporto@gmail.com
 """
-from tenacity import retry, wait_fixed, before_sleep_log, stop_after_attempt
 
 from sapRefresh.Core.Cripto import secret_decode
 from sapRefresh.Core.Time import timeit
+from sapRefresh.Core.Retry import adaptive_retry, LogonRejectedError, SapCommandError
 
-import logging
 from sapRefresh.Core.base_logger import get_logger
-from sapRefresh import LOG_PATH
-logger, LOG_FILEPATH = get_logger(__name__, LOG_PATH)
+logger = get_logger(__name__)
 
+ALL_SOURCES = 'ALL'  # parameter of the SAPExecuteCommand that targets every data source of the workbook
 
-@retry(reraise=True, wait=wait_fixed(10), before_sleep=before_sleep_log(logger, logging.DEBUG), stop=stop_after_attempt(3))
+
+@adaptive_retry
 @timeit
 def sap_logon(xl_Instance, source, client, user, password):
     """API method to trigger a logon to a system for a specified data source"""
@@ -23,7 +23,7 @@ def sap_logon(xl_Instance, source, client, user, password):
     if result == 1:
         print('\nSuccessfully logged in SAP AfO')
     else:
-        raise ConnectionError("Couldn't login in SAP AfO")
+        raise LogonRejectedError("Couldn't login in SAP AfO (the logon was rejected)")
     return result
 
 
@@ -38,7 +38,7 @@ def sap_refresh(xl_Instance):
     if result == 1:
         print('\nSuccessfully refreshed the workbook')
     else:
-        raise ConnectionError("Couldn't refresh the SAP AfO")  # todo: need to handle errors differently to not stop the runtime
+        raise SapCommandError("Couldn't refresh the SAP AfO")
     return result
 
 
@@ -52,10 +52,52 @@ def sap_refresh_data(xl_Instance, source):
     if result == 1:
         print(f'\nSuccessfully refreshed the source: {source}')
     else:
-        raise ConnectionError(f"Couldn't refresh the the source: {source}")
+        raise SapCommandError(f"Couldn't refresh the the source: {source}")
+    return result
+
+
+@timeit
+def sap_activate(xl_Instance, source):
+    """
+    Activate a data source without fetching its data. Must be called while the variable submit is paused:
+    the data is fetched once, when the submit is resumed
+    """
+    result = xl_Instance.Application.Run("SAPExecuteCommand", "Refresh", source)
+    if result == 1:
+        print(f'\nSuccessfully activated the source: {source}')
+    else:
+        raise SapCommandError(f"Couldn't activate the source: {source}")
     return result
 
 
+def sap_set_refresh_behaviour(xl_Instance, state):
+    """turn the automatic refresh of the data sources On or Off"""
+    result = xl_Instance.Application.Run("SAPSetRefreshBehaviour", state)
+    if result != 1:
+        raise SapCommandError(f"Couldn't turn the refresh behaviour {state}")
+    return result
+
+
+def sap_pause_variable_submit(xl_Instance, state):
+    """pause (On) or resume (Off) the submit of the variables. Resuming submits the variables set while paused"""
+    result = xl_Instance.Application.Run("SAPExecuteCommand", "PauseVariableSubmit", state)
+    if result != 1:
+        raise SapCommandError(f"Couldn't turn the pause of the variable submit {state}")
+    return result
+
+
+def refresh_targets(sources, workbook_sources):
+    """
+    parameters of the refresh commands (Refresh, RefreshData) of the data sources. AfO takes one alias or ALL per
+    command, so when the sources cover every data source of the workbook a single ALL refreshes all of them,
+    including the data sources that share a query or a variable container. Otherwise one alias per command
+    """
+    sources = list(dict.fromkeys(sources))
+    if set(workbook_sources) <= set(sources):
+        return [ALL_SOURCES]
+    return sources
+
+
 def sap_get_more_info(xl_Instance, data_values):
     """get other information about SAP data source"""
     data_values['DataSourceName'] = xl_Instance.Application.Run("SapGetSourceInfo", data_values['DS'], "DataSourceName")
@@ -98,3 +140,75 @@ def sap_is_connected(xl_Instance, source):
     """check whether a data source is already connected"""
     state_connection = xl_Instance.Application.Run("SAPGetProperty", "IsConnected", source)
     return state_connection
+
+
+def as_rows(values):
+    """
+    Normalize the arrays returned by the SAP AfO API to a list of rows.
+    AfO returns None when the list is empty and a flat tuple when it has a single row
+    """
+    if values is None or isinstance(values, str):
+        return []
+    values = list(values)
+    if values and not isinstance(values[0], (tuple, list)):
+        return [tuple(values)]
+    return [tuple(row) for row in values]
+
+
+def _as_input_string(value):
+    """representation of a value used to compare it with the INPUT_STRING returned by AfO"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def sap_get_restrictions(xl_Instance, source, command):
+    """get the current values of the variables (SAPSetVariable) or filters (SAPSetFilter) in one COM call"""
+    if command == 'SAPSetVariable':
+        values = sap_get_variables(xl_Instance, source)
+    else:
+        values = sap_get_filters(xl_Instance, source)
+    return {str(row[0]): _as_input_string(row[1]) for row in as_rows(values) if len(row) > 1}
+
+
+def sap_set_restriction(xl_Instance, command, source, field, value):
+    """set the value of a variable or a filter of the data source"""
+    if command == 'SAPSetVariable':
+        return xl_Instance.Application.Run(command, field, value, "INPUT_STRING", source)
+    return xl_Instance.Application.Run(command, source, field, value, "INPUT_STRING")
+
+
+def sap_plan_restrictions(xl_Instance, restrictions):
+    """
+    Compare the restrictions (list of dictionaries with the keys command, data_source, field, field_name and value)
+    with the current state of each data source and return only the ones that need to be set.
+    The current state is read with a single COM call per data source and command, and only when the
+    group has more than one restriction (otherwise the read would cost the same as the write it could save).
+    """
+    groups = dict()
+    for restriction in restrictions:
+        groups.setdefault((restriction['command'], restriction['data_source']), []).append(restriction)
+    pending = []
+    stats = {'requested': len(restrictions), 'skipped': 0, 'reads': 0}
+    for (command, source), group in groups.items():
+        current = dict()
+        if len(group) > 1:
+            current = sap_get_restrictions(xl_Instance, source, command)
+            stats['reads'] += 1
+        for restriction in group:
+            if current.get(str(restriction['field_name'])) == _as_input_string(restriction['value']):
+                stats['skipped'] += 1
+            else:
+                pending.append(restriction)
+    return pending, stats
+
+
+def sap_set_restrictions(xl_Instance, pending):
+    """set all the pending restrictions. Returns the number of COM calls done"""
+    for restriction in pending:
+        result = sap_set_restriction(xl_Instance, restriction['command'], restriction['data_source'],
+                                     restriction['field'], restriction['value'])
+        if result != 1:
+            raise ValueError(f"SAP AfO rejected the {restriction['command']} of {restriction['field_name']} to "
+                             f"[{restriction['value']}] in {restriction['data_source']}")
+    return len(pending)
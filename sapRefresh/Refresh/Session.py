@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+SAP logons of an Excel instance. The logon of AfO belongs to the Excel instance, so when the reports of a warm
+instance point at a SAP system already logged on with the same client and user, the SAPLogon round trip can be
+skipped. The sessions are tracked by (System, client, user) and AfO is asked (IsConnected) before skipping a logon.
+"""
+from collections import namedtuple
+
+from sapRefresh.Core import Metrics
+from sapRefresh.Refresh import Sap
+
+from sapRefresh.Core.base_logger import get_logger
+logger = get_logger(__name__)
+
+# the user is kept encrypted (the token of the config workbook)
+SessionKey = namedtuple('SessionKey', ['system', 'client', 'user'])
+
+
+class SessionManager:
+    """
+    Authenticated SAP sessions of one Excel instance. Must be cleared when the instance is closed.
+    When the system of the data source is unknown, AfO is asked whether the data source is connected as soon as
+    the instance has any session
+    """
+    def __init__(self):
+        self.sessions = set()
+        self.performed = 0
+        self.avoided = 0
+
+    def logon(self, xl_Instance, source, system, client, user, password):
+        """logon the data source, unless it is already connected. Returns 1 like SAPLogon"""
+        key = SessionKey(system, str(client), user)
+        # in a new instance (or a new system) the data source can't be connected: don't ask AfO
+        known = key in self.sessions or (system is None and bool(self.sessions))
+        if known and Sap.sap_is_connected(xl_Instance, source):
+            self.avoided += 1
+            Metrics.registry.increment('sap_logons_total', outcome='avoided')
+            print(f'\nReusing the SAP session of {system or source}')
+            return 1
+        result = Sap.sap_logon(xl_Instance, source, client, user, password)
+        self.sessions.add(key)
+        self.performed += 1
+        Metrics.registry.increment('sap_logons_total', outcome='performed')
+        return result
+
+    def clear(self):
+        """forget the sessions (the Excel instance was closed)"""
+        self.sessions = set()
+
+    def summary(self):
+        """text with the number of logons performed and avoided"""
+        return f'SAP logons: {self.performed} performed, {self.avoided} avoided'
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Simulated SAP AfO backend. It answers the Application.Run calls of Refresh.Engine and Refresh.Sap for
+workbooks that only exist in memory (crosstabs, data sources, variables, filters and dimensions) and waits
+a configurable latency in the expensive calls (logon, refresh and variable submit), so the whole flow
+can be benchmarked without Excel or SAP:
+    simulator = AfOSimulator(synthetic_reports(300), latencies={'refresh': Latency.parse('lognormal:20:0.5')})
+    set_driver(SimulatedDriver(simulator))
+"""
+import copy
+import math
+import time
+import random
+
+from sapRefresh.Refresh.FakeExcel import FakeApplication, FakeWorkbook, FakeName, FakeRange, FakeSheet
+
+# latency (seconds) of each kind of call when it is not configured
+DEFAULT_LATENCIES = {
+    'logon': 2.0,  # SAPLogon of a system not connected yet
+    'refresh': 10.0,  # refresh of one data source
+    'submit': 1.0,  # variable submit (the server validates the variables before the refresh)
+    'call': 0.01,  # every other call (metadata, properties, ...)
+}
+SYSTEMS = ('PRD', 'BWP', 'S4P')
+
+
+class SimulatorError(RuntimeError):
+    """The simulated AfO received a call it doesn't know or that is invalid for the workbook"""
+
+
+class Latency:
+    """
+    Distribution of the latency of a call, in seconds:
+        fixed:<seconds>, uniform:<min>:<max> or lognormal:<mean>:<sigma>
+    """
+    KINDS = ('fixed', 'uniform', 'lognormal')
+
+    def __init__(self, kind='fixed', *params):
+        if kind not in self.KINDS:
+            raise ValueError(f'Unknown latency distribution: {kind} (use one of {", ".join(self.KINDS)})')
+        self.kind = kind
+        self.params = tuple(float(param) for param in params)
+
+    @classmethod
+    def parse(cls, text):
+        """create the distribution from a text like "lognormal:20:0.5". A single number is a fixed latency"""
+        if isinstance(text, Latency):
+            return text
+        parts = str(text).split(':')
+        if len(parts) == 1:
+            return cls('fixed', parts[0])
+        return cls(parts[0], *parts[1:])
+
+    def sample(self, rng):
+        """random latency of one call"""
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return rng.uniform(self.params[0], self.params[1])
+        mean, sigma = self.params
+        if mean <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)  # the mean of the samples is "mean"
+
+    def __repr__(self):
+        return ':'.join([self.kind] + [f'{param:g}' for param in self.params])
+
+
+class SimulatedCrosstab:
+    """crosstab of a workbook and its data source"""
+    def __init__(self, name, source, sheet, query, system, data_source_name, variables=None, filters=None,
+                 dimensions=None, rows=0):
+        self.name = name  # e.g. Crosstab1 (the defined name of the range is SAPCrosstab1)
+        self.source = source  # e.g. DS_1
+        self.sheet = sheet
+        self.query = query
+        self.system = system
+        self.data_source_name = data_source_name
+        self.variables = variables or dict()  # {description: [technical name, value]}
+        self.filters = filters or dict()  # {technical name of the dimension: value}
+        self.dimensions = dimensions or []  # [(technical name, description)]
+        self.rows = rows  # rows of data drawn in the crosstab by each refresh
+        # state of the data source inside an Excel instance
+        self.active = False
+        self.dirty = False  # restrictions changed and not refreshed yet
+        self.submit = False  # variables changed and not submitted yet
+
+    def description_of(self, technical_name):
+        for technical, description in self.dimensions:
+            if technical == technical_name:
+                return description
+        return technical_name
+
+
+class SimulatedReport:
+    """workbook with one or more crosstabs"""
+    def __init__(self, filename, crosstabs):
+        self.filename = filename
+        self.crosstabs = list(crosstabs)
+
+
+def synthetic_reports(count, crosstabs=1, variables=3, filters=2, systems=SYSTEMS, seed=0, rows=0):
+    """
+    create count reports (Report_0001.xlsx, ...) spread over the SAP systems. Each crosstab has its own data source
+    (DS_1, DS_2, ...) and query, the variables start with the value "initial" and the filters with "*".
+    Each refresh draws rows lines of data in the crosstabs
+    """
+    rng = random.Random(seed)
+    reports = dict()
+    for number in range(1, count + 1):
+        filename = f'Report_{number:04d}.xlsx'
+        system = systems[rng.randrange(len(systems))]
+        tabs = []
+        for index in range(1, crosstabs + 1):
+            query = f'ZQ_{system}_{rng.randrange(50):02d}'
+            dimensions = [(f'0DIM_{position}', f'Dimension {position}') for position in range(1, filters + 3)]
+            tabs.append(SimulatedCrosstab(
+                name=f'Crosstab{index}',
+                source=f'DS_{index}',
+                sheet=f'Sheet{index}',
+                query=query,
+                system=system,
+                data_source_name=f'Query {query}',
+                variables={f'Variable {position}': [f'!V_{query}_{position}', 'initial']
+                           for position in range(1, variables + 1)},
+                filters={technical: '*' for technical, _ in dimensions[:filters]},
+                dimensions=dimensions,
+                rows=rows,
+            ))
+        reports[filename] = SimulatedReport(filename, tabs)
+    return reports
+
+
+class SimulatedWorkbook(FakeWorkbook):
+    """workbook opened by the simulator. Saving it keeps the values of the variables and filters for the next open"""
+    def __init__(self, path, simulator):
+        super().__init__(path)
+        self.simulator = simulator
+        if self.Name not in simulator.reports:
+            raise FileNotFoundError(f'The simulated AfO has no report named {self.Name}')
+        self.report = copy.deepcopy(simulator.reports[self.Name])
+        self.paused_submit = False
+        self.refresh_behaviour = True
+        for crosstab in self.report.crosstabs:
+            crosstab.active = crosstab.dirty = crosstab.submit = False
+            self.names['SAP' + crosstab.name] = FakeName(FakeRange(FakeSheet(crosstab.sheet), row=3, column=2))
+
+    def draw(self, crosstab, rng):
+        """
+        fill the crosstab with a header (two dimensions and two measures) and its rows of data, and resize its
+        defined name, as AfO does after a refresh
+        """
+        crosstab_range = self.names['SAP' + crosstab.name].RefersToRange
+        header = [description for _, description in crosstab.dimensions[:2]] + ['Amount', 'Quantity']
+        data = [header]
+        for number in range(crosstab.rows):
+            data.append([f'{dimension[0][-1]}{number % 97:03d}' for dimension in crosstab.dimensions[:2]]
+                        + [round(rng.uniform(-1e6, 1e6), 2), float(rng.randrange(1000))])
+        crosstab_range.Parent.cells.clear()
+        crosstab_range.Parent.write(crosstab_range.Row, crosstab_range.Column, data)
+        crosstab_range.Rows.Count = len(data)
+        crosstab_range.Columns.Count = len(header)
+
+    def Save(self):
+        super().Save()
+        self.simulator.reports[self.Name] = copy.deepcopy(self.report)
+
+
+def _table(rows):
+    """AfO returns None for an empty list and a flat tuple when the list has a single row"""
+    rows = [tuple(row) for row in rows]
+    if not rows:
+        return None
+    if len(rows) == 1:
+        return rows[0]
+    return tuple(rows)
+
+
+class AfOSimulator:
+    """
+    Handler of the Application.Run calls (see Refresh.FakeExcel.FakeApplication) that simulates SAP AfO.
+
+    reports: dictionary {filename: SimulatedReport}. Each opened workbook gets its own copy of the report
+    latencies: dictionary {'logon' | 'refresh' | 'submit' | 'call': Latency or text}
+    time_scale: multiplier of every latency (e.g. 0.01 runs a 10s refresh in 0.1s)
+    """
+    def __init__(self, reports, latencies=None, time_scale=1.0, seed=None):
+        self.reports = reports
+        self.latencies = {kind: Latency.parse(value) for kind, value in DEFAULT_LATENCIES.items()}
+        self.latencies.update({kind: Latency.parse(value) for kind, value in (latencies or dict()).items()})
+        self.time_scale = time_scale
+        self.rng = random.Random(seed)
+        self.waited = 0.0  # seconds spent simulating the latency (before the time_scale)
+
+    def _wait(self, kind):
+        seconds = self.latencies[kind].sample(self.rng)
+        self.waited += seconds
+        if seconds and self.time_scale:
+            time.sleep(seconds * self.time_scale)
+
+    # workbooks ---------------------------------------------------------------------------------------------------
+    def open_workbook(self, path):
+        """workbook_factory of the FakeApplication: the workbook carries a private copy of the report"""
+        return SimulatedWorkbook(path, self)
+
+    @staticmethod
+    def _crosstab(workbook, source):
+        for crosstab in workbook.report.crosstabs:
+            if crosstab.source == source:
+                return crosstab
+        raise SimulatorError(f'The data source {source} is not in {workbook.Name}')
+
+    def _refresh(self, workbook, crosstabs):
+        for crosstab in crosstabs:
+            self._wait('refresh')
+            workbook.draw(crosstab, self.rng)
+            crosstab.active = True
+            crosstab.dirty = crosstab.submit = False
+
+    # Application.Run ---------------------------------------------------------------------------------------------
+    def __call__(self, application, macro, args):
+        workbook = application.ActiveWorkbook
+        if workbook is None or not hasattr(workbook, 'report'):
+            raise SimulatorError(f'{macro} was called without an active AfO workbook')
+        method = getattr(self, '_run_' + macro.lower(), None)
+        if method is None:
+            raise SimulatorError(f'The macro {macro} is not simulated')
+        return method(application, workbook, *args)
+
+    def _run_saplistof(self, application, workbook, kind):
+        self._wait('call')
+        if kind != 'CROSSTABS':
+            raise SimulatorError(f'SAPListOf {kind} is not simulated')
+        return _table((crosstab.name, crosstab.name.replace('Crosstab', 'Crosstab '), crosstab.source)
+                      for crosstab in workbook.report.crosstabs)
+
+    def _run_sapgetsourceinfo(self, application, workbook, source, info):
+        self._wait('call')
+        crosstab = self._crosstab(workbook, source)
+        return {'DataSourceName': crosstab.data_source_name, 'QueryTechName': crosstab.query,
+                'System': crosstab.system}[info]
+
+    def _run_saplogon(self, application, workbook, source, client, user, password):
+        crosstab = self._crosstab(workbook, source)
+        if crosstab.system not in application.connected_systems:  # the connection belongs to the Excel instance
+            self._wait('logon')
+            application.connected_systems.add(crosstab.system)
+        return 1
+
+    def _run_sapgetproperty(self, application, workbook, prop, source=None):
+        self._wait('call')
+        crosstab = self._crosstab(workbook, source)
+        if prop == 'IsConnected':
+            return crosstab.system in application.connected_systems
+        if prop == 'IsDataSourceActive':
+            return crosstab.active
+        raise SimulatorError(f'The property {prop} is not simulated')
+
+    def _run_sapexecutecommand(self, application, workbook, command, parameter=None):
+        crosstabs = workbook.report.crosstabs
+        if command in ('Refresh', 'RefreshData'):
+            if parameter in (None, 'ALL'):
+                targets = crosstabs
+            else:  # every crosstab of the data source
+                self._crosstab(workbook, parameter)
+                targets = [crosstab for crosstab in crosstabs if crosstab.source == parameter]
+            if any(crosstab.system not in application.connected_systems for crosstab in targets):
+                return 0  # AfO can't refresh a data source whose system is not logged on
+            if workbook.paused_submit:  # the data sources are activated and the data is fetched at the submit
+                for crosstab in targets:
+                    crosstab.active = crosstab.dirty = True
+                return 1
+            self._refresh(workbook, targets)
+        elif command == 'PauseVariableSubmit':
+            workbook.paused_submit = parameter == 'On'
+            if not workbook.paused_submit:
+                self._submit(workbook)
+        else:
+            raise SimulatorError(f'The command {command} is not simulated')
+        return 1
+
+    def _run_sapsetrefreshbehaviour(self, application, workbook, state):
+        workbook.refresh_behaviour = state == 'On'
+        if workbook.refresh_behaviour:
+            self._submit(workbook)
+        return 1
+
+    def _submit(self, workbook):
+        """refresh the data sources whose restrictions changed while the submit or the refresh was paused"""
+        if workbook.paused_submit or not workbook.refresh_behaviour:
+            return
+        dirty = [crosstab for crosstab in workbook.report.crosstabs if crosstab.dirty]
+        if any(crosstab.submit for crosstab in dirty):
+            self._wait('submit')
+        self._refresh(workbook, dirty)
+
+    def _run_saplistofvariables(self, application, workbook, source, value_type='INPUT_STRING', scope='ALL'):
+        self._wait('call')
+        crosstab = self._crosstab(workbook, source)
+        return _table((description, value) for description, (_, value) in crosstab.variables.items())
+
+    def _run_sapgetvariable(self, application, workbook, source, description, prop):
+        self._wait('call')
+        crosstab = self._crosstab(workbook, source)
+        if description not in crosstab.variables:
+            raise SimulatorError(f'The variable {description} is not in {source}')
+        technical, value = crosstab.variables[description]
+        return technical if prop == 'TECHNICALNAME' else value
+
+    def _run_saplistofdynamicfilters(self, application, workbook, source, value_type='INPUT_STRING'):
+        self._wait('call')
+        crosstab = self._crosstab(workbook, source)
+        rows = [('Measures', 'Amount')]
+        rows += [(crosstab.description_of(technical), value) for technical, value in crosstab.filters.items()]
+        return _table(rows)
+
+    def _run_saplistofdimensions(self, application, workbook, source):
+        self._wait('call')
+        return _table(self._crosstab(workbook, source).dimensions)
+
+    def _run_sapsetvariable(self, application, workbook, technical, value, value_type='INPUT_STRING', source=None):
+        self._wait('call')
+        crosstab = self._crosstab(workbook, source)
+        for variable in crosstab.variables.values():
+            if variable[0] == technical:
+                variable[1] = str(value)
+                break
+        else:
+            raise SimulatorError(f'The variable {technical} is not in {source}')
+        crosstab.dirty = crosstab.submit = True
+        self._submit(workbook)
+        return 1
+
+    def _run_sapsetfilter(self, application, workbook, source, technical, value, value_type='INPUT_STRING'):
+        self._wait('call')
+        crosstab = self._crosstab(workbook, source)
+        if not crosstab.active:
+            raise SimulatorError(f'The filters of {source} can only be set after it is refreshed')
+        if technical not in dict(crosstab.dimensions):
+            raise SimulatorError(f'The dimension {technical} is not in {source}')
+        crosstab.filters[technical] = str(value)
+        crosstab.dirty = True
+        self._submit(workbook)
+        return 1
+
+
+class SimulatedDriver:
+    """Driver (see Refresh.Driver) that opens fake Excel instances answered by an AfOSimulator"""
+    requires_network = False
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def open_excel(self, new_instance=False):
+        application = FakeApplication(self.simulator, self.simulator.open_workbook)
+        application.connected_systems = set()  # SAP systems logged on in the instance
+        return application
+
+    def kill_instances(self):
+        pass
+
+    def kill_instance(self, xl_Instance):
+        pass
+
+    def dismiss_popup(self):
+        pass
@@ -3,23 +3,74 @@
 Created on 3/14/2021
 Author: Arnold Souza
 Email: arnoldporto@gmail.com
+
+Importing the package has no side effects. The config workbook is only read (and the log path only resolved)
+the first time one of them is needed. The location of the config workbook is, by order of precedence:
+    1) the path given to set_config_path() (or to the config_path argument of the main functions)
+    2) the environment variable SAP_REFRESH_CONFIG
+    3) the default DEFAULT_CONFIG_PATH
 """
-import pathlib
+import os
 
-import pandas as pd
+from sapRefresh.Core.Time import timeit
+from sapRefresh.Core.Config import GlobalConfig, load_config_workbook
 
-from Core.Time import timeit
+DEFAULT_CONFIG_PATH = r'\\branapv-sql01\DIGITAL_TRANSFORMATION\Python\Config\config.xlsx'
+CONFIG_PATH_ENV = 'SAP_REFRESH_CONFIG'
 
-CONFIG_PATH = r'\\branapv-sql01\DIGITAL_TRANSFORMATION\Python\Config\config.xlsx'
+# lazy loaded state of the package
+_state = {'global_configs': None, 'log_path': None}
 
 
 @timeit
 def import_global_configurations(config_location):
     """import all the necessary information so that the script can work well"""
-    df_global_configs = pd.read_excel(config_location, sheet_name='global_configs')
-    path_log = pathlib.Path(df_global_configs.query('description=="path-log_directory"')['value'].values[0])
+    df_global_configs = load_config_workbook(config_location)['global_configs']
+    path_log = GlobalConfig(df_global_configs).get_path('path-log_directory')
     return df_global_configs, path_log
 
 
-# import global configurations
-global_configs_df, LOG_PATH = import_global_configurations(CONFIG_PATH)
+def get_config_path():
+    """location of the config workbook"""
+    return os.environ.get(CONFIG_PATH_ENV) or DEFAULT_CONFIG_PATH
+
+
+def set_config_path(config_path):
+    """
+    override the location of the config workbook. The value is stored in the environment,
+    so the worker processes started by the application use the same file
+    """
+    if config_path is None:
+        return
+    os.environ[CONFIG_PATH_ENV] = str(config_path)
+    _state['global_configs'] = None
+    _state['log_path'] = None
+
+
+def get_global_configs():
+    """global configurations (GlobalConfig), loaded from the config workbook on the first call"""
+    if _state['global_configs'] is None:
+        df_global_configs, path_log = import_global_configurations(get_config_path())
+        _state['global_configs'] = GlobalConfig(df_global_configs)
+        _state['log_path'] = path_log
+    return _state['global_configs']
+
+
+def get_log_path():
+    """directory of the log files, loaded from the config workbook on the first call"""
+    if _state['log_path'] is None:
+        get_global_configs()
+    return _state['log_path']
+
+
+def __getattr__(name):
+    """keep the old module attributes available, but resolve them only when they are accessed"""
+    if name == 'CONFIG_PATH':
+        return get_config_path()
+    if name == 'LOG_PATH':
+        return get_log_path()
+    if name == 'global_configs':
+        return get_global_configs()
+    if name == 'global_configs_df':
+        return get_global_configs().df
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
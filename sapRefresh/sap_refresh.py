@@ -6,52 +6,187 @@ Email: arnoldporto@gmail.com
 """
 import os
 import sys
+import time
+import functools
 import pathlib
 from datetime import date
 
 import pandas as pd
 from halo import Halo
-from tenacity import retry, wait_fixed, before_sleep_log, stop_after_attempt
 
 MODULE_CURRENT_PATH = os.path.abspath('.')
 MODULE_PARENT_PATH = os.path.dirname(MODULE_CURRENT_PATH)
 sys.path.append(MODULE_PARENT_PATH)
 
 from sapRefresh.Core import Connection as Conn
-from sapRefresh.Core.Time import timeit, get_time_intelligence
+from sapRefresh.Core import Probe
+from sapRefresh.Core import Cripto
+from sapRefresh.Core.Notifier import Notifier, get_notifier
+from sapRefresh.Core.Time import timeit, get_time_intelligence, TimingRecorder, add_timing_listener
+from sapRefresh.Core import Schedule
+from sapRefresh.Core.Config import GlobalConfig, load_config_workbook
+from sapRefresh.Core.Cache import TechnicalNameCache, get_cache_directory, fingerprint
+from sapRefresh.Core.Manifest import WorkbookManifest
+from sapRefresh.Core.Catalog import MetadataCatalog
+from sapRefresh.Core.Plan import compile_plans, format_plan
+from sapRefresh.Core.Ledger import RefreshLedger
+from sapRefresh.Core import Metrics
+from sapRefresh.Core import Retry
+from sapRefresh.Core.Retry import adaptive_retry
 from sapRefresh.Refresh import Engine as Xl
 from sapRefresh.Refresh import Sap
+from sapRefresh.Refresh import Pool
+from sapRefresh.Refresh import Proxy
+from sapRefresh.Refresh import Cassette
+from sapRefresh.Refresh import Export
+from sapRefresh.Refresh.Session import SessionManager
+from sapRefresh.Refresh.Driver import get_driver, set_driver
 
 # configure the log object
-import logging
 from sapRefresh.Core.base_logger import get_logger
-from sapRefresh import LOG_PATH, global_configs_df, CONFIG_PATH  # import info from the __init__ file
-logger, LOG_FILEPATH = get_logger(__name__, LOG_PATH)
+from sapRefresh import get_global_configs, get_config_path, set_config_path  # import info from the __init__ file
+logger = get_logger(__name__)
 
+SESSION_MAX_REPORTS = 20  # default value when "session-max_reports" is not in the global configs
+REFRESH_MODES = ('classic', 'single')  # values of "refresh-mode" (see refresh_report)
+REFRESH_PHASE = 'refresh_phase:{}'  # phase of the metrics and the ledger with the data fetches of a refresh mode
 
-@retry(reraise=True, wait=wait_fixed(10), before_sleep=before_sleep_log(logger, logging.DEBUG), stop=stop_after_attempt(3))
+
+@adaptive_retry
 @timeit
 def get_configurations(config_path):
-    """get all necessary dataframes to serve the SapRefresh class"""
-    global_configs = pd.read_excel(config_path, sheet_name='global_configs')
-    data_sources = pd.read_excel(config_path, sheet_name='data_sources')
-    variables_filters = pd.read_excel(config_path, sheet_name='variables_filters')
+    """get all necessary dataframes to serve the SapRefresh class (single pass, see Core.Config.load_config_workbook)"""
+    sheets = load_config_workbook(config_path)
+    global_configs, data_sources, variables_filters = (sheets['global_configs'], sheets['data_sources'],
+                                                       sheets['variables_filters'])
     print('Successfully loaded the configurations')
     return global_configs, data_sources, variables_filters
 
 
+def get_session_max_reports(config=None):
+    """number of reports a warm Excel instance can refresh before it is recycled"""
+    config = config or get_global_configs()
+    return config.get_int('session-max_reports', SESSION_MAX_REPORTS)
+
+
+def get_pool_settings(config=None):
+    """
+    get the parameters of the parallel refresh:
+        - pool-workers: number of worker processes (1 = sequential refresh)
+        - pool-system_limit: max concurrent reports in the same SAP system
+        - pool-system_limit-<SYSTEM>: max concurrent reports of a specific SAP system
+    """
+    config = config or get_global_configs()
+    workers = config.get_int('pool-workers', 1)
+    default_limit = config.get_int('pool-system_limit', workers)
+    system_limits = {system: int(limit) for system, limit in config.with_prefix('pool-system_limit-').items()}
+    return workers, default_limit, system_limits
+
+
+def install_metrics():
+    """feed the metrics registry of the process with the timeit durations and the Application.Run calls"""
+    add_timing_listener(Metrics.registry.on_timing)
+    Proxy.add_run_listener(Metrics.registry.on_run)
+
+
+def write_metrics(name, config=None):
+    """
+    write the metrics of the run (prometheus textfile and json summary) in the "path-metrics_directory"
+    and warn about the phases slower than usual
+    """
+    config = config or get_global_configs()
+    directory = config.get_path('path-metrics_directory', get_cache_directory(config) / 'metrics')
+    for phase, (median, limit) in Metrics.registry.regressions(Metrics.load_history(directory)).items():
+        logger.warning(f'The phase {phase} took {median:.1f}s (median), above the p90 of the last runs ({limit:.1f}s)')
+    try:
+        prom_path, json_path = Metrics.registry.write(directory, name)
+        print(f'Metrics saved in {prom_path} and {json_path}')
+    except OSError as e:
+        logger.error(f"Couldn't save the metrics in {directory} ({e})")
+
+
+class PoolDriver:
+    """
+    Driver of each worker process of the parallel refresh. Every worker keeps its own warm Excel instance.
+    excel_driver is the Refresh.Driver of the scheduler (spawned processes start with the default ComDriver).
+    The workers never send emails: the scheduler notifies the results
+    """
+    def __init__(self, plans, excel_driver=None):
+        if excel_driver is not None:
+            set_driver(excel_driver)
+        install_metrics()
+        self.plans = plans
+        self.session = SapRefresh(keep_alive=True, max_reports=get_session_max_reports(), exclusive=False)
+        self.ledger = RefreshLedger(get_cache_directory(self.session.global_configs))
+
+    def refresh(self, job):
+        """refresh one report of the queue"""
+        refresh_report(self.plans[job['filename']], self.session, self.ledger, notify=False)
+
+    def metrics(self):
+        """metrics of the last job, sent to the scheduler to be merged in the metrics of the run"""
+        return Metrics.registry.drain()
+
+    def close(self):
+        """terminate the Excel instance of the worker"""
+        self.session.quit()
+        self.ledger.close()
+
+
+def cassette_filepath(filename, config=None):
+    """
+    path of the cassette where the SAP AfO calls of a report are recorded (<name>.jsonl),
+    or None when "path-cassette_directory" is not in the global configs.
+    Only the runs against the real servers are recorded
+    """
+    config = config or get_global_configs()
+    directory = config.get_path('path-cassette_directory', None)
+    if directory is None or not get_driver().requires_network:
+        return None
+    return directory / (pathlib.PurePath(str(filename)).stem + '.jsonl')
+
+
+def get_catalog(config=None):
+    """metadata catalog of the reports (metadata_catalog.sqlite in "path-data_info")"""
+    config = config or get_global_configs()
+    path_data_info = config.get_path('path-data_info')
+    path_data_info.mkdir(parents=True, exist_ok=True)
+    return MetadataCatalog(path_data_info)
+
+
+def get_report_systems(config=None):
+    """
+    SAP system of each data source of the reports ({(filename, data_source): system}), collected in the
+    metadata catalog by collect_information. Empty before the first collection
+    """
+    catalog = get_catalog(config)
+    try:
+        return catalog.systems()
+    finally:
+        catalog.close()
+
+
 class SapRefresh:
     """Class that handles all the events related to the SapRefresh application"""
-    def __init__(self, config_df=global_configs_df):
-        # global configuration dataframe
-        self.global_configs = config_df
+    def __init__(self, config=None, keep_alive=False, max_reports=None, exclusive=True):
+        # global configurations (accepts the GlobalConfig object or the global_configs dataframe)
+        self.global_configs = GlobalConfig.coerce(config if config is not None else get_global_configs())
+        # exclusive: kill any other Excel process before starting. Must be False when instances run in parallel
+        self.exclusive = exclusive
+        # session parameters. When keep_alive is True the Excel instance is reused by the next report
+        self.keep_alive = keep_alive
+        self.max_reports = max_reports  # recycle the instance after this number of reports (None = never)
+        self.reports_in_instance = 0  # number of reports already closed in the current instance
         # file related parameter. Need to be set only when a workbook is loaded
-        self.data_source = None  # dictionary with all infos about the data source
+        self.data_sources = []  # dictionaries with all infos about each crosstab of the workbook and its data source
+        self.data_source = None  # dictionary of the main data source (the first crosstab)
         self.source = None  # the name of the data source that was loaded (usually DS_1)
         self.filepath = None  # the filepath of the SAP AfO file
         # Classes of Excel API
         self.ExcelInstance = None
         self.WorkbookSAP = None
+        # SAP sessions of the Excel instance, reused by the next reports of a warm instance
+        self.sessions = SessionManager()
         # parameters set when workbook is opened
         self.calc_state_init = None
         # state parameters
@@ -69,19 +204,25 @@ class SapRefresh:
         Call method to activate SAP AfO AddIn. Capture the initial calculation state. Activate workbook.
         Finally do the initial calculation.
         """
-        # ensure the application is in the correct network
-        host = self.global_configs.query('description=="ping-host"')['value'].values[0]
-        port = self.global_configs.query('description=="ping-port"')['value'].values[0]
-        Conn.check_connection(host, port)
+        # ensure the application is in the correct network (not needed by offline drivers).
+        # The probe is cached, so a batch checks the servers once every "ping-ttl" seconds
+        if get_driver().requires_network:
+            Probe.ensure_reachable(self.global_configs)
         # ensure the filepath is of the correct type
-        if type(filepath) is not pathlib.WindowsPath:
-            raise TypeError(f'The filepath variable ({filepath}) is not a pathlib.WindowsPath class')
-        # kill every excel instance so that no further erros can happen
-        Xl.kill_excel_instances()
-        self.ExcelInstance = Xl.open_excel()
-        Xl.optimize_instance(self.ExcelInstance, 'start')
+        if not isinstance(filepath, pathlib.PurePath):
+            raise TypeError(f'The filepath variable ({filepath}) is not a pathlib path')
+        # reuse the warm Excel instance when in session mode, otherwise start a new one
+        is_warm = self.keep_alive and self._is_instance_reusable()
+        if not is_warm:
+            self.quit()
+            if self.exclusive:
+                # kill every excel instance so that no further erros can happen
+                Xl.kill_excel_instances()
+            self.ExcelInstance = Xl.open_excel(new_instance=not self.exclusive)
+            Xl.optimize_instance(self.ExcelInstance, 'start')
         self.WorkbookSAP = Xl.open_workbook(self.ExcelInstance, filepath)
-        Xl.ensure_addin(self.ExcelInstance)
+        if not is_warm:
+            Xl.ensure_addin(self.ExcelInstance)
         self.calc_state_init = Xl.calculation_state(self.ExcelInstance, 'start')
         Xl.ensure_wb_active(self.ExcelInstance, filepath.name)
         # assign the filepath of the SAP AfO file
@@ -92,58 +233,159 @@ class SapRefresh:
         """Calculate workbook to refresh values"""
         self.ExcelInstance.Application.Calculate()
 
-    def get_data_source(self):
-        """get data information about SAP AfO objects in a workbook"""
-        self.data_source = Xl.get_data_source(self.ExcelInstance)
-        self.source = self.data_source['DS']  # set source to a property for the easy access it
-        print('\n', 'data source retrieved', '\n', self.data_source)
+    def get_data_sources(self):
+        """get data information about SAP AfO objects in a workbook: every crosstab and its data source"""
+        self.data_sources = Xl.get_data_sources(self.ExcelInstance)
+        self.data_source = self.data_sources[0]
+        self.source = self.data_source['DS']  # set the main source to a property for the easy access it
+        print('\n', f'{len(self.data_sources)} crosstabs retrieved', '\n', self.data_sources)
+
+    @property
+    def sources(self):
+        """aliases of the data sources of the workbook (a data source can feed several crosstabs)"""
+        return list(dict.fromkeys(data_source['DS'] for data_source in self.data_sources))
 
-    def logon(self, source=None):
+    def logon(self, source=None, system=None):
         """
         Logon into the SAP AfO System. The logon is file dependent. That's because you need to refer the
-        data source to connect to SAP. It uses the source of the get_data_source method.
+        data source to connect to SAP. It uses the main source of the get_data_sources method.
+        The logon is skipped when the Excel instance already has a session of the system (see Refresh.Session)
         """
         # assign variables
-        client = self.global_configs.query('description=="logon-client"')['value'].values[0]
-        user = self.global_configs.query('description=="logon-user"')['value'].values[0]
-        password = self.global_configs.query('description=="logon-password"')['value'].values[0]
+        client = self.global_configs.get_str('logon-client')
+        user = self.global_configs.get_str('logon-user')
+        password = self.global_configs.get_str('logon-password')
         if source is not None:
             self.source = source
         # execute the logon method
-        self.is_logged = Sap.sap_logon(self.ExcelInstance, self.source, client, user, password)
+        self.is_logged = self.sessions.logon(self.ExcelInstance, self.source, system, client, user, password)
+
+    def logon_sources(self, sources):
+        """
+        Logon the data sources, given as pairs (alias, system). A known system is logged on once, by its first
+        data source: the other data sources of the system use the same connection. The main data source (the
+        first pair) is kept as the current source
+        """
+        systems = set()
+        for source, system in sources:
+            if system is not None and system in systems:
+                continue
+            systems.add(system)
+            self.logon(source, system)
+        self.source = sources[0][0]
+
+    def refresh_targets(self, sources):
+        """
+        parameters of the refresh commands of the data sources (see Sap.refresh_targets): a single ALL when the
+        sources are every data source of the workbook, so the sources that share a query or a variable container
+        are refreshed by one command
+        """
+        missing = [source for source in sources if source not in self.sources]
+        if missing:
+            raise Retry.WorkbookError(f'The data sources {", ".join(missing)} are not in the workbook '
+                                      f'{self.filepath.name}')
+        targets = Sap.refresh_targets(sources, self.sources)
+        if targets != [Sap.ALL_SOURCES]:
+            print(f'The workbook has data sources out of the plan: refreshing {", ".join(targets)} one by one')
+        return targets
 
     def refresh(self):
         """Do there initial refresh of data in the workbook."""
         self.is_refreshed = Sap.sap_refresh(self.ExcelInstance)
 
-    def refresh_data(self):
-        """Refresh the transaction data for all data sources in the workbook."""
-        self.is_refreshed_data = Sap.sap_refresh_data(self.ExcelInstance, self.data_source)
+    def refresh_data(self, targets=None):
+        """Refresh the transaction data of the data sources (targets, default: the current source)."""
+        for target in targets or [self.source]:
+            self.is_refreshed_data = Sap.sap_refresh_data(self.ExcelInstance, target)
 
     def additional_source_info(self):
         """
-        Query more information and append it to the data source dictionary.
+        Query more information and append it to the dictionary of each crosstab (once per data source).
         Attention. This method is dependent of Data Source initiation.
         """
-        self.data_source = Sap.sap_get_more_info(self.ExcelInstance, self.data_source)
-        print('Additional data source information retrieved', '\n', self.data_source)
+        information = dict()
+        for data_source in self.data_sources:
+            if data_source['DS'] not in information:
+                information[data_source['DS']] = Sap.sap_get_more_info(self.ExcelInstance, {'DS': data_source['DS']})
+            data_source.update(information[data_source['DS']])
+        print('Additional data source information retrieved', '\n', self.data_sources)
 
     @timeit
-    def close(self):
+    def save(self):
+        """save the workbook (with the refreshed data)"""
+        self.WorkbookSAP.Save()
+
+    @timeit
+    def close(self, save=True):
         """
         Make all the necessary procedures to terminate the excel instance.
             - put the  calculation back to the original state
-            - terminate the workbook instance
+            - terminate the workbook instance (saving it, unless save is False)
             - Configure the Excel Instance to the original state
             - Close the Excel Instance
+        In session mode (keep_alive) the Excel Instance is kept open to the next report
         """
         Xl.calculation_state(self.ExcelInstance, 'stop', self.calc_state_init)
-        Xl.close_workbook(self.WorkbookSAP)
-        Xl.optimize_instance(self.ExcelInstance, 'stop')
-        self.ExcelInstance.Application.Quit()
+        Xl.close_workbook(self.WorkbookSAP, save)
         self.WorkbookSAP = None
+        if self.keep_alive:
+            self.reports_in_instance += 1
+            self.reset_state()
+            print('The report was Successfully closed. The Excel instance is kept alive')
+        else:
+            self.quit()
+            print('The application was Successfully closed')
+
+    def quit(self):
+        """
+        Configure the Excel Instance to the original state and close it. It is also called when a report failed,
+        so the workbooks still open are discarded first: a "save changes?" prompt would block the batch.
+        The process of an instance that can't be quit is killed
+        """
+        if self.ExcelInstance is None:
+            return
+        try:
+            Xl.close_open_workbooks(self.ExcelInstance)
+            Xl.optimize_instance(self.ExcelInstance, 'stop')
+            self.ExcelInstance.Application.Quit()
+        except BaseException as e:  # to catch pywintypes.error when the instance is already dead
+            logger.warning(f"Couldn't quit the Excel instance properly ({e}). Killing its process")
+            try:
+                Xl.kill_excel_instance(self.ExcelInstance)
+            except BaseException as e:  # the process is already gone
+                logger.warning(f"Couldn't kill the Excel instance ({e})")
         self.ExcelInstance = None
-        print('The application was Successfully closed')
+        self.WorkbookSAP = None
+        self.reports_in_instance = 0
+        self.sessions.clear()
+        self.reset_state()
+
+    def reset_state(self):
+        """clean every report related property so that the next report starts from scratch"""
+        self.data_sources = []
+        self.data_source = None
+        self.source = None
+        self.filepath = None
+        self.calc_state_init = None
+        self.is_logged = None
+        self.is_refreshed = None
+        self.is_refreshed_data = None
+        self.state_refresh_behavior = None
+        self.state_variable_submit = None
+        self.variables_filters = None
+
+    def _is_instance_reusable(self):
+        """check if the warm Excel instance can receive the next report"""
+        if self.ExcelInstance is None:
+            return False
+        if self.max_reports is not None and self.reports_in_instance >= self.max_reports:
+            print(f'The Excel instance refreshed {self.reports_in_instance} reports. Recycling it...')
+            return False
+        if not Xl.is_instance_healthy(self.ExcelInstance):
+            logger.warning('The Excel instance failed the health check. Recycling it...')
+            return False
+        Xl.close_open_workbooks(self.ExcelInstance)
+        return True
 
     def get_variables_list(self):
         """Return a dictionary of the variables that exists in the data source"""
@@ -151,73 +393,99 @@ class SapRefresh:
         return variables_list
 
     def variables_filters_list(self):
-        """Return a dataframe with all the variables and filters inside the datasource"""
-        # get the list of variables
-        variables_list = Sap.sap_get_variables(self.ExcelInstance, self.source)
+        """Return a dataframe with all the variables and filters of every data source of the workbook"""
+        # technical names are cached by query. The cache is invalidated when the query metadata changes
+        cache = TechnicalNameCache(get_cache_directory(self.global_configs))
+        frames = []
+        for source in self.sources:
+            data_source = next(values for values in self.data_sources if values['DS'] == source)
+            frames.append(self.source_variables_filters(data_source, cache))
+        cache.save()
+        print(f'Technical names: {cache.hits} from the cache, {cache.misses} from SAP AfO')
+        # assign values to properties
+        self.variables_filters = pd.concat(frames, ignore_index=True)
+        return self.variables_filters
+
+    def source_variables_filters(self, data_source, cache):
+        """Return a dataframe with the variables and filters of a data source (dictionary of get_data_sources)"""
+        source = data_source['DS']
+        # get the list of variables, filters (measures) and dimensions (fields)
+        variables_list = Sap.as_rows(Sap.sap_get_variables(self.ExcelInstance, source))
+        filters_list = Sap.as_rows(Sap.sap_get_filters(self.ExcelInstance, source))
+        dimensions_list = Sap.as_rows(Sap.sap_get_dimensions(self.ExcelInstance, source))
+        system, query = data_source.get('System'), data_source.get('Query')
+        cache.validate(system, query, fingerprint(
+            sorted(str(variable[0]) for variable in variables_list),
+            sorted([str(value) for value in dimension[:2]] for dimension in dimensions_list)
+        ))
         # get technical name of the variables and append to Restrictions list
         restrictions = []
         for variable in variables_list:
+            technical_name = cache.get(system, query, variable[0])
+            if technical_name is None:
+                technical_name = Sap.sap_get_technical_name(self.ExcelInstance, source, variable[0])
+                cache.set(system, query, variable[0], technical_name)
             restrictions.append(
                 {
                     'command': 'SAPSetVariable',
-                    'field': Sap.sap_get_technical_name(self.ExcelInstance, self.source, variable[0]),
+                    'field': technical_name,
                     'field_name': variable[0],
                     'value': variable[1]
                 }
             )
-        # get the list of filters (measures)
-        filters_list = Sap.sap_get_filters(self.ExcelInstance, self.source)
-        # get list of dimensions (fields)
-        dimensions_list = Sap.sap_get_dimensions(self.ExcelInstance, self.source)
+        # index the technical name of the dimensions by their description
+        technical_names = {dimension[1]: dimension[0] for dimension in dimensions_list}
         # search in dimensions the technical name of each filter then append values to Restrictions list
         for filter_ in filters_list:
             if filter_[0] != 'Measures':
                 values = dict()
                 values['command'] = 'SAPSetFilter'
-                for dimension in dimensions_list:
-                    if dimension[1] == filter_[0]:
-                        values['field'] = dimension[0]  # get the technical name
+                if filter_[0] in technical_names:
+                    values['field'] = technical_names[filter_[0]]  # get the technical name
                 values['field_name'] = filter_[0]
                 values['value'] = filter_[1]
                 restrictions.append(values)
         # create the dataframe with filters and variables
         # noinspection PyTypeChecker
         variables_filters = pd.DataFrame.from_dict(restrictions)
-        variables_filters['data_source'] = self.source
+        variables_filters['data_source'] = source
         variables_filters['reference_type'] = 'value'
-        variables_filters['data_source_name'] = self.data_source['DataSourceName']
-        variables_filters['data_source_sheet'] = self.data_source['Sheet']
-        # assign values to properties
-        self.variables_filters = variables_filters
+        variables_filters['data_source_name'] = data_source['DataSourceName']
+        variables_filters['data_source_sheet'] = data_source['Sheet']
         return variables_filters
 
     def data_source_list(self):
-        """Return a Df with data source information"""
+        """Return a Df with the information of the main data source"""
         data_source = pd.DataFrame(list(self.data_source.items()), columns=['Key', 'Value'])
         return data_source
 
     @timeit
-    def export_variables_filters(self):
-        """export to an Excel file the data source information and variables and filters values"""
-        # load information from class' properties
-        filepath = self.filepath
-        path_data_info = pathlib.Path(self.global_configs.query('description=="path-data_info"')['value'].values[0])
-        # create the pathname
-        name_file = filepath.name[:len(filepath.suffix) * -1]
-        complement = '__information'
-        file_extension = filepath.suffix
-        new_name = pathlib.Path(name_file + complement + file_extension)
-        new_filepath = path_data_info / new_name
-        # assign dataframes
-        data_source_info = self.data_source_list()
+    def export_variables_filters(self, catalog):
+        """
+        register the information of every data source and crosstab and the variables and filters values of the
+        report in the metadata catalog. Returns the hash of the entry of the report in the catalog
+        """
         variables_filters_info = self.variables_filters_list()
-        # Create a Pandas Excel writer using XlsxWriter as the engine.
-        writer = pd.ExcelWriter(new_filepath, engine='xlsxwriter')
-        # write the dataframes
-        data_source_info.to_excel(writer, sheet_name='data_source_info')
-        variables_filters_info.to_excel(writer, sheet_name='variables_filters_info')
-        # Close the Pandas Excel writer and output the Excel file.
-        writer.save()
+        catalog.upsert_report(self.filepath.name, self.data_sources, variables_filters_info)
+        return catalog.report_hash(self.filepath.name)
+
+    @timeit
+    def export_crosstabs(self, crosstabs):
+        """
+        export the data of the crosstabs (defined names, e.g. SAPCrosstab1) to "path-export_directory" as
+        <report>__<crosstab>.csv (or .parquet with "export-format" = parquet). Returns the statistics of each file
+        """
+        directory = self.global_configs.get_path('path-export_directory')
+        fmt = self.global_configs.get_str('export-format', 'csv').lower()
+        chunk_rows = self.global_configs.get_int('export-chunk_rows', Export.CHUNK_ROWS)
+        stem = self.filepath.name[:len(self.filepath.suffix) * -1]
+        exported = []
+        for crosstab in crosstabs:
+            path = directory / f'{stem}__{crosstab}.{fmt}'
+            stats = Export.export_crosstab(self.WorkbookSAP, crosstab, path, fmt, chunk_rows)
+            print(f'{crosstab} exported to {path} ({stats["rows"]} rows)')
+            exported.append(stats)
+        return exported
 
     def is_ds_active(self):
         """check whether a data source is active"""
@@ -229,19 +497,33 @@ class SapRefresh:
         state_connection = Sap.sap_is_connected(self.ExcelInstance, self.source)
         return state_connection
 
+    def plan_restrictions(self, restrictions):
+        """
+        Compare the restrictions (variables or filters, see Core.Plan.Restriction) with the current state of the
+        data sources and keep only the ones whose value changes. Returns the pending restrictions and the statistics
+        """
+        pending, stats = Sap.sap_plan_restrictions(self.ExcelInstance, [item._asdict() for item in restrictions])
+        stats['applied'] = len(pending)
+        # the skipped restrictions save one COM call each and the reads cost one: they are reported apart, since the
+        # reads can cost more than they save when the values change at every run
+        Metrics.registry.increment('restrictions_skipped_total', stats['skipped'])
+        Metrics.registry.increment('restriction_reads_total', stats['reads'])
+        for restriction in pending:
+            print('\t', f"Setting [{restriction['field_name']}] to [{restriction['value']}]")
+        print('\t', f"{stats['requested']} restrictions: {stats['applied']} to set, {stats['skipped']} already set "
+              f"({stats['reads']} COM calls to read the current values)")
+        return pending, stats
+
     def set_refresh_variables(self, variables_list):
+        """set the variables in bulk while the variable submit is paused, then refresh the data once"""
         print('Starting to set the variables:')
+        pending, stats = self.plan_restrictions(variables_list)
+        if not pending:
+            print('The variables already have the desired values')
+            return stats
         self.state_refresh_behavior = self.ExcelInstance.Application.Run("SAPSetRefreshBehaviour", "Off")
         self.state_variable_submit = self.ExcelInstance.Application.Run("SAPExecuteCommand", "PauseVariableSubmit", "On")
-        for index, variable in variables_list.iterrows():
-            print('\t', f'Trying to set [{variable.field_name}] to [{variable.value}] ', end='')
-            self.ExcelInstance.Application.Run(
-                variable.command,
-                variable.field,
-                variable.value,
-                "INPUT_STRING",
-                variable.data_source)
-            print('Ok!')
+        Sap.sap_set_restrictions(self.ExcelInstance, pending)
         # start waiting spinner
         spinner = Halo(text='Loading', spinner='dots')
         spinner.start()
@@ -251,20 +533,55 @@ class SapRefresh:
         # stop waiting spinner
         spinner.succeed('End!')
         print('The variables were set properly')
+        return stats
+
+    @timeit
+    def refresh_restricted(self, filters_list, variables_list, targets=None):
+        """
+        Activate the data sources (targets, default: the current source) with the refresh and the variable submit
+        paused, set the filters and the variables, then resume them (same order of set_refresh_variables) so the
+        data is fetched once, at the submit. When no restriction was submitted the data is refreshed explicitly.
+        The classic flow (refresh_data, set_refresh_filters and set_refresh_variables) fetches the data up to
+        three times.
+        Attention: it relies on AfO deferring the fetch of the activation while the submit is paused, which was
+        only checked against Refresh.Simulator. That's why "refresh-mode" defaults to classic
+        """
+        targets = targets or [self.source]
+        print('Starting to set the filters and the variables:')
+        self.state_refresh_behavior = Sap.sap_set_refresh_behaviour(self.ExcelInstance, "Off")
+        self.state_variable_submit = Sap.sap_pause_variable_submit(self.ExcelInstance, "On")
+        for target in targets:
+            self.is_refreshed = Sap.sap_activate(self.ExcelInstance, target)
+        pending, stats = self.plan_restrictions(tuple(filters_list) + tuple(variables_list))
+        Sap.sap_set_restrictions(self.ExcelInstance, pending)
+        # the data fetches of the classic flow: the initial refresh plus one per group of changed restrictions
+        commands = {restriction['command'] for restriction in pending}
+        stats['fetches_avoided'] = len(commands)
+        Metrics.registry.increment('data_fetches_avoided_total', len(commands))
+        # start waiting spinner
+        spinner = Halo(text='Loading', spinner='dots')
+        spinner.start()
+        # refresh data with the new restrictions
+        self.state_variable_submit = Sap.sap_pause_variable_submit(self.ExcelInstance, "Off")
+        self.state_refresh_behavior = Sap.sap_set_refresh_behaviour(self.ExcelInstance, "On")
+        self.is_refreshed_data = self.state_refresh_behavior
+        if not pending:  # nothing was submitted: don't rely on the activation to fetch the data
+            for target in targets:
+                self.is_refreshed_data = Sap.sap_refresh_data(self.ExcelInstance, target)
+        # stop waiting spinner
+        spinner.succeed('End!')
+        print(f'The data was fetched ({stats["fetches_avoided"]} fetches of the classic flow avoided)')
+        return stats
 
-    def set_refresh_filters(self, df_filters):
+    def set_refresh_filters(self, filters_list):
+        """set the filters in bulk while the refresh is paused, then refresh the data once"""
         print('Starting to set the filters:')
+        pending, stats = self.plan_restrictions(filters_list)
+        if not pending:
+            print('The filters already have the desired values')
+            return stats
         self.state_refresh_behavior = self.ExcelInstance.Application.Run("SAPSetRefreshBehaviour", "Off")
-        for index, filter_item in df_filters.iterrows():
-            print('\t', f'Trying to set [{filter_item.field_name}] to [{filter_item.value}] ', end='')
-            self.ExcelInstance.Application.Run(
-                filter_item.command,
-                filter_item.data_source,
-                filter_item.field,
-                filter_item.value,
-                "INPUT_STRING"
-            )
-            print('Ok!')
+        Sap.sap_set_restrictions(self.ExcelInstance, pending)
         # start waiting spinner
         print('Start to refresh the data with the new restrictions')
         spinner = Halo(text='Loading', spinner='dots')
@@ -274,80 +591,330 @@ class SapRefresh:
         # stop waiting spinner
         spinner.succeed('End!')
         print('The filters were set properly')
+        return stats
 
 
-def get_report_information(filepath):
-    """function to collect variables and filters of a report given a filepath"""
+def get_report_information(filepath, catalog=None):
+    """
+    function to collect variables and filters of a report given a filepath into the metadata catalog.
+    Returns the hash of the entry of the report in the catalog
+    """
     # initiate workbook
     SapReport = SapRefresh()
-    SapReport.open_report(filepath)
-    SapReport.calculate()
-    # logon and get information from data source
-    SapReport.get_data_source()
-    SapReport.logon()
-    SapReport.refresh()
-    SapReport.additional_source_info()
-    # export variables and filters to an Excel file
-    SapReport.export_variables_filters()
-    SapReport.close()
-
-
-def refresh_report(filename, data_sources, variables_filters):
-    """execute the flow necessary to refresh de desired report"""
+    if catalog is None:
+        catalog = get_catalog(SapReport.global_configs)
+    Metrics.registry.set_context(report=filepath.name, data_source=None, system=None)
+    start_time = time.perf_counter()
+    try:
+        with Cassette.recording(cassette_filepath(filepath.name, SapReport.global_configs)):
+            SapReport.open_report(filepath)
+            SapReport.calculate()
+            # logon and get information from data source
+            SapReport.get_data_sources()
+            SapReport.logon_sources([(source, None) for source in SapReport.sources])
+            SapReport.refresh()
+            SapReport.additional_source_info()
+            Metrics.registry.set_context(data_source=SapReport.source, system=SapReport.data_source.get('System'))
+            # register the variables and filters in the metadata catalog
+            export_hash = SapReport.export_variables_filters(catalog)
+            SapReport.close()
+    except Exception:
+        Metrics.registry.increment('reports_total', status='ERROR')
+        raise
+    Metrics.registry.increment('reports_total', status='SUCCESS')
+    Metrics.registry.observe('get_report_information', time.perf_counter() - start_time)
+    return export_hash
+
+
+def refresh_report(plan, SapReport=None, ledger=None, notify=True, notifier=None):
+    """
+    execute the flow necessary to refresh de desired report, following its plan (see Core.Plan.compile_plans).
+    A SapRefresh object in session mode can be passed to reuse its Excel instance.
+    Every data source of the plan is logged on and refreshed; when they are all the data sources of the workbook
+    each refresh command targets ALL of them at once.
+    With "refresh-mode" = classic (default) the data is fetched at the start and again after the filters and
+    after the variables, with single the restrictions are applied before the data is fetched once.
+    The result is registered in the refresh ledger and, with notify, sent to the notifier of the run
+    (or of the process, see Core.Notifier)
+    """
     # initiate workbook
-    SapReport = SapRefresh()
+    if SapReport is None:
+        SapReport = SapRefresh()
+    if ledger is None:
+        ledger = RefreshLedger(get_cache_directory(SapReport.global_configs))
+    filename = plan.filename
+    refresh_mode = SapReport.global_configs.get_str('refresh-mode', 'classic').lower()
+    if refresh_mode not in REFRESH_MODES:
+        raise ValueError(f'Unknown refresh-mode: {refresh_mode} (use one of {", ".join(REFRESH_MODES)})')
     # configure path
-    data_directory = pathlib.Path(global_configs_df.query('description=="path-data_directory"')['value'].values[0])
+    data_directory = SapReport.global_configs.get_path('path-data_directory')
     file_target = data_directory / filename
-    # open de SAP AfO report
-    SapReport.open_report(file_target)
-    SapReport.calculate()
-    # collect data sources
-    current_source = data_sources.query(f'filename=="{filename}"')['data_source'].values[0]
-    # logging on
-    SapReport.logon(current_source)
-    # do initial data refresh
-    SapReport.refresh_data()
-    # replace dynamic values in the parameters
-    dict_time_values = get_time_intelligence()
-    # start to deal with filters
-    df_filters = variables_filters.query(f'filename=="{filename}" and command=="SAPSetFilter"').replace({"value": dict_time_values})
-    if not df_filters.empty:
-        SapReport.set_refresh_filters(df_filters)
-    # start to deal with variables
-    df_variables = variables_filters.query(f'filename=="{filename}" and command=="SAPSetVariable"').replace({"value": dict_time_values})
-    if not df_variables.empty:
-        SapReport.set_refresh_variables(df_variables)
-    # save and close the report
-    SapReport.close()
-    # send email
-    mail_msg = f'Relatorio atualizado -> {str(file_target)}'
-    Conn.send_email(mail_msg, 'SUCCESS', 'SAP Refresh - Refresh Reports')
-
-
-def collect_information():
-    """collect al data source information of the reports that are the the \Data_refresh directory"""
-    data_directory = pathlib.Path(global_configs_df.query('description=="path-data_directory"')['value'].values[0])
+    # label the metrics of the report
+    Metrics.registry.set_context(report=filename, data_source=plan.data_source, system=plan.system)
+    breaker = Retry.get_breaker(plan.system)
+    start_time = time.perf_counter()
+    try:
+        # fail at once while the SAP system of the report is down
+        breaker.check()
+        # the durations measured by timeit are saved to schedule the next batches
+        with TimingRecorder() as recorder, Cassette.recording(cassette_filepath(filename, SapReport.global_configs)):
+            # open de SAP AfO report
+            SapReport.open_report(file_target)
+            SapReport.calculate()
+            # logging on every system of the data sources of the report
+            SapReport.get_data_sources()
+            SapReport.logon_sources([(source.data_source, source.system) for source in plan.sources])
+            targets = SapReport.refresh_targets([source.data_source for source in plan.sources])
+            refresh_start = time.perf_counter()
+            if refresh_mode == 'classic':
+                # do initial data refresh, then a refresh for the filters and another for the variables
+                SapReport.refresh_data(targets)
+                if plan.filters:
+                    SapReport.set_refresh_filters(plan.filters)
+                if plan.variables:
+                    SapReport.set_refresh_variables(plan.variables)
+            else:
+                # apply every restriction before fetching the data once
+                SapReport.refresh_restricted(plan.filters, plan.variables, targets)
+            # duration of the data fetches under each mode, so the saving of the single mode can be measured
+            refresh_phase = REFRESH_PHASE.format(refresh_mode)
+            refresh_seconds = time.perf_counter() - refresh_start
+            Metrics.registry.observe(refresh_phase, refresh_seconds)
+            # save the report before the export, so a failed export never loses the refresh
+            SapReport.save()
+            # export the data of the crosstabs (all the crosstabs of the workbook when the plan has none) to
+            # columnar files
+            if 'path-export_directory' in SapReport.global_configs:
+                try:
+                    SapReport.export_crosstabs(plan.crosstabs
+                                               or [values['Crosstab'] for values in SapReport.data_sources])
+                except Exception as e:
+                    logger.warning(f"Couldn't export the crosstabs of [{filename}] ({e!r})")
+                    Metrics.registry.increment('export_failures_total')
+            # close the report
+            SapReport.close(save=False)
+    except Exception as e:
+        breaker.record_failure(e)
+        ledger.record_failure(filename, repr(e))
+        Metrics.registry.increment('reports_total', status='ERROR')
+        if notify:
+            (notifier or get_notifier()).report(filename, 'ERROR', time.perf_counter() - start_time, repr(e))
+        raise
+    breaker.record_success()
+    Metrics.registry.increment('reports_total', status='SUCCESS')
+    duration = time.perf_counter() - start_time
+    Metrics.registry.observe('refresh_report', duration)
+    ledger.record_success(filename, plan.parameters_hash, duration)
+    ledger.record_timings(filename, dict(recorder.timings, **{refresh_phase: refresh_seconds}), duration)
+    # send email (in background)
+    if notify:
+        mail_msg = f'Relatorio atualizado -> {str(file_target)}'
+        (notifier or get_notifier()).report(filename, 'SUCCESS', duration, mail_msg)
+
+
+def collect_information(config_path=None, force=False):
+    """
+    collect al data source information of the reports that are the the \Data_refresh directory into the metadata
+    catalog. Workbooks that didn't change since the last collection are skipped, unless force is True.
+    With "catalog-xlsx" = yes the catalog is also written to metadata_catalog.xlsx for the business users
+    """
+    set_config_path(config_path)
+    install_metrics()
+    Cripto.get_provider()  # fail before opening any report when SAP_KEY is missing
+    global_configs = get_global_configs()
+    data_directory = global_configs.get_path('path-data_directory')
+    manifest = WorkbookManifest(get_cache_directory(global_configs))
+    catalog = get_catalog(global_configs)
     # search the directory for excel files to be refreshed
     list_files = Conn.search_directory(data_directory)
-    for file in list_files:
-        print(f'Starting to extract info from {file}')
-        file_target = data_directory / file
-        get_report_information(file_target)  # execute the data source extraction
-        print(f'finished extraction from {file}', '\n')
+    skipped = 0
+    try:
+        for file in list_files:
+            file_target = data_directory / file
+            if not force and manifest.is_unchanged(file_target, catalog.path, catalog.report_hash(file_target.name)):
+                print(f'Skipping {file}: the workbook did not change since the last collection')
+                skipped += 1
+                continue
+            print(f'Starting to extract info from {file}')
+            export_hash = get_report_information(file_target, catalog)  # execute the data source extraction
+            manifest.record(file_target, catalog.path, export_hash)
+            print(f'finished extraction from {file}', '\n')
+        # the workbooks removed from the directory leave the catalog
+        for filename in set(catalog.filenames()) - {(data_directory / file).name for file in list_files}:
+            catalog.remove_report(filename)
+        print(f'{len(list_files) - skipped} workbooks collected, {skipped} unchanged workbooks skipped')
+        if global_configs.get_bool('catalog-xlsx', False):
+            print(f'Catalog exported to {catalog.export_xlsx(catalog.path.with_suffix(".xlsx"))}')
+    finally:
+        catalog.close()
+        Metrics.registry.clear_context()
+        write_metrics('sap_collect', global_configs)
+
+
+def schedule_reports(data_sources):
+    """mark with refresh=Y the reports that must be refreshed today (the day of month column or 99 = every day)"""
+    today = date.today().day
+    data_sources['refresh'] = data_sources['refresh'].apply(lambda x: 'Y' if x >= today or x == 99 else 'N')
+    return data_sources
 
 
-def refresh_auto_reports():
-    """function to automate the refresh of reports based on the parameters set in config file"""
-    _, data_sources, variables_filters = get_configurations(CONFIG_PATH)
+def report_status(config_path=None):
+    """dataframe with the situation of every report of the config file in the refresh ledger"""
+    set_config_path(config_path)
+    _, data_sources, variables_filters = get_configurations(get_config_path())
+    plans, errors = compile_plans(data_sources, variables_filters, get_time_intelligence())
+    expected = {filename: plan.parameters_hash for filename, plan in plans.items()}
+    ledger = RefreshLedger(get_cache_directory(get_global_configs()))
+    try:
+        # the reports whose plan is invalid can't be refreshed
+        status = pd.DataFrame(ledger.status(expected) + [
+            {'filename': filename, 'state': 'invalid', 'last_error': '; '.join(problems)}
+            for filename, problems in errors.items()
+        ])
+    finally:
+        ledger.close()
+    scheduled = schedule_reports(data_sources).drop_duplicates('filename').set_index('filename')['refresh']
+    status['scheduled_today'] = status['filename'].map(scheduled)
+    return status
+
+
+def plan_batch(filenames, data_sources, ledger, workers=1, order='config'):
+    """
+    Sort the reports of the batch using the durations of the previous refreshes (see Core.Schedule.order_reports)
+    and print the predicted completion time. The optional columns "deadline" (HH:MM) and "priority"
+    of the data_sources sheet are used by the deadline order
+    """
+    durations = Schedule.fill_durations(filenames, ledger.expected_durations(filenames))
+    sources = data_sources.drop_duplicates('filename').set_index('filename')
+    deadlines, priorities = dict(), dict()
+    if 'deadline' in sources.columns:
+        deadlines = {filename: Schedule.parse_deadline(value) for filename, value in sources['deadline'].items()}
+    if 'priority' in sources.columns:
+        priorities = sources['priority'].dropna().to_dict()
+    ordered = Schedule.order_reports(filenames, durations, order, deadlines, priorities)
+    batch_end, finishes = Schedule.predict_completion(ordered, durations, workers)
+    print(f'{len(ordered)} reports to refresh (order: {order}, workers: {workers}). '
+          f'Predicted completion: {batch_end.strftime("%d/%m/%Y %H:%M:%S")}')
+    for filename in ordered:
+        deadline = deadlines.get(filename)
+        if deadline is not None and finishes[filename] > deadline:
+            logger.warning(f'[{filename}] is predicted to finish at {finishes[filename].strftime("%H:%M")}, '
+                           f'after its deadline ({deadline.strftime("%H:%M")})')
+    return ordered
+
+
+def refresh_auto_reports(config_path=None, force=False, notify=True, dry_run=False):
+    """
+    function to automate the refresh of reports based on the parameters set in config file.
+    The plan of every scheduled report is compiled and validated before Excel is opened: the reports with an
+    invalid plan fail at once and the others are refreshed.
+    Reports already refreshed today with the same effective parameters are skipped, unless force is True.
+    The queue is sorted according to the "schedule-order" config (config, longest or deadline).
+    The emails of the batch ("mail-mode": each, digest or off) share one SMTP session. With notify=False
+    no email is sent for the refreshed reports. With dry_run the plans are only printed (Excel is never opened)
+    """
+    set_config_path(config_path)
+    install_metrics()
+    Cripto.get_provider()  # fail before opening any report when SAP_KEY is missing
+    global_configs = get_global_configs()
+    _, data_sources, variables_filters = get_configurations(get_config_path())
     # change the dynamic days in the sources
-    today = date.today().day
-    data_sources['refresh'] = data_sources['refresh'].apply(lambda x: 'Y' if x >= today or x == 99 else 'N')
-    # start to refresh the reports
-    for filename in data_sources.query('refresh=="Y"').filename:  # execute command only to valid rows
-        print(f'Starting to refresh the reports: [{filename}]')
-        refresh_report(filename, data_sources, variables_filters)
-        print(f'Finished the refreshing of: [{filename}]')
+    data_sources = schedule_reports(data_sources)
+    filenames = list(data_sources.query('refresh=="Y"').filename.drop_duplicates())  # execute command only to valid rows
+    # the time intelligence values are replaced once for the whole batch. The SAP systems of the reports (limits
+    # of the parallel refresh and circuit breakers) come from the metadata catalog
+    plans, errors = compile_plans(data_sources, variables_filters, get_time_intelligence(), filenames,
+                                  get_report_systems(global_configs))
+    filenames = [filename for filename in filenames if filename in plans]
+    workers, default_limit, system_limits = get_pool_settings()
+    ledger = RefreshLedger(get_cache_directory(global_configs))
+    notifier = Notifier.from_config(global_configs) if notify and not dry_run else None
+    try:
+        for filename, problems in errors.items():
+            message = f'Invalid plan: {"; ".join(problems)}'
+            logger.error(f"Couldn't refresh [{filename}] ({message})")
+            if not dry_run:
+                ledger.record_failure(filename, message)
+                if notifier is not None:
+                    notifier.report(filename, 'ERROR', None, message)
+        # skip the reports that are already current in the ledger
+        if not force:
+            pending = []
+            for filename in filenames:
+                if ledger.is_current(filename, plans[filename].parameters_hash):
+                    print(f'Skipping [{filename}]: already refreshed today with the same parameters')
+                else:
+                    pending.append(filename)
+            filenames = pending
+        filenames = plan_batch(filenames, data_sources, ledger, workers,
+                               global_configs.get_str('schedule-order', 'config'))
+        if dry_run:
+            for filename in filenames:
+                print(format_plan(plans[filename]))
+            return plans
+        failed = list(errors)  # the invalid plans are failures of the batch
+        if workers > 1:
+            try:
+                refresh_parallel_reports(filenames, plans, workers, default_limit, system_limits, notifier=notifier)
+            except RuntimeError as e:
+                failed += e.args[1].split(', ')
+        else:
+            # one warm Excel instance is shared by all the reports of the batch
+            SapSession = SapRefresh(keep_alive=True, max_reports=get_session_max_reports())
+            try:
+                # start to refresh the reports. A failure doesn't stop the batch: the reports of a SAP system
+                # that keeps failing are skipped by its circuit breaker (see Core.Retry)
+                for filename in filenames:
+                    print(f'Starting to refresh the reports: [{filename}]')
+                    try:
+                        refresh_report(plans[filename], SapSession, ledger, notify, notifier)
+                    except Exception as e:
+                        logger.error(f"Couldn't refresh [{filename}] ({e!r})")
+                        failed.append(filename)
+                        SapSession.quit()  # the next report starts in a clean Excel instance
+                        continue
+                    print(f'Finished the refreshing of: [{filename}]')
+            finally:
+                SapSession.quit()
+                print(SapSession.sessions.summary())
+        if failed:
+            raise RuntimeError(f"Couldn't refresh {len(failed)} of {len(filenames) + len(errors)} reports",
+                               ', '.join(failed))
+        return plans
+    finally:
+        ledger.close()
+        if notifier is not None:
+            notifier.close()  # send the digest and wait for the pending emails
+        Metrics.registry.clear_context()
+        if not dry_run:
+            write_metrics('sap_refresh', global_configs)
+
+
+def refresh_parallel_reports(filenames, plans, workers, default_limit=None, system_limits=None, driver_factory=None,
+                             notifier=None):
+    """
+    refresh the reports using a pool of worker processes, each one with its own Excel instance.
+    The plans ({filename: ReportPlan}) are sent to the workers, and the SAP system of each plan limits the
+    number of reports of the system refreshed at the same time. The results are sent to the notifier, if any
+    """
+    if driver_factory is None:
+        driver_factory = functools.partial(PoolDriver, plans, get_driver())
+        Xl.kill_excel_instances()  # workers never kill Excel, so the sanity check is done once here
+    jobs = [Pool.make_job(filename, plans[filename].system) for filename in filenames]
+    print(f'Starting to refresh {len(jobs)} reports using {workers} workers')
+    pool = Pool.WorkerPool(driver_factory, workers, system_limits, default_limit)
+    results = pool.run(jobs)
+    data_directory = get_global_configs().get_path('path-data_directory') if notifier is not None else None
+    for result in results:
+        Metrics.registry.merge(result.get('metrics'))
+        if notifier is not None:
+            message = result['error'] or f"Relatorio atualizado -> {str(data_directory / result['filename'])}"
+            notifier.report(result['filename'], result['status'], result['duration'], message)
+    failures = Pool.WorkerPool.summary(results)
+    if failures:
+        failed = ', '.join(result['filename'] for result in results if result['status'] != 'SUCCESS')
+        raise RuntimeError(f"Couldn't refresh {failures} of {len(results)} reports", failed)
+    return results
 
 
 if __name__ == '__main__':
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+End-to-end benchmark of refresh_auto_reports and collect_information against the simulated SAP AfO
+(Refresh.Simulator). It generates a synthetic config workbook with hundreds of reports, runs the flows
+with each number of workers and prints the throughput and the percentiles of the report latency.
+
+The latencies are distributions in seconds (fixed "2", "uniform:1:3" or "lognormal:<mean>:<sigma>")
+multiplied by --time-scale, so a batch of several hours runs in a few minutes:
+    python script_benchmark_pipeline.py --reports 300 --workers 1,4 --time-scale 0.01
+"""
+import io
+import os
+import shutil
+import tempfile
+import argparse
+import pathlib
+import contextlib
+import time
+
+import pandas as pd
+from cryptography.fernet import Fernet
+
+from sap_refresh import refresh_auto_reports, collect_information
+from sapRefresh import set_config_path
+from sapRefresh.Core import Metrics
+from sapRefresh.Core.Cripto import secret_encode
+from sapRefresh.Core.Metrics import percentile, PERCENTILES
+from sapRefresh.Refresh.Driver import set_driver
+from sapRefresh.Refresh.Simulator import AfOSimulator, SimulatedDriver, synthetic_reports
+
+# time intelligence keys (see Core.Time.get_time_intelligence) used as the values of the variables
+TIME_VALUES = ('year_current_period', 'range_current_month', 'key_date')
+
+
+def write_configuration(directory, reports, workers, export=None, refresh_mode='classic'):
+    """write the config workbook of the synthetic reports and return its path"""
+    directory = pathlib.Path(directory)
+    settings = {
+        'logon-client': '100',
+        'logon-user': secret_encode('benchmark').decode('utf-8'),
+        'logon-password': secret_encode('benchmark').decode('utf-8'),
+        'path-log_directory': directory / 'logs',
+        'path-config_directory': directory,
+        'path-data_info': directory / 'info',
+        'path-data_directory': directory / 'data',
+        'path-cache_directory': directory / 'cache',
+        'path-metrics_directory': directory / 'metrics',
+        'ping-host': 'localhost',
+        'ping-port': '0',
+        'pool-workers': workers,
+        'refresh-mode': refresh_mode,
+    }
+    if export is not None:  # export the crosstabs after the refresh (see Refresh.Export)
+        settings.update({'path-export_directory': directory / 'export', 'export-format': export})
+    global_configs = pd.DataFrame([{'description': key, 'value': str(value), 'in_use': 'yes'}
+                                   for key, value in settings.items()])
+    sources, restrictions = [], []
+    for filename, report in reports.items():
+        for crosstab in report.crosstabs:
+            sources.append({
+                'filename': filename, 'crosstab_source': crosstab.name, 'crosstab_name': crosstab.name,
+                'data_source': crosstab.source, 'sheet': crosstab.sheet, 'crosstab': 'SAP' + crosstab.name,
+                'data_source_name': crosstab.data_source_name, 'query': crosstab.query, 'refresh': 99,
+                'system': crosstab.system,
+            })
+            common = {'filename': filename, 'data_source': crosstab.source,
+                      'data_source_name': crosstab.data_source_name, 'data_source_sheet': crosstab.sheet}
+            for position, (description, (technical, _)) in enumerate(crosstab.variables.items()):
+                restrictions.append(dict(common, command='SAPSetVariable', field=technical, field_name=description,
+                                         value=TIME_VALUES[position % len(TIME_VALUES)]))
+            for technical in crosstab.filters:
+                restrictions.append(dict(common, command='SAPSetFilter', field=technical,
+                                         field_name=crosstab.description_of(technical), value='A'))
+    for name in ('logs', 'info', 'data', 'cache', 'metrics'):
+        (directory / name).mkdir(parents=True, exist_ok=True)
+    for filename in reports:  # the collection lists the workbooks of the data directory
+        (directory / 'data' / filename).write_text(filename, encoding='utf-8')
+    config_path = directory / 'config.xlsx'
+    with pd.ExcelWriter(config_path, engine='xlsxwriter') as writer:
+        global_configs.to_excel(writer, sheet_name='global_configs', index=False)
+        pd.DataFrame(sources).to_excel(writer, sheet_name='data_sources', index=False)
+        pd.DataFrame(restrictions).to_excel(writer, sheet_name='variables_filters', index=False)
+    return config_path
+
+
+def run_scenario(mode, config_path, simulator, verbose=False):
+    """
+    run one flow against a fresh simulator and return (wall time, report latencies, com calls, durations of the
+    data fetches of the refresh mode, errors)
+    """
+    set_config_path(config_path)
+    set_driver(SimulatedDriver(simulator))
+    Metrics.registry.drain()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start_time = time.perf_counter()
+    error = None
+    try:
+        with output:
+            if mode == 'refresh':
+                refresh_auto_reports(force=True, notify=False)
+            else:
+                collect_information(force=True)
+    except Exception as e:
+        error = e
+    wall_time = time.perf_counter() - start_time
+    snapshot = Metrics.registry.drain()
+    phase = 'refresh_report' if mode == 'refresh' else 'get_report_information'
+    latencies = [seconds for name, _, seconds in snapshot['durations'] if name == phase]
+    com_calls = sum(value for name, _, value in snapshot['counters'] if name == 'com_calls_total')
+    fetches = [seconds for name, _, seconds in snapshot['durations'] if name.startswith('refresh_phase:')]
+    set_driver(None)
+    return wall_time, latencies, com_calls, fetches, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the refresh and the collection against a simulated SAP AfO')
+    parser.add_argument('--reports', type=int, default=300, help='number of synthetic reports')
+    parser.add_argument('--crosstabs', type=int, default=1, help='crosstabs (data sources) per report')
+    parser.add_argument('--variables', type=int, default=3, help='variables per data source')
+    parser.add_argument('--filters', type=int, default=2, help='filters per data source')
+    parser.add_argument('--rows', type=int, default=0, help='rows of data drawn in each crosstab by the refresh')
+    parser.add_argument('--export', choices=('csv', 'parquet'), default=None, help='export the crosstabs after the refresh')
+    parser.add_argument('--refresh-mode', default='classic', help='comma separated refresh modes (single, classic)')
+    parser.add_argument('--workers', default='1,4', help='comma separated numbers of workers of the refresh')
+    parser.add_argument('--mode', choices=('refresh', 'collect', 'both'), default='both')
+    parser.add_argument('--latency-logon', default='lognormal:2:0.5', help='latency of a SAPLogon')
+    parser.add_argument('--latency-refresh', default='lognormal:10:0.8', help='latency of the refresh of a data source')
+    parser.add_argument('--latency-submit', default='lognormal:1:0.5', help='latency of a variable submit')
+    parser.add_argument('--latency-call', default='0.01', help='latency of the other AfO calls')
+    parser.add_argument('--time-scale', type=float, default=0.01, help='multiplier of every simulated latency')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic reports and latencies')
+    parser.add_argument('--directory', default=None, help='work directory (default: a temporary one, removed at the end)')
+    parser.add_argument('--verbose', action='store_true', help='show the output of the flows')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SAP_KEY', Fernet.generate_key().decode('utf-8'))  # credentials of the synthetic config
+    latencies = {'logon': args.latency_logon, 'refresh': args.latency_refresh,
+                 'submit': args.latency_submit, 'call': args.latency_call}
+    directory = pathlib.Path(args.directory or tempfile.mkdtemp(prefix='sap_benchmark_'))
+    scenarios = []
+    if args.mode in ('collect', 'both'):
+        scenarios.append(('collect', 1, 'classic'))
+    if args.mode in ('refresh', 'both'):
+        scenarios += [('refresh', int(workers), refresh_mode) for refresh_mode in args.refresh_mode.split(',')
+                      for workers in args.workers.split(',')]
+
+    rows = []
+    try:
+        for mode, workers, refresh_mode in scenarios:
+            reports = synthetic_reports(args.reports, args.crosstabs, args.variables, args.filters,
+                                        seed=args.seed, rows=args.rows)
+            config_path = write_configuration(directory / f'{mode}_{refresh_mode}_{workers}', reports, workers,
+                                              args.export, refresh_mode)
+            simulator = AfOSimulator(reports, latencies, args.time_scale, seed=args.seed)
+            flow = mode if mode == 'collect' else f'{mode} {refresh_mode}'
+            rows.append((flow, workers) + run_scenario(mode, config_path, simulator, args.verbose))
+    finally:
+        if args.directory is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # the table is printed at the end because the spinners of the flows write to the console directly
+    print('\n', f'{args.reports} reports, latencies {latencies}, time scale {args.time_scale}')
+    header = ''.join(f'{"p" + str(p) + " (s)":>10}' for p in PERCENTILES)
+    print(f'{"flow":<16}{"workers":>8}{"reports":>9}{"wall (s)":>10}{"reports/min":>13}{header}{"COM calls":>11}'
+          f'{"fetch p50 (s)":>15}')
+    for mode, workers, wall_time, samples, com_calls, fetches, error in rows:
+        quantiles = ''.join(f'{percentile(samples, p) or 0:>10.3f}' for p in PERCENTILES)
+        print(f'{mode:<16}{workers:>8}{len(samples):>9}{wall_time:>10.2f}'
+              f'{len(samples) / wall_time * 60:>13.1f}{quantiles}{com_calls:>11}{percentile(fetches, 50) or 0:>15.3f}')
+        if error is not None:
+            print('\t', f'The {mode} stopped with an error: {error!r}')
+
+
+if __name__ == '__main__':
+    main()
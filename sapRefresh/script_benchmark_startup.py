@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Measure the startup cost of the application: the time to import each module and the time until the first
+report can be opened (import + load of the global configs). Every measure runs in a fresh python process.
+
+To compare before and after a change, check out the old version in another directory and run:
+    python script_benchmark_startup.py --repo <old checkout> --config <config.xlsx>
+    python script_benchmark_startup.py --config <config.xlsx>
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+# statements timed in a fresh interpreter. The first config access is what the first report waits for
+SCENARIOS = [
+    ('import sapRefresh', 'import sapRefresh'),
+    ('import sapRefresh.Core.Cripto', 'import sapRefresh.Core.Cripto'),
+    ('import sapRefresh.Core.Connection', 'import sapRefresh.Core.Connection'),
+    ('import sap_refresh', 'import sap_refresh'),
+    ('time to first report', 'import sap_refresh, sapRefresh\n'
+                             'getattr(sapRefresh, "get_global_configs", lambda: sapRefresh.global_configs_df)()'),
+]
+
+TIMER = '''
+import time, sys
+start = time.perf_counter()
+try:
+    exec(compile({statement!r}, '<benchmark>', 'exec'))
+except Exception as e:
+    print('\\n@@ERROR', type(e).__name__, e)
+    sys.exit(0)
+print('\\n@@TIME', time.perf_counter() - start)
+'''
+
+
+def measure(repo, statement, config=None, repeat=5):
+    """run the statement in new interpreters and return the list of elapsed times (None when it fails)"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([repo, os.path.join(repo, 'sapRefresh'), env.get('PYTHONPATH', '')])
+    if config:
+        env['SAP_REFRESH_CONFIG'] = config
+    times = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-c', TIMER.format(statement=statement)],
+                                   cwd=os.path.join(repo, 'sapRefresh'), env=env, capture_output=True, text=True)
+        # the markers are searched inside the lines because the spinners of timeit share the same output
+        lines = [line[line.index('@@'):] for line in completed.stdout.splitlines() if '@@' in line]
+        if not lines or lines[-1].startswith('@@ERROR'):
+            return None, (lines[-1][2:] if lines else ' '.join(completed.stderr.strip().splitlines()[-1:]))
+        times.append(float(lines[-1].split()[1]))
+    return times, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the startup of the sapRefresh package')
+    parser.add_argument('--repo', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help='root of the checkout to be measured (default: this one)')
+    parser.add_argument('--config', default=None, help='config workbook used by the "time to first report"')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of each scenario')
+    args = parser.parse_args()
+
+    print(f'Startup benchmark of {args.repo}')
+    print(f'{"scenario":<36}{"median (s)":>12}{"min (s)":>12}')
+    for name, statement in SCENARIOS:
+        times, error = measure(args.repo, statement, args.config, args.repeat)
+        if times is None:
+            print(f'{name:<36}{"failed":>12}  {error}')
+        else:
+            print(f'{name:<36}{statistics.median(times):>12.3f}{min(times):>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Search the metadata catalog filled by collect_information (metadata_catalog.sqlite in "path-data_info"):
+    python script_catalog.py --query ZQUERY_01          reports (data sources) of a query
+    python script_catalog.py --system BWP               reports (data sources) of a SAP system
+    python script_catalog.py --field 0CALMONTH          variables and filters with a technical name
+    python script_catalog.py --xlsx catalog.xlsx        write the whole catalog to a xlsx file
+"""
+import argparse
+
+import pandas as pd
+
+from sapRefresh import set_config_path
+from sap_refresh import get_catalog
+
+parser = argparse.ArgumentParser(description='Search the metadata catalog of the SAP AfO reports')
+parser.add_argument('--config', default=None, help='path of the config workbook (default: SAP_REFRESH_CONFIG)')
+parser.add_argument('--query', default=None, help='technical name of a query')
+parser.add_argument('--system', default=None, help='SAP system')
+parser.add_argument('--field', default=None, help='technical name of a variable or filter')
+parser.add_argument('--xlsx', default=None, help='write the catalog to this xlsx file')
+args = parser.parse_args()
+
+set_config_path(args.config)
+catalog = get_catalog()
+try:
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        if args.query or args.system:
+            data_sources = catalog.data_sources(query=args.query, system=args.system)
+            print(data_sources.drop(columns='information').to_string(index=False))
+        if args.field:
+            print(catalog.restrictions(technical_name=args.field).to_string(index=False))
+        if args.xlsx:
+            print(f'Catalog exported to {catalog.export_xlsx(args.xlsx)}')
+        if not (args.query or args.system or args.field or args.xlsx):
+            print(f'{len(catalog.filenames())} reports in {catalog.path}')
+finally:
+    catalog.close()
@@ -4,14 +4,19 @@ Created on 3/29/2021
 Author: Arnold Souza
 Email: arnoldporto@gmail.com
 """
+import argparse
+
 from sap_refresh import collect_information
 from sapRefresh.Core.base_logger import get_logger
-from sapRefresh import LOG_PATH
-logger, LOG_FILEPATH = get_logger(__name__, LOG_PATH)
+logger = get_logger(__name__)
 
+parser = argparse.ArgumentParser(description='Collect the data source information of the SAP AfO reports')
+parser.add_argument('--config', default=None, help='path of the config workbook (default: SAP_REFRESH_CONFIG)')
+parser.add_argument('--force', action='store_true', help='collect every workbook, even the unchanged ones')
+args = parser.parse_args()
 
 try:
-    collect_information()
+    collect_information(args.config, args.force)
     logger.info("The information collection was done successfully!")
 except Exception as e:
     # send error to the logger
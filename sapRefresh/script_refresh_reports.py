@@ -4,15 +4,31 @@ Created on 3/29/2021
 Author: Arnold Souza
 Email: arnoldporto@gmail.com
 """
-from sap_refresh import refresh_auto_reports
+import sys
+import argparse
+
+from sap_refresh import refresh_auto_reports, report_status
 from sapRefresh.Core import Connection as Conn
 from sapRefresh.Core.base_logger import get_logger
-from sapRefresh import LOG_PATH
-logger, LOG_FILEPATH = get_logger(__name__, LOG_PATH)
+logger = get_logger(__name__)
+
+parser = argparse.ArgumentParser(description='Refresh the SAP AfO reports set in the config workbook')
+parser.add_argument('--config', default=None, help='path of the config workbook (default: SAP_REFRESH_CONFIG)')
+parser.add_argument('--force', action='store_true', help='refresh every scheduled report, even the current ones')
+parser.add_argument('--status', action='store_true', help='only print the situation of the reports in the ledger')
+parser.add_argument('--dry-run', action='store_true', help='only print the plan of each report, without opening Excel')
+args = parser.parse_args()
+
+if args.status:
+    print(report_status(args.config).to_string(index=False))
+    sys.exit(0)
 
+if args.dry_run:
+    refresh_auto_reports(args.config, args.force, notify=False, dry_run=True)
+    sys.exit(0)
 
 try:
-    refresh_auto_reports()
+    refresh_auto_reports(args.config, args.force)
     logger.info("The Workbook refresh was done successfully!")
 except Exception as e:
     # send error to the logger
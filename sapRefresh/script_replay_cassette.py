@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Replay a cassette recorded in production (see "path-cassette_directory") without Excel or SAP.
+It prints the latency profile of each SAP AfO macro and the orchestration overhead of the flow
+(the wall time of the replay minus the latency replayed from the cassette).
+
+The config workbook must point the paths (data directory, data info, cache) to local directories:
+    python script_replay_cassette.py --cassette report.jsonl --config local_config.xlsx --mode refresh
+"""
+import time
+import pathlib
+import argparse
+import statistics
+
+from sap_refresh import refresh_report, get_report_information, get_configurations
+from sapRefresh import set_config_path, get_config_path, get_global_configs
+from sapRefresh.Core.Plan import compile_plans
+from sapRefresh.Core.Time import get_time_intelligence
+from sapRefresh.Refresh import Cassette
+from sapRefresh.Refresh.Driver import set_driver
+
+
+def print_profile(entries):
+    """print the latency profile of each macro of the cassette"""
+    print(f'{"macro":<28}{"calls":>7}{"total (s)":>12}{"mean (s)":>11}{"p50 (s)":>10}{"p90 (s)":>10}{"max (s)":>10}')
+    profile = Cassette.profile(entries)
+    for macro, stats in sorted(profile.items(), key=lambda item: -item[1]['total']):
+        print(f'{macro:<28}{stats["calls"]:>7}{stats["total"]:>12.3f}{stats["mean"]:>11.3f}'
+              f'{stats["p50"]:>10.3f}{stats["p90"]:>10.3f}{stats["max"]:>10.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay the SAP AfO calls of a cassette without Excel or SAP')
+    parser.add_argument('--cassette', required=True, help='cassette file (json lines)')
+    parser.add_argument('--config', default=None, help='config workbook with local paths')
+    parser.add_argument('--mode', choices=('refresh', 'collect'), default='refresh',
+                        help='flow to replay: refresh_report or get_report_information')
+    parser.add_argument('--report', default=None, help='filename of the report (default: name of the cassette.xlsx)')
+    parser.add_argument('--speed', type=float, default=0.0, help='multiplier of the recorded latency (0 = no wait)')
+    parser.add_argument('--repeat', type=int, default=1, help='number of replays, to benchmark the overhead')
+    args = parser.parse_args()
+
+    set_config_path(args.config)
+    entries = Cassette.load(args.cassette)
+    print(f'Cassette {args.cassette}: {len(entries)} calls')
+    print_profile(entries)
+    filename = args.report or pathlib.Path(args.cassette).stem + '.xlsx'
+    if args.mode == 'refresh':
+        _, data_sources, variables_filters = get_configurations(get_config_path())
+        plans, errors = compile_plans(data_sources, variables_filters, get_time_intelligence(), [filename])
+        if errors:
+            parser.error(f'The plan of {filename} is invalid: {"; ".join(errors[filename])}')
+
+    overheads = []
+    for _ in range(args.repeat):
+        driver = Cassette.ReplayDriver(entries, args.speed)
+        set_driver(driver)
+        start_time = time.perf_counter()
+        if args.mode == 'refresh':
+            refresh_report(plans[filename], notify=False)
+        else:
+            get_report_information(get_global_configs().get_path('path-data_directory') / filename)
+        wall_time = time.perf_counter() - start_time
+        overheads.append(wall_time - driver.player.waited)
+        print(f'Replayed {driver.player.replayed} calls in {wall_time:.3f}s '
+              f'(orchestration overhead {overheads[-1]:.3f}s)')
+    set_driver(None)
+    if len(overheads) > 1:
+        print(f'Orchestration overhead: median {statistics.median(overheads):.3f}s, '
+              f'min {min(overheads):.3f}s, max {max(overheads):.3f}s')
+
+
+if __name__ == '__main__':
+    main()
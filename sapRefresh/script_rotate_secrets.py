@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Re-encrypt the secrets of the config workbook (logon-user, logon-password, mail-password) with a new key.
+    1) SAP_KEY=<new key>,<old key>  python script_rotate_secrets.py --config config.xlsx
+    2) SAP_KEY=<new key>            (the old key can be discarded)
+A new key can be generated with --new-key.
+"""
+import argparse
+
+from cryptography.fernet import Fernet
+
+from sapRefresh import get_config_path
+from sapRefresh.Core.Cripto import reencrypt_workbook
+
+parser = argparse.ArgumentParser(description='Re-encrypt the secrets of the config workbook with the first key of SAP_KEY')
+parser.add_argument('--config', default=None, help='path of the config workbook (default: SAP_REFRESH_CONFIG)')
+parser.add_argument('--output', default=None, help='save the re-encrypted workbook in another file')
+parser.add_argument('--new-key', action='store_true', help='only print a new key')
+args = parser.parse_args()
+
+if args.new_key:
+    print(Fernet.generate_key().decode('utf-8'))
+else:
+    config_path = args.config or get_config_path()
+    rotated = reencrypt_workbook(config_path, args.output)
+    print(f'{len(rotated)} secrets re-encrypted ({", ".join(rotated)}) in {args.output or config_path}')
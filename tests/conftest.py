@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+The tests import the package (sapRefresh) and the module of the flows (sap_refresh), which the scripts import
+from the sapRefresh directory
+"""
+import os
+import sys
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT_PATH, os.path.join(ROOT_PATH, 'sapRefresh')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
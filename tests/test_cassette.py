@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Record the Application.Run calls and replay them without Excel or SAP
+"""
+import pytest
+
+from sapRefresh.Core import Retry
+from sapRefresh.Refresh import Cassette
+from sapRefresh.Refresh.FakeExcel import FakeApplication
+from sapRefresh.Refresh.Proxy import ExcelProxy
+
+
+def afo(application, macro, args):
+    if macro == 'SAPExecuteCommand':
+        raise OSError('Automation error')
+    return 1
+
+
+def test_record_and_replay(tmp_path):
+    path = tmp_path / 'report.jsonl'
+    xl = ExcelProxy(FakeApplication(afo))
+    with Cassette.recording(path) as recorder:
+        assert xl.Application.Run('SAPLogon', 'DS_1', '100', 'user', 'password') == 1
+        with pytest.raises(OSError):
+            xl.Application.Run('SAPExecuteCommand', 'Refresh')
+    entries = Cassette.load(path)
+    assert recorder.calls == 2
+    assert entries[0]['args'] == ['DS_1', '100', Cassette.REDACTED, Cassette.REDACTED]
+
+    replay = Cassette.ReplayDriver(entries).open_excel()
+    assert replay.Run('SAPLogon', 'DS_1', '100', 'other user', 'other password') == 1
+    with pytest.raises(Cassette.ReplayedError):
+        replay.Run('SAPExecuteCommand', 'Refresh')
+    with pytest.raises(Cassette.CassetteMissError):
+        replay.Run('SAPExecuteCommand', 'Refresh')
+
+
+def test_replayed_errors_are_not_retried(monkeypatch):
+    # a policy with long waits: a retry would make the test hang
+    monkeypatch.setattr(Retry, 'get_policy', lambda: Retry.RetryPolicy(attempts=4, wait_initial=60, jitter=0))
+    entries = [{'macro': 'SAPExecuteCommand', 'args': ['Refresh'], 'result': None, 'seconds': 1.0,
+                'error': "com_error(-2147352567, 'Exception occurred.', None, None)"}]
+    replay = Cassette.ReplayDriver(entries).open_excel()
+    calls = []
+
+    @Retry.adaptive_retry
+    def refresh():
+        calls.append(1)
+        return replay.Run('SAPExecuteCommand', 'Refresh')
+
+    with pytest.raises(Cassette.ReplayedError):
+        refresh()
+    assert len(calls) == 1
+    assert Retry.classify(Cassette.CassetteMissError('miss')) == Retry.PERMANENT
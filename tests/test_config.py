@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Typed reads of the global_configs sheet. A snapshot of the config workbook that can't be loaded is ignored, so
+the workbook is parsed again
+"""
+import pathlib
+import pickle
+
+import pandas as pd
+import pytest
+
+from sapRefresh.Core import Config
+
+
+class BadReduce:
+    """unpickled as dict(1), which raises TypeError"""
+    def __reduce__(self):
+        return dict, (1,)
+
+
+@pytest.mark.parametrize('content', [
+    b'',  # EOFError
+    b'not a pickle',  # UnpicklingError
+    pickle.dumps(BadReduce()),  # TypeError
+    pickle.dumps({'key': 'other version', 'sheets': {}}),
+])
+def test_unreadable_snapshot_is_ignored(tmp_path, content):
+    path = tmp_path / 'snapshot.pickle'
+    path.write_bytes(content)
+    assert Config._read_snapshot(path, {'version': Config.SNAPSHOT_VERSION}) is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / 'snapshot.pickle'
+    key = {'version': Config.SNAPSHOT_VERSION, 'path': 'config.xlsx', 'size': 1, 'mtime': 1}
+    Config._write_snapshot(path, key, {'global_configs': 'sheet'})
+    assert Config._read_snapshot(path, key) == {'global_configs': 'sheet'}
+
+
+@pytest.fixture
+def global_configs():
+    return Config.GlobalConfig(pd.DataFrame({
+        'description': ['smtp-port', 'wait-retry', 'send-email', 'notify', 'path-cache', 'email-to', 'empty', None,
+                        'limit-BWP', 'limit-BWQ'],
+        'value': [587.0, '2.5', 'Yes', 'no', ' C:/cache ', 'a@x.com, b@x.com,', float('nan'), 'orphan', 2, '1'],
+    }))
+
+
+def test_typed_getters(global_configs):
+    assert global_configs.get_int('smtp-port') == 587
+    assert global_configs.get_float('wait-retry') == 2.5
+    assert global_configs.get_bool('send-email') is True
+    assert global_configs.get_bool('notify') is False
+    assert global_configs.get_path('path-cache') == pathlib.Path('C:/cache')
+    assert global_configs.get_list('email-to') == ['a@x.com', 'b@x.com']
+    assert global_configs.with_prefix('limit-') == {'BWP': 2, 'BWQ': '1'}
+    assert Config.GlobalConfig.coerce(global_configs) is global_configs
+
+
+def test_missing_key_raises_config_key_error(global_configs):
+    # empty cells are missing keys
+    assert 'empty' not in global_configs
+    with pytest.raises(Config.ConfigKeyError, match='"empty" is missing in the global_configs sheet'):
+        global_configs.get_str('empty')
+    with pytest.raises(KeyError):
+        global_configs.get('logon-client')
+    assert global_configs.get_int('logon-client', None) is None
+    assert global_configs.get_bool('debug', False) is False
+
+
+def test_value_of_the_wrong_type_raises_value_error(global_configs):
+    with pytest.raises(ValueError, match='"send-email" of the global_configs sheet must be an integer'):
+        global_configs.get_int('send-email')
+    with pytest.raises(ValueError, match='must be a number'):
+        global_configs.get_float('path-cache')
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Rotation of the key of the secrets: the tokens of the old key are decrypted and re-encrypted with the new primary
+"""
+import openpyxl
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from sapRefresh.Core import Cripto
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    old_key, new_key = Fernet.generate_key().decode('utf-8'), Fernet.generate_key().decode('utf-8')
+    monkeypatch.setenv(Cripto.KEY_ENV, old_key)
+    Cripto.reset_provider()
+    yield old_key, new_key
+    Cripto.reset_provider()
+
+
+def test_missing_or_invalid_key(monkeypatch):
+    monkeypatch.delenv(Cripto.KEY_ENV, raising=False)
+    with pytest.raises(Cripto.MissingKeyError):
+        Cripto.CredentialProvider()
+    with pytest.raises(Cripto.MissingKeyError):
+        Cripto.CredentialProvider(f'{Fernet.generate_key().decode("utf-8")},not-a-key')
+
+
+def test_rotate_token(keys):
+    old_key, new_key = keys
+    old_token = Cripto.secret_encode('password').decode('utf-8')
+    provider = Cripto.CredentialProvider(f'{new_key},{old_key}')
+    assert provider.decode(old_token) == 'password'
+    new_token = provider.rotate(old_token)
+    # the new token only needs the new primary key
+    assert Cripto.CredentialProvider(new_key).decode(new_token) == 'password'
+    with pytest.raises(InvalidToken):
+        Cripto.CredentialProvider(old_key).decode(new_token)
+
+
+def test_reencrypt_workbook(keys, monkeypatch, tmp_path):
+    old_key, new_key = keys
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'global_configs'
+    sheet.append(['description', 'value'])
+    sheet.append(['logon-user', Cripto.secret_encode('user').decode('utf-8')])
+    sheet.append(['logon-password', Cripto.secret_encode('password').decode('utf-8')])
+    sheet.append(['mail-server', 'smtp.local'])
+    config_path = tmp_path / 'config.xlsx'
+    workbook.save(config_path)
+
+    monkeypatch.setenv(Cripto.KEY_ENV, f'{new_key},{old_key}')
+    Cripto.reset_provider()
+    assert Cripto.reencrypt_workbook(config_path) == ['logon-user', 'logon-password']
+
+    monkeypatch.setenv(Cripto.KEY_ENV, new_key)  # the old key is discarded
+    Cripto.reset_provider()
+    sheet = openpyxl.load_workbook(config_path)['global_configs']
+    values = {sheet.cell(row, 1).value: sheet.cell(row, 2).value for row in range(2, sheet.max_row + 1)}
+    assert Cripto.secret_decode(values['logon-user']) == 'user'
+    assert Cripto.secret_decode(values['logon-password']) == 'password'
+    assert values['mail-server'] == 'smtp.local'
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Export of a crosstab of the fake Excel in blocks, with types inferred from the first block
+"""
+import json
+
+import pandas as pd
+
+from sapRefresh.Refresh import Export
+from sapRefresh.Refresh.FakeExcel import FakeSheet, FakeRange
+
+
+def crosstab(rows):
+    sheet = FakeSheet('Sheet1')
+    sheet.write(1, 1, rows)
+    return FakeRange(sheet, 1, 1, len(rows), len(rows[0]))
+
+
+def test_boolean_column_is_widened_to_text_in_csv(tmp_path):
+    rows = [['Material', 'Active', 'Amount'], ['M1', True, 1.0], ['M2', False, 2.0], ['M3', 'Not assigned', 3.0],
+            ['M4', 'Blocked', 4.0]]
+    path = tmp_path / 'crosstab.csv'
+    stats = Export.export_range(crosstab(rows), path, 'csv', chunk_rows=2)
+    assert (stats['rows'], stats['chunks']) == (4, 3)
+    df = pd.read_csv(path, keep_default_na=False)
+    assert df['Active'].tolist() == ['True', 'False', '', 'Blocked']
+    schema = json.loads((tmp_path / 'crosstab.schema.json').read_text(encoding='utf-8'))
+    assert schema['columns'] == {'Material': Export.TEXT, 'Active': Export.TEXT, 'Amount': Export.NUMBER}
+
+
+def test_values_that_dont_fit_a_fixed_type_become_null():
+    types = {'Active': Export.BOOLEAN, 'Amount': Export.NUMBER}
+    df = Export.to_frame(['Active', 'Amount'], types, [[True, 1.0], ['Blocked', 'x']])
+    assert df['Active'].isna().tolist() == [False, True]
+    assert df['Amount'].isna().tolist() == [False, True]
+    assert types == {'Active': Export.BOOLEAN, 'Amount': Export.NUMBER}
+
+
+def test_number_column_is_widened_to_text_in_csv(tmp_path):
+    rows = [['Material', 'Amount'], ['M1', 1.5], ['M2', 2.0], ['M3', '1.234,50'], ['M4', None]]
+    path = tmp_path / 'crosstab.csv'
+    Export.export_range(crosstab(rows), path, 'csv', chunk_rows=3)
+    df = pd.read_csv(path, keep_default_na=False, dtype=str)
+    assert df['Amount'].tolist() == ['1.5', '2.0', '1.234,50', '']
+    schema = json.loads((tmp_path / 'crosstab.schema.json').read_text(encoding='utf-8'))
+    assert schema['columns']['Amount'] == Export.TEXT
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+A report refreshed today with the same effective parameters is current, so a rerun of the batch skips it
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from sapRefresh.Core.Ledger import RefreshLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = RefreshLedger(tmp_path)
+    yield ledger
+    ledger.close()
+
+
+def test_report_is_current_only_with_the_same_parameters_and_day(ledger):
+    assert not ledger.is_current('a.xlsx', 'hash-1')
+    ledger.record_success('a.xlsx', 'hash-1', 12.5)
+    assert ledger.is_current('a.xlsx', 'hash-1')
+    assert not ledger.is_current('a.xlsx', 'hash-2')  # the variables or filters changed
+    assert not ledger.is_current('a.xlsx', 'hash-1', date.today() + timedelta(days=1))
+
+
+def test_failure_keeps_the_last_success(ledger):
+    ledger.record_success('a.xlsx', 'hash-1')
+    ledger.record_failure('a.xlsx', 'SAP system not available')
+    row = ledger.get('a.xlsx')
+    assert (row['last_status'], row['last_error']) == ('ERROR', 'SAP system not available')
+    assert ledger.is_current('a.xlsx', 'hash-1')
+    ledger.record_failure('b.xlsx', 'Workbook not found')
+    assert not ledger.is_current('b.xlsx', None)
+
+
+def test_status(ledger):
+    ledger.record_success('current.xlsx', 'hash-1')
+    ledger.record_success('stale.xlsx', 'hash-1')
+    ledger.record_failure('failed.xlsx', 'error')
+    expected = {'current.xlsx': 'hash-1', 'stale.xlsx': 'hash-2', 'failed.xlsx': 'hash-1', 'never.xlsx': 'hash-1'}
+    states = {row['filename']: row['state'] for row in ledger.status(expected)}
+    assert states == {'current.xlsx': 'current', 'stale.xlsx': 'stale', 'failed.xlsx': 'failed',
+                      'never.xlsx': 'never'}
+
+
+def test_ledger_is_shared_between_connections(ledger, tmp_path):
+    ledger.record_success('a.xlsx', 'hash-1')
+    other = RefreshLedger(tmp_path)
+    try:
+        assert other.is_current('a.xlsx', 'hash-1')
+    finally:
+        other.close()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import threading
+
+import pytest
+
+from sapRefresh.Core import base_logger
+
+
+@pytest.fixture(autouse=True)
+def fresh_pipeline():
+    base_logger.shutdown_logging()
+    yield
+    base_logger.shutdown_logging()
+
+
+def _listener_threads():
+    return [thread for thread in threading.enumerate() if thread is not threading.main_thread()]
+
+
+def test_the_listener_starts_with_the_first_record(tmp_path):
+    threads = len(_listener_threads())
+    logger = base_logger.get_logger('sapRefresh.tests.lazy', log_path=tmp_path)
+    assert base_logger._pipeline['listener'] is None
+    assert len(_listener_threads()) == threads
+    logger.info('first record')
+    assert base_logger._pipeline['listener'] is not None
+    base_logger.shutdown_logging()
+    assert 'first record' in base_logger.get_log_filepath(tmp_path).read_text()
+
+
+def test_the_log_directory_is_resolved_once(monkeypatch, capsys):
+    calls = []
+
+    def unreachable():
+        calls.append(threading.current_thread())
+        raise OSError('the network share is unreachable')
+
+    monkeypatch.setattr(base_logger, '_default_log_path', unreachable)
+    logger = base_logger.get_logger('sapRefresh.tests.fallback')
+    logger.warning('first record')
+    logger.warning('second record')
+    base_logger.shutdown_logging()
+    assert calls == [threading.main_thread()]  # resolved on the thread of the caller, not of the listener
+    output = capsys.readouterr()
+    assert output.err.count("Couldn't open the log files") == 1
+    assert 'second record' in output.out
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+The notifier against a stub of smtplib.SMTP, which records the sessions and the emails
+"""
+import smtplib
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from sapRefresh.Core import Connection as Conn
+from sapRefresh.Core.Config import GlobalConfig
+from sapRefresh.Core.Notifier import Notifier
+
+
+class StubSMTP:
+    """records every session and email. drops the session at the first email when disconnect_once is set"""
+    sessions = []
+    disconnect_once = False
+
+    def __init__(self, host, port, timeout=None):
+        self.address = (host, port)
+        self.emails = []
+        self.closed = False
+        StubSMTP.sessions.append(self)
+
+    def ehlo(self):
+        pass
+
+    def sendmail(self, from_address, recipients, text):
+        if StubSMTP.disconnect_once:
+            StubSMTP.disconnect_once = False
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.emails.append((from_address, recipients, text))
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def config(monkeypatch):
+    monkeypatch.setattr(StubSMTP, 'sessions', [])
+    monkeypatch.setattr(smtplib, 'SMTP', StubSMTP)
+    monkeypatch.setattr(Conn, 'get_log_filepath', lambda: Path('logs') / '20261018.log')
+    values = {'mail-server': 'smtp.local', 'mail-port': 25, 'mail-starttls': 'no',
+              'mail-user_name': 'robot@local', 'mail-to': 'a@local, b@local'}
+    return GlobalConfig(pd.DataFrame({'description': list(values), 'value': list(values.values())}))
+
+
+def emails():
+    return [email for session in StubSMTP.sessions for email in session.emails]
+
+
+def test_each_mode_sends_the_refreshed_reports_in_one_session(config):
+    with Notifier(config, 'each') as notifier:
+        notifier.report('report_1.xlsm', 'SUCCESS', 10.0)
+        notifier.report('report_2.xlsm', 'ERROR', 5.0, 'Refresh failed')
+        notifier.report('report_3.xlsm', 'SUCCESS', 12.0)
+    assert len(StubSMTP.sessions) == 1 and StubSMTP.sessions[0].closed
+    assert [recipients for _, recipients, _ in emails()] == [['a@local', 'b@local']] * 2
+    assert 'report_1.xlsm' in emails()[0][2] and 'report_3.xlsm' in emails()[1][2]
+    assert (notifier.sent, notifier.failed) == (2, 0)
+
+
+def test_digest_mode_sends_one_summary(config):
+    with Notifier(config, 'digest') as notifier:
+        notifier.report('report_1.xlsm', 'SUCCESS', 10.0)
+        notifier.report('report_2.xlsm', 'ERROR', 5.0, 'Refresh failed')
+        assert StubSMTP.sessions == []  # nothing is sent before the flush
+    (_, _, text), = emails()
+    assert 'PYTHON AUTOMATE (ERROR)' in text
+    assert '2 relatorios, 1 atualizados, 1 com erro' in text
+    assert 'report_1.xlsm' in text and 'Refresh failed' in text
+
+
+def test_off_mode_sends_nothing(config):
+    with Notifier(config, 'off') as notifier:
+        notifier.report('report_1.xlsm', 'SUCCESS', 10.0)
+        notifier.send('message', 'SUCCESS')
+        assert notifier.thread is None
+    assert StubSMTP.sessions == []
+
+
+def test_dropped_session_is_reopened(config, monkeypatch):
+    monkeypatch.setattr(StubSMTP, 'disconnect_once', True)
+    with Notifier(config, 'each') as notifier:
+        notifier.send('message', 'SUCCESS')
+    assert len(StubSMTP.sessions) == 2 and len(emails()) == 1
+    assert (notifier.sent, notifier.failed) == (1, 0)
+
+
+def test_closed_notifier(config):
+    notifier = Notifier(config, 'each')
+    notifier.close()
+    with pytest.raises(RuntimeError):
+        notifier.send('message', 'SUCCESS')
+    with pytest.raises(ValueError):
+        Notifier(config, 'weekly')
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Compilation of the data_sources and variables_filters sheets into the plans of the reports
+"""
+import pandas as pd
+import pytest
+
+from sapRefresh.Core.Catalog import MetadataCatalog
+from sapRefresh.Core.Plan import compile_plans, parameters_hash, Restriction
+
+RESTRICTION_COLUMNS = ['filename', 'command', 'data_source', 'field', 'field_name', 'value']
+
+
+def sheets(sources, restrictions=()):
+    return pd.DataFrame(sources), pd.DataFrame(list(restrictions), columns=RESTRICTION_COLUMNS)
+
+
+def test_systems_come_from_the_catalog(tmp_path):
+    catalog = MetadataCatalog(tmp_path)
+    catalog.upsert_report('a.xlsx', [{'DS': 'DS_1', 'System': 'BWP', 'Crosstab': 'SAPCrosstab1'},
+                                     {'DS': 'DS_2', 'System': 'BWQ', 'Crosstab': 'SAPCrosstab2'}], pd.DataFrame())
+    catalog.upsert_report('b.xlsx', [{'DS': 'DS_1', 'System': 'BWP', 'Crosstab': 'SAPCrosstab1'}], pd.DataFrame())
+    systems = catalog.systems()
+    catalog.close()
+    data_sources, variables_filters = sheets([
+        {'filename': 'a.xlsx', 'data_source': 'DS_1'}, {'filename': 'a.xlsx', 'data_source': 'DS_2'},
+        {'filename': 'b.xlsx', 'data_source': 'DS_1'}, {'filename': 'c.xlsx', 'data_source': 'DS_1'},
+    ])
+    plans, errors = compile_plans(data_sources, variables_filters, {}, systems=systems)
+    assert errors == {}
+    assert [source.system for source in plans['a.xlsx'].sources] == ['BWP', 'BWQ']
+    assert plans['b.xlsx'].system == 'BWP'
+    assert plans['c.xlsx'].system is None  # not collected yet
+
+
+def test_system_column_overrides_the_catalog():
+    data_sources, variables_filters = sheets([{'filename': 'a.xlsx', 'data_source': 'DS_1', 'system': 'BWD'}])
+    plans, _ = compile_plans(data_sources, variables_filters, {}, systems={('a.xlsx', 'DS_1'): 'BWP'})
+    assert plans['a.xlsx'].system == 'BWD'
+
+
+def test_plan_of_a_report():
+    data_sources, variables_filters = sheets([{'filename': 'a.xlsx', 'data_source': 'DS_1'}], [
+        ('a.xlsx', 'SAPSetVariable', 'DS_1', '0P_KEYDATE', 'Key date', 'key_date'),
+        ('a.xlsx', 'SAPSetFilter', 'DS_1', '0MATERIAL', 'Material', 'M1;M2'),
+    ])
+    plans, errors = compile_plans(data_sources, variables_filters, {'key_date': '10/17/2026'})
+    plan = plans['a.xlsx']
+    assert errors == {} and plan.data_source == 'DS_1'
+    assert plan.filters == (Restriction('SAPSetFilter', 'DS_1', '0MATERIAL', 'Material', 'M1;M2'),)
+    assert plan.variables == (Restriction('SAPSetVariable', 'DS_1', '0P_KEYDATE', 'Key date', '10/17/2026'),)
+
+
+@pytest.mark.parametrize('restriction, problem', [
+    (('a.xlsx', 'SAPSetFilters', 'DS_1', '0MATERIAL', 'Material', 'M1'), 'has an unknown command (SAPSetFilters)'),
+    (('a.xlsx', 'SAPSetFilter', 'DS_1', '0MATERIAL', 'Material', None), '(SAPSetFilter Material) has no value'),
+    (('a.xlsx', 'SAPSetFilter', None, '0MATERIAL', 'Material', 'M1'), '(SAPSetFilter Material) has no data_source'),
+    (('a.xlsx', 'SAPSetFilter', 'DS_9', '0MATERIAL', 'Material', 'M1'),
+     'refers to the data source DS_9, which is not a data source of the report'),
+])
+def test_invalid_restriction_fails_only_its_report(restriction, problem):
+    data_sources, variables_filters = sheets([
+        {'filename': 'a.xlsx', 'data_source': 'DS_1'}, {'filename': 'b.xlsx', 'data_source': 'DS_1'},
+    ], [restriction, ('b.xlsx', 'SAPSetFilter', 'DS_1', '0MATERIAL', 'Material', 'M1')])
+    plans, errors = compile_plans(data_sources, variables_filters, {})
+    assert list(plans) == ['b.xlsx']
+    assert len(errors['a.xlsx']) == 1 and errors['a.xlsx'][0].startswith('restriction #1 ')
+    assert problem in errors['a.xlsx'][0]
+
+
+def test_report_without_data_source():
+    data_sources, variables_filters = sheets([{'filename': 'a.xlsx', 'data_source': None}])
+    plans, errors = compile_plans(data_sources, variables_filters, {}, ['a.xlsx', 'b.xlsx'])
+    assert plans == {}
+    assert errors == {'a.xlsx': ['the data source is empty'], 'b.xlsx': ['the report is not in the data_sources sheet']}
+
+
+def test_parameters_hash():
+    first = Restriction('SAPSetFilter', 'DS_1', '0MATERIAL', 'Material', 'M1')
+    second = Restriction('SAPSetVariable', 'DS_1', '0P_KEYDATE', 'Key date', '10/17/2026')
+    assert parameters_hash(['DS_1'], [first, second]) == parameters_hash(['DS_1'], [second, first])
+    # the name of the field is only a label
+    assert parameters_hash(['DS_1'], [first]) == parameters_hash(['DS_1'], [first._replace(field_name='')])
+    assert parameters_hash(['DS_1'], [first]) != parameters_hash(['DS_1'], [first._replace(value='M2')])
+    assert parameters_hash(['DS_1'], [first]) != parameters_hash(['DS_1', 'DS_2'], [first])
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import pytest
+
+from sapRefresh.Refresh import Pool
+
+
+class FakeDriver:
+    """driver of a worker that refreshes the reports without Excel. The reports named fail_* raise"""
+    def refresh(self, job):
+        if job['filename'].startswith('fail_'):
+            raise ValueError(f"{job['filename']} is broken")
+
+    def close(self):
+        pass
+
+
+def fake_driver():
+    return FakeDriver()
+
+
+def broken_driver():
+    raise RuntimeError('Excel could not be started')
+
+
+@pytest.fixture(autouse=True)
+def fast_poll(monkeypatch):
+    monkeypatch.setattr(Pool, 'POLL_INTERVAL', 0.2)
+
+
+def test_every_job_gets_a_result():
+    jobs = [Pool.make_job(f'report_{number}.xlsx', system) for number, system in enumerate(['BWP', 'BWQ'] * 3)]
+    jobs.append(Pool.make_job('fail_report.xlsx'))
+    results = Pool.WorkerPool(fake_driver, workers=2, system_limits={'BWP': 1}).run(jobs)
+    status = {result['filename']: result['status'] for result in results}
+    assert len(results) == len(jobs)
+    assert status.pop('fail_report.xlsx') == 'ERROR'
+    assert set(status.values()) == {'SUCCESS'}
+    assert Pool.WorkerPool.summary(results) == 1
+
+
+def test_jobs_are_failed_when_every_worker_dies_at_startup():
+    jobs = [Pool.make_job(f'report_{number}.xlsx', 'BWP') for number in range(5)]
+    results = Pool.WorkerPool(broken_driver, workers=2).run(jobs)
+    assert sorted(result['filename'] for result in results) == sorted(job['filename'] for job in jobs)
+    assert {result['status'] for result in results} == {'ERROR'}
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+The probe against a local asyncio server. The server runs in its own event loop (thread), since the probe
+calls asyncio.run
+"""
+import socket
+import asyncio
+import threading
+
+import pandas as pd
+import pytest
+
+from sapRefresh.Core import Probe, Retry
+from sapRefresh.Core.Config import GlobalConfig
+
+
+@pytest.fixture
+def server_port():
+    """port of a local TCP server that accepts and closes the connections"""
+    loop = asyncio.new_event_loop()
+    accepted = []
+
+    async def handle(reader, writer):
+        accepted.append(1)
+        writer.close()
+
+    server = loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    loop.close()
+
+
+@pytest.fixture
+def closed_port():
+    """port without a server"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_config(**values):
+    return GlobalConfig(pd.DataFrame({'description': list(values), 'value': list(values.values())}))
+
+
+def test_probe_reachable_and_unreachable(server_port, closed_port):
+    service = Probe.ProbeService(timeout=2)
+    up, down = Probe.Endpoint('sap', '127.0.0.1', server_port, True), Probe.Endpoint('sap', '127.0.0.1', closed_port, True)
+    result_up, result_down = service.probe([up, down])
+    assert result_up.reachable and result_up.latency is not None and result_up.error is None
+    assert not result_down.reachable and result_down.error
+    assert (result_up.endpoint, result_down.endpoint) == (up, down)
+
+
+def test_probe_results_are_cached_for_ttl(server_port):
+    now = [0.0]
+    service = Probe.ProbeService(ttl=60, timeout=2, clock=lambda: now[0])
+    endpoint = Probe.Endpoint('sap', '127.0.0.1', server_port, True)
+    assert not service.probe([endpoint])[0].cached
+    now[0] = 30.0
+    assert service.probe([endpoint])[0].cached
+    assert (service.probes, service.hits) == (1, 1)
+    now[0] = 61.0
+    assert not service.probe([endpoint])[0].cached
+    assert service.probes == 2
+
+
+def test_ensure_reachable(monkeypatch, server_port, closed_port):
+    monkeypatch.setattr(Retry, 'get_policy', lambda: Retry.RetryPolicy(attempts=2, wait_initial=0, jitter=0))
+    monkeypatch.setitem(Probe._state, 'service', None)
+    config = make_config(**{'ping-host': '127.0.0.1', 'ping-port': server_port, 'ping-timeout': 2,
+                            'mail-server': '127.0.0.1', 'mail-port': closed_port})
+    # the smtp server is optional: only a warning
+    results = Probe.ensure_reachable(config)
+    assert [result.reachable for result in results] == [True, False]
+
+    monkeypatch.setitem(Probe._state, 'service', None)
+    config = make_config(**{'ping-host': '127.0.0.1', 'ping-port': closed_port, 'ping-timeout': 2})
+    with pytest.raises(ConnectionError):
+        Probe.ensure_reachable(config)
+    # the unreachable required server is probed again at each attempt
+    assert Probe.get_service().probes == 2
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+"""
+import pytest
+
+from sapRefresh.Core import Retry
+from sapRefresh.Refresh import Sap
+
+
+def test_classify():
+    assert Retry.classify(TimeoutError()) == Retry.TRANSIENT
+    assert Retry.classify(ConnectionError()) == Retry.TRANSIENT
+    assert Retry.classify(FileNotFoundError()) == Retry.PERMANENT
+    assert Retry.classify(Retry.LogonRejectedError('wrong password')) == Retry.PERMANENT
+    assert Retry.classify(Retry.WorkbookError('no crosstab')) == Retry.PERMANENT
+    assert Retry.classify(RuntimeError()) == Retry.UNKNOWN
+    # the unknown errors are still retried
+    assert Retry.is_transient(RuntimeError())
+    assert not Retry.is_transient(Retry.LogonRejectedError('wrong password'))
+
+
+def test_permanent_errors_are_not_retried():
+    calls = []
+
+    def logon():
+        calls.append(1)
+        raise Retry.LogonRejectedError('wrong password')
+
+    policy = Retry.RetryPolicy(attempts=3, wait_initial=0, jitter=0)
+    try:
+        policy.retrying()(logon)
+    except Retry.LogonRejectedError:
+        pass
+    assert len(calls) == 1
+
+
+def test_breaker_counts_only_transient_errors():
+    now = [0.0]
+    breaker = Retry.CircuitBreaker('BWP', failures=2, reset_timeout=60, clock=lambda: now[0])
+    for error in (Retry.WorkbookError('x'), RuntimeError('y'), Retry.LogonRejectedError('z'), RuntimeError('w')):
+        breaker.record_failure(error)
+    breaker.check()
+    assert breaker.state == breaker.CLOSED
+    breaker.record_failure(TimeoutError())
+    breaker.record_failure(ConnectionError())
+    assert breaker.state == breaker.OPEN
+    now[0] = 61.0
+    breaker.check()
+    assert breaker.state == breaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+
+
+class com_error(Exception):
+    """stand-in of pywintypes.com_error (classify matches it by name)"""
+
+
+class RejectingExcel:
+    """Excel whose SAP AfO answers every command with a failure"""
+    def __init__(self):
+        self.Application = self
+
+    def Run(self, macro, *args):
+        return 0
+
+
+def test_bad_workbooks_dont_open_the_circuit():
+    breaker = Retry.CircuitBreaker('BWP', failures=3, reset_timeout=60, clock=lambda: 0.0)
+    for command in (lambda xl: Sap.sap_refresh(xl), lambda xl: Sap.sap_refresh_data(xl, 'DS_1'),
+                    lambda xl: Sap.sap_set_refresh_behaviour(xl, 'Off')):
+        with pytest.raises(Retry.SapCommandError):
+            command(RejectingExcel())
+        breaker.record_failure(Retry.SapCommandError('rejected'))
+    # a VBA error of a broken workbook (unlisted HRESULT) is unknown, not transient
+    vba_error = com_error(-2146827284 + 1, 'Exception occurred.', None, None)
+    assert Retry.classify(vba_error) == Retry.UNKNOWN
+    breaker.record_failure(vba_error)
+    breaker.check()
+    assert breaker.state == breaker.CLOSED
+    busy_error = com_error(-2147418111, 'Call was rejected by callee.', None, None)
+    assert Retry.classify(busy_error) == Retry.TRANSIENT
+
+
+def test_breaker_of_the_unknown_system_never_opens():
+    Retry.reset_breakers()
+    breaker = Retry.get_breaker(None, Retry.RetryPolicy(circuit_failures=1))
+    for _ in range(5):
+        breaker.record_failure(TimeoutError())
+    breaker.check()
+    assert breaker.state == breaker.CLOSED
+    Retry.reset_breakers()
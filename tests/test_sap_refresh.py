@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+The flows of sap_refresh against the fake Excel and the simulated SAP AfO (the synthetic config workbook of
+script_benchmark_pipeline)
+"""
+import pathlib
+import sys
+
+import pandas as pd
+import pytest
+from cryptography.fernet import Fernet
+
+from sap_refresh import SapRefresh, refresh_auto_reports
+from script_benchmark_pipeline import write_configuration
+import sapRefresh
+from sapRefresh import set_config_path, get_global_configs, CONFIG_PATH_ENV
+from sapRefresh.Core.Cache import get_cache_directory
+from sapRefresh.Core import Cripto, Metrics
+from sapRefresh.Core.Config import GlobalConfig
+from sapRefresh.Core.Ledger import RefreshLedger
+from sapRefresh.Core.Retry import WorkbookError
+from sapRefresh.Refresh import Sap
+from sapRefresh.Refresh.Driver import set_driver
+from sapRefresh.Refresh.FakeExcel import FakeApplication
+from sapRefresh.Refresh.Simulator import AfOSimulator, SimulatedDriver, synthetic_reports
+
+
+class KillingDriver:
+    """driver that only records the instances killed"""
+    requires_network = False
+
+    def __init__(self):
+        self.killed = []
+
+    def kill_instance(self, xl_Instance):
+        self.killed.append(xl_Instance)
+
+
+class HungApplication(FakeApplication):
+    def Quit(self):
+        raise OSError('The RPC server is unavailable')
+
+
+@pytest.fixture
+def driver():
+    driver = KillingDriver()
+    set_driver(driver)
+    yield driver
+    set_driver(None)
+
+
+def make_session(application):
+    session = SapRefresh(GlobalConfig(pd.DataFrame({'description': ['logon-client'], 'value': ['100']})))
+    session.ExcelInstance = application
+    return session
+
+
+def test_quit_discards_the_open_workbooks(driver):
+    application = FakeApplication(lambda application, macro, args: 1)
+    workbook = application.Workbooks.Open('report.xlsm')
+    make_session(application).quit()
+    assert workbook.closed and workbook.saved == 0
+    assert application.quit and driver.killed == []
+
+
+def test_instance_that_cant_quit_is_killed(driver):
+    application = HungApplication(lambda application, macro, args: 1)
+    session = make_session(application)
+    session.quit()
+    assert driver.killed == [application]
+    assert session.ExcelInstance is None
+
+
+@pytest.fixture
+def simulated_batch(monkeypatch, tmp_path):
+    """function(count, crosstabs=1, **write_configuration arguments) that writes the config of count synthetic
+    reports and installs a simulated SAP AfO without latency. Returns the simulator"""
+    monkeypatch.setenv(Cripto.KEY_ENV, Fernet.generate_key().decode('utf-8'))
+    monkeypatch.setenv(CONFIG_PATH_ENV, '')
+    for key in ('global_configs', 'log_path'):  # restored at the end of the test
+        monkeypatch.setitem(sapRefresh._state, key, None)
+    Cripto.reset_provider()
+    Metrics.registry.drain()
+
+    def make(count, crosstabs=1, **arguments):
+        reports = synthetic_reports(count, crosstabs)
+        set_config_path(write_configuration(tmp_path, reports, 1, **arguments))
+        simulator = AfOSimulator(reports, {kind: '0' for kind in ('logon', 'refresh', 'submit', 'call')}, 0)
+        set_driver(SimulatedDriver(simulator))
+        return simulator
+
+    yield make
+    set_driver(None)
+    Cripto.reset_provider()
+    Metrics.registry.drain()
+
+
+def counter(snapshot, name):
+    return sum(value for counter_name, _, value in snapshot['counters'] if counter_name == name)
+
+
+def test_failed_export_keeps_the_refresh(simulated_batch, monkeypatch):
+    simulated_batch(2, export='parquet')
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)  # the optional package is missing
+    refresh_auto_reports(force=True, notify=False)
+    snapshot = Metrics.registry.drain()
+    assert counter(snapshot, 'export_failures_total') == 2
+    assert counter(snapshot, 'reports_total') == 2
+
+
+def test_restriction_reads_and_skips_are_reported_apart(simulated_batch, capsys):
+    simulated_batch(2)
+    refresh_auto_reports(force=True, notify=False)
+    snapshot = Metrics.registry.drain()
+    # the synthetic variables start with other values: every group of restrictions is read and nothing is skipped
+    assert counter(snapshot, 'restriction_reads_total') > 0
+    assert counter(snapshot, 'restrictions_skipped_total') == 0
+    assert 'COM calls saved' not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('refresh_mode', ['classic', 'single'])
+def test_refresh_phase_is_timed_by_mode(simulated_batch, refresh_mode):
+    simulated_batch(2, refresh_mode=refresh_mode)
+    refresh_auto_reports(force=True, notify=False)
+    phases = [name for name, _, _ in Metrics.registry.drain()['durations']]
+    assert phases.count(f'refresh_phase:{refresh_mode}') == 2
+    ledger = RefreshLedger(get_cache_directory(get_global_configs()))
+    try:
+        assert f'refresh_phase:{refresh_mode}' in ledger.phase_durations('Report_0001.xlsx')
+    finally:
+        ledger.close()
+
+
+def test_rerun_skips_the_current_reports(simulated_batch, capsys):
+    simulated_batch(2)
+    refresh_auto_reports(notify=False)
+    assert counter(Metrics.registry.drain(), 'reports_total') == 2
+    refresh_auto_reports(notify=False)
+    assert counter(Metrics.registry.drain(), 'reports_total') == 0
+    assert capsys.readouterr().out.count('already refreshed today with the same parameters') == 2
+    refresh_auto_reports(force=True, notify=False)
+    assert counter(Metrics.registry.drain(), 'reports_total') == 2
+
+
+def test_crosstabs_of_a_workbook_with_several_data_sources():
+    reports = synthetic_reports(1, crosstabs=3)
+    reports['Report_0001.xlsx'].crosstabs[2].source = 'DS_1'  # a data source that feeds two crosstabs
+    application = SimulatedDriver(AfOSimulator(reports, time_scale=0)).open_excel()
+    application.Workbooks.Open('Report_0001.xlsx')
+    session = make_session(application)
+    session.filepath = pathlib.Path('Report_0001.xlsx')
+    session.get_data_sources()
+    assert [(item['Crosstab'], item['DS'], item['Sheet']) for item in session.data_sources] == [
+        ('SAPCrosstab1', 'DS_1', 'Sheet1'), ('SAPCrosstab2', 'DS_2', 'Sheet2'), ('SAPCrosstab3', 'DS_1', 'Sheet3')]
+    assert session.source == 'DS_1' and session.sources == ['DS_1', 'DS_2']
+    assert session.refresh_targets(['DS_2', 'DS_1']) == [Sap.ALL_SOURCES]
+    assert session.refresh_targets(['DS_2']) == ['DS_2']
+    with pytest.raises(WorkbookError, match='DS_3 are not in the workbook'):
+        session.refresh_targets(['DS_1', 'DS_3'])
+
+
+def test_report_with_several_data_sources_is_refreshed_by_one_command(simulated_batch):
+    simulator = simulated_batch(2, crosstabs=2)
+    commands = []
+    execute = simulator._run_sapexecutecommand
+
+    def record(application, workbook, command, parameter=None):
+        commands.append((command, parameter))
+        return execute(application, workbook, command, parameter)
+
+    simulator._run_sapexecutecommand = record
+    refresh_auto_reports(force=True, notify=False)
+    assert counter(Metrics.registry.drain(), 'reports_total') == 2
+    refreshes = [parameter for command, parameter in commands if command in ('Refresh', 'RefreshData')]
+    assert refreshes and set(refreshes) == {Sap.ALL_SOURCES}
+    for report in simulator.reports.values():  # the saved workbooks have every crosstab refreshed
+        assert all(crosstab.active for crosstab in report.crosstabs)
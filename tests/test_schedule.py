@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Order of the reports of a batch and prediction of its completion
+"""
+from datetime import date, datetime, time
+
+import pandas as pd
+import pytest
+
+from sap_refresh import plan_batch
+from sapRefresh.Core import Schedule
+
+DAY = date(2026, 10, 18)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('08:30', time(8, 30)), ('08:30:00', time(8, 30)), ('8', time(8)), ('8h', time(8)), ('8h30', time(8, 30)),
+    (8, time(8)), (8.0, time(8)), (0.5, time(12)), (0.33, time(7, 55)), (time(6, 15), time(6, 15)),
+])
+def test_parse_deadline(value, expected):
+    assert Schedule.parse_deadline(value, DAY) == datetime.combine(DAY, expected)
+
+
+@pytest.mark.parametrize('value', [None, float('nan'), '', ' ', 'tomorrow', '25:00', '8:5', -1])
+def test_empty_or_invalid_deadline_is_none(value):
+    assert Schedule.parse_deadline(value, DAY) is None
+
+
+def test_fill_durations_uses_the_median_of_the_known_reports():
+    durations = Schedule.fill_durations(['a', 'b', 'c', 'd'], {'a': 10, 'b': 30, 'c': 20})
+    assert durations == {'a': 10, 'b': 30, 'c': 20, 'd': 20}
+    assert Schedule.fill_durations(['a'], {}) == {'a': Schedule.DEFAULT_DURATION}
+
+
+def test_order_reports():
+    durations = {'a': 10, 'b': 30, 'c': 20, 'd': 5}
+    assert Schedule.order_reports('abcd', durations) == list('abcd')
+    assert Schedule.order_reports('abcd', durations, 'longest') == list('bcad')
+    deadlines = {'c': datetime(2026, 10, 18, 8), 'd': datetime(2026, 10, 18, 8), 'a': datetime(2026, 10, 18, 7)}
+    # earliest deadline, then lowest priority number, then longest; reports without deadline at the end
+    assert Schedule.order_reports('abcd', durations, 'deadline', deadlines, {'d': 1}) == list('adcb')
+    with pytest.raises(ValueError):
+        Schedule.order_reports('abcd', durations, 'shortest')
+
+
+def test_predict_completion():
+    start = datetime(2026, 10, 18, 6)
+    durations = {'a': 60, 'b': 30, 'c': 30, 'd': 10}
+    end, finishes = Schedule.predict_completion('abcd', durations, workers=2, start=start)
+    # a -> worker 1 (0-60), b -> worker 2 (0-30), c -> worker 2 (30-60), d -> worker 1 or 2 (60-70)
+    assert [(finishes[name] - start).seconds for name in 'abcd'] == [60, 30, 60, 70]
+    assert (end - start).seconds == 70
+
+
+class StubLedger:
+    def expected_durations(self, filenames):
+        return {'a.xlsx': 60, 'b.xlsx': 30}
+
+
+def test_invalid_deadline_doesnt_stop_the_batch():
+    data_sources = pd.DataFrame({'filename': ['a.xlsx', 'b.xlsx', 'c.xlsx'], 'deadline': ['8h', 'soon', 0.25]})
+    ordered = plan_batch(['a.xlsx', 'b.xlsx', 'c.xlsx'], data_sources, StubLedger(), order='deadline')
+    assert ordered == ['c.xlsx', 'a.xlsx', 'b.xlsx']
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/18/2026
+Author: Arnold Souza
+Email: arnoldporto@gmail.com
+
+Reuse of the SAP logons of a warm Excel instance
+"""
+import pytest
+from cryptography.fernet import Fernet
+
+from sapRefresh.Core import Cripto
+from sapRefresh.Refresh.FakeExcel import FakeApplication
+from sapRefresh.Refresh.Session import SessionManager
+
+
+class AfO:
+    """answers SAPLogon and IsConnected, and keeps the macros called"""
+    def __init__(self):
+        self.connected = set()
+        self.calls = []
+
+    def __call__(self, application, macro, args):
+        self.calls.append(macro)
+        if macro == 'SAPLogon':
+            self.connected.add(args[0])
+            return 1
+        if macro == 'SAPGetProperty' and args[0] == 'IsConnected':
+            return args[1] in self.connected
+        raise ValueError(f'Unexpected macro {macro}')
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setenv(Cripto.KEY_ENV, Fernet.generate_key().decode('utf-8'))
+    Cripto.reset_provider()
+    yield lambda secret: Cripto.secret_encode(secret).decode('utf-8')
+    Cripto.reset_provider()
+
+
+def test_session_of_the_same_system_is_reused(token):
+    afo = AfO()
+    xl = FakeApplication(afo)
+    sessions = SessionManager()
+    user, password = token('user'), token('password')
+    assert sessions.logon(xl, 'DS_1', 'BWP', 100, user, password) == 1
+    assert afo.calls == ['SAPLogon']  # a new system is never asked
+    assert sessions.logon(xl, 'DS_1', 'BWP', '100', user, password) == 1
+    assert afo.calls == ['SAPLogon', 'SAPGetProperty']
+    sessions.logon(xl, 'DS_1', 'BWP', 100, token('other user'), password)
+    sessions.logon(xl, 'DS_2', 'BWQ', 100, user, password)
+    assert (sessions.performed, sessions.avoided) == (3, 1)
+    assert sessions.summary() == 'SAP logons: 3 performed, 1 avoided'
+
+
+def test_disconnected_session_logs_on_again(token):
+    afo = AfO()
+    xl = FakeApplication(afo)
+    sessions = SessionManager()
+    user, password = token('user'), token('password')
+    sessions.logon(xl, 'DS_1', 'BWP', 100, user, password)
+    afo.connected.clear()  # e.g. the SAP session timed out
+    sessions.logon(xl, 'DS_1', 'BWP', 100, user, password)
+    assert afo.calls == ['SAPLogon', 'SAPGetProperty', 'SAPLogon']
+    sessions.clear()  # the Excel instance was closed
+    sessions.logon(xl, 'DS_1', 'BWP', 100, user, password)
+    assert afo.calls[-1] == 'SAPLogon' and (sessions.performed, sessions.avoided) == (3, 0)
+
+
+def test_unknown_system_asks_afo(token):
+    afo = AfO()
+    xl = FakeApplication(afo)
+    sessions = SessionManager()
+    user, password = token('user'), token('password')
+    sessions.logon(xl, 'DS_1', None, 100, user, password)
+    assert afo.calls == ['SAPLogon']
+    # with a session in the instance, the data source of an unknown system may already be connected
+    sessions.logon(xl, 'DS_1', None, 100, user, password)
+    sessions.logon(xl, 'DS_2', None, 100, user, password)
+    assert afo.calls == ['SAPLogon', 'SAPGetProperty', 'SAPGetProperty', 'SAPLogon']
+    assert (sessions.performed, sessions.avoided) == (2, 1)